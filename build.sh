@@ -7,6 +7,7 @@ pip install -r requirements.txt
 
 python manage.py collectstatic --no-input
 python manage.py migrate
+python manage.py rebuild_media_catalog --missing-only
 
 # Create superuser automatically
 python manage.py create_superuser_auto
@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .api_views import CustomImageViewSet, CustomDocumentViewSet, CategoryViewSet
+from .api_views import CustomImageViewSet, CustomDocumentViewSet, CategoryViewSet, VideoViewSet, AudioViewSet
 
 router = DefaultRouter()
 router.register(r'images', CustomImageViewSet, basename='image')
 router.register(r'documents', CustomDocumentViewSet, basename='document')
+router.register(r'videos', VideoViewSet, basename='video')
+router.register(r'audio', AudioViewSet, basename='audio')
 router.register(r'categories', CategoryViewSet, basename='category')
 
 urlpatterns = [
@@ -1,17 +1,56 @@
 from rest_framework import viewsets, filters
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import CustomImage, CustomDocument, Category
+from django.utils import timezone
+from .conditional import ConditionalGetMixin, conditional_view
+from .fieldsets import SparseFieldsViewSetMixin
+from .models import CustomImage, CustomDocument, Category, MediaFolder, Video, Audio
+from .pagination import MediaCursorPagination
+from .related import get_related_ids
 from .serializers import (
     CustomImageSerializer,
     CustomDocumentSerializer,
-    CategorySerializer
+    CategorySerializer,
+    VideoSerializer,
+    AudioSerializer
 )
 
+# Most ids a single bulk lookup may ask for
+MAX_BULK_IDS = 500
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+
+class BulkLookupMixin:
+    """
+    Adds a bulk/ action resolving ?ids=3,1,2 with one query. Results keep
+    the requested order; ids that don't exist are listed under "missing".
+    """
+    
+    @action(detail=False, methods=['get'])
+    def bulk(self, request):
+        """Get several objects by id in one request."""
+        return conditional_view(*self.conditional_models)(self.bulk_lookup)(request)
+    
+    def bulk_lookup(self, request):
+        try:
+            ids = [int(pk) for pk in request.query_params.get('ids', '').split(',') if pk.strip()]
+        except ValueError:
+            raise ValidationError({'ids': 'Expected a comma-separated list of integer ids.'})
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > MAX_BULK_IDS:
+            raise ValidationError({'ids': f'At most {MAX_BULK_IDS} ids can be requested at once.'})
+        
+        found = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer([found[pk] for pk in ids if pk in found], many=True)
+        return Response({
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in found],
+        })
+
+
+class CategoryViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing categories.
     """
@@ -19,72 +58,126 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
+    conditional_models = (Category,)
 
 
-class CustomImageViewSet(viewsets.ReadOnlyModelViewSet):
+class CustomImageViewSet(ConditionalGetMixin, SparseFieldsViewSetMixin, BulkLookupMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing images.
-    Supports filtering, searching, and ordering.
+    Supports filtering, searching, ordering and cursor pagination.
+    ?fields= and ?expand= select the fields returned (see fieldsets.py).
     """
     queryset = CustomImage.objects.all()
     serializer_class = CustomImageSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = MediaCursorPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['categories__slug']
     search_fields = ['title', 'tags__name', 'copyright_holder']
     ordering_fields = ['created_at', 'title']
-    ordering = ['-created_at']
+    ordering = ['-created_at', '-id']
+    conditional_models = (CustomImage, Category, MediaFolder)
     
     @action(detail=False, methods=['get'])
+    @conditional_view(CustomImage, Category, MediaFolder)
     def recent(self, request):
         """Get recently uploaded images."""
-        recent_images = self.queryset.order_by('-created_at')[:10]
+        recent_images = self.get_queryset().order_by('-created_at')[:10]
         serializer = self.get_serializer(recent_images, many=True)
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
+    @conditional_view(CustomImage, Category, MediaFolder)
     def related(self, request, pk=None):
-        """Get images related to this one (by category)."""
+        """Get images related to this one, by shared categories, tags and folder."""
         image = self.get_object()
-        related = CustomImage.objects.filter(
-            categories__in=image.categories.all()
-        ).exclude(id=image.id).distinct()[:5]
-        serializer = self.get_serializer(related, many=True)
+        ids = get_related_ids('customimage', image.pk, limit=5)
+        found = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer([found[pk] for pk in ids if pk in found], many=True)
         return Response(serializer.data)
 
 
-class CustomDocumentViewSet(viewsets.ReadOnlyModelViewSet):
+class CustomDocumentViewSet(ConditionalGetMixin, SparseFieldsViewSetMixin, BulkLookupMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing documents.
-    Supports filtering, searching, and ordering.
+    Supports filtering, searching, ordering and cursor pagination.
+    ?fields= and ?expand= select the fields returned (see fieldsets.py).
+    ?ordering=expiry_date lists only documents that have an expiry date,
+    since a cursor cannot encode a missing one.
     """
     queryset = CustomDocument.objects.all()
     serializer_class = CustomDocumentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = MediaCursorPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['department']
     search_fields = ['title', 'tags__name', 'department']
     ordering_fields = ['created_at', 'title', 'expiry_date']
-    ordering = ['-created_at']
+    ordering = ['-created_at', '-id']
+    conditional_models = (CustomDocument, MediaFolder)
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if any(field.lstrip('-') == 'expiry_date' for field in queryset.query.order_by):
+            queryset = queryset.filter(expiry_date__isnull=False)
+        return queryset
     
     @action(detail=False, methods=['get'])
+    @conditional_view(CustomDocument, MediaFolder)
     def recent(self, request):
         """Get recently uploaded documents."""
-        recent_docs = self.queryset.order_by('-created_at')[:10]
+        recent_docs = self.get_queryset().order_by('-created_at')[:10]
         serializer = self.get_serializer(recent_docs, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    # The 30-day window moves daily even when no document changes
+    @conditional_view(CustomDocument, MediaFolder, extra=lambda request: [timezone.localdate()])
     def expiring_soon(self, request):
         """Get documents expiring within 30 days."""
-        from django.utils import timezone
         from datetime import timedelta
         
         thirty_days = timezone.now().date() + timedelta(days=30)
-        expiring = self.queryset.filter(
+        expiring = self.get_queryset().filter(
             expiry_date__lte=thirty_days,
             expiry_date__gte=timezone.now().date()
         ).order_by('expiry_date')
         
         serializer = self.get_serializer(expiring, many=True)
         return Response(serializer.data)
+
+
+class VideoViewSet(ConditionalGetMixin, SparseFieldsViewSetMixin, BulkLookupMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for viewing videos.
+    Supports filtering, searching, ordering and cursor pagination.
+    ?fields= and ?expand= select the fields returned (see fieldsets.py).
+    """
+    queryset = Video.objects.all()
+    serializer_class = VideoSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = MediaCursorPagination
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = ['categories__slug', 'video_type']
+    search_fields = ['title', 'tags__name', 'director', 'description']
+    ordering_fields = ['created_at', 'title']
+    ordering = ['-created_at', '-id']
+    conditional_models = (Video, Category, MediaFolder)
+
+
+class AudioViewSet(ConditionalGetMixin, SparseFieldsViewSetMixin, BulkLookupMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for viewing audio files.
+    Supports filtering, searching, ordering and cursor pagination.
+    ?fields= and ?expand= select the fields returned (see fieldsets.py).
+    """
+    queryset = Audio.objects.all()
+    serializer_class = AudioSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = MediaCursorPagination
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = ['categories__slug', 'genre']
+    search_fields = ['title', 'tags__name', 'artist', 'album']
+    ordering_fields = ['created_at', 'title']
+    ordering = ['-created_at', '-id']
+    conditional_models = (Audio, Category, MediaFolder)
@@ -0,0 +1,147 @@
+"""
+Batch Image Editing
+Runs an edit recipe over many images. Decoding, editing and encoding happen
+in a shared process pool sized to the CPU count; the requesting process
+loads the images in one query, saves each finished chunk in one
+transaction and reports per-image results as chunks complete.
+
+Worker functions only run Pillow. They never touch the database, so
+workers don't need Django set up.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+
+from .image_editor import ImageEditor
+
+
+_executor = None
+
+
+def get_batch_workers():
+    return getattr(settings, 'MEDIA_BATCH_WORKERS', os.cpu_count() or 1)
+
+
+def get_batch_chunk_size():
+    return getattr(settings, 'MEDIA_BATCH_CHUNK_SIZE', 10)
+
+
+def get_executor():
+    """The process pool shared by batch edits, started on first use."""
+    global _executor
+    if _executor is None:
+        # Spawned workers start clean instead of inheriting this process's
+        # database connections and threads through fork()
+        _executor = ProcessPoolExecutor(
+            max_workers=get_batch_workers(),
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _executor
+
+
+def _discard_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def edit_batch(recipe, work):
+    """
+    Apply a recipe to [(image pk, file path, file name), ...] in a worker process.
+    Returns [(pk, output filename, encoded bytes, error message), ...].
+    """
+    edited = []
+    for pk, path, name in work:
+        try:
+            editor = ImageEditor(path).apply_recipe(recipe)
+            filename = editor.output_filename(name)
+            buffer = BytesIO()
+            editor.save_to_buffer(buffer, format=editor.output_format)
+            edited.append((pk, filename, buffer.getvalue(), None))
+        except Exception as e:
+            edited.append((pk, None, None, str(e)))
+    return edited
+
+
+def _save_chunk(images, requested, edited):
+    """Save a worker's edits in one transaction; returns a result per image."""
+    from django.core.files.base import ContentFile
+    from django.db import transaction
+
+    results = []
+    with transaction.atomic():
+        for pk, filename, data, error in edited:
+            if error is None:
+                try:
+                    # A savepoint per image, so one failure doesn't undo the chunk
+                    with transaction.atomic():
+                        images[pk].file.save(filename, ContentFile(data, name=filename), save=True)
+                except Exception as e:
+                    error = str(e)
+            if error is None:
+                results.append({'image_id': requested[pk], 'success': True})
+            else:
+                results.append({'image_id': requested[pk], 'success': False, 'error': error})
+    return results
+
+
+def run_batch(image_ids, recipe):
+    """
+    Edit images with a parsed-valid recipe, yielding one result dict per
+    requested image as its chunk finishes. Results carry the id exactly as
+    requested; ids naming the same image (e.g. 5 and "05") are edited once,
+    under the first of them. A single chunk is edited in this process,
+    since starting workers would cost more than they save.
+    """
+    from django.core.exceptions import ValidationError
+
+    from .models import CustomImage
+
+    # Normalized pk -> id as the client sent it
+    requested = {}
+    for image_id in image_ids:
+        try:
+            pk = CustomImage._meta.pk.to_python(image_id)
+        except ValidationError as e:
+            yield {'image_id': image_id, 'success': False, 'error': ' '.join(e.messages)}
+            continue
+        requested.setdefault(pk, image_id)
+    images = CustomImage.objects.in_bulk(list(requested))
+    for pk, image_id in requested.items():
+        if pk not in images:
+            yield {
+                'image_id': image_id,
+                'success': False,
+                'error': f'{CustomImage._meta.object_name} matching query does not exist.',
+            }
+
+    work = [(image.pk, image.file.path, os.path.basename(image.file.name)) for image in images.values()]
+    chunk_size = max(1, get_batch_chunk_size())
+    chunks = [work[i:i + chunk_size] for i in range(0, len(work), chunk_size)]
+    if len(chunks) <= 1:
+        for chunk in chunks:
+            yield from _save_chunk(images, requested, edit_batch(recipe, chunk))
+        return
+
+    executor = get_executor()
+    futures = {executor.submit(edit_batch, recipe, chunk): chunk for chunk in chunks}
+    try:
+        for future in as_completed(futures):
+            try:
+                edited = future.result()
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    # A worker died (e.g. out of memory); start a fresh pool next time
+                    _discard_executor()
+                edited = [(pk, None, None, str(e) or type(e).__name__) for pk, path, name in futures[future]]
+            yield from _save_chunk(images, requested, edited)
+    finally:
+        # The client went away or a worker died: drop work not yet started
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,278 @@
+"""
+Unified Media Catalog
+Keeps one MediaCatalogEntry row per media object so that listings,
+filters and counts can query a single indexed table.
+"""
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from taggit.models import TaggedItem
+
+from .facets import bump_facet_version
+from .fuzzy import index_trigrams, rebuild_trigram_index
+from .related import rebuild_related_media, refresh_related, schedule_related_refresh
+from .search import index_entries, rebuild_search_index, unindex_entries
+from .models import (
+    CustomImage, CustomDocument, Video, Audio, MediaCatalogEntry, MediaCatalogTerm,
+    MediaCatalogTrigram, MediaRelation,
+)
+from wagtail.images.models import Image
+from wagtail.documents.models import Document
+
+
+# Every model listed in the catalog, keyed by the source name stored on entries.
+MEDIA_SOURCES = {
+    'customimage': (CustomImage, 'image'),
+    'image': (Image, 'image'),
+    'customdocument': (CustomDocument, 'document'),
+    'document': (Document, 'document'),
+    'video': (Video, 'video'),
+    'audio': (Audio, 'audio'),
+}
+
+SOURCE_BY_MODEL = {model: source for source, (model, media_type) in MEDIA_SOURCES.items()}
+
+# Sources whose model has no folder / categories field
+FOLDERLESS_SOURCES = ('image', 'document')
+UNCATEGORIZED_SOURCES = ('image', 'customdocument', 'document')
+
+
+def get_source(obj_or_model):
+    """Return the catalog source name for a media instance or model, or None."""
+    model = obj_or_model if isinstance(obj_or_model, type) else type(obj_or_model)
+    return SOURCE_BY_MODEL.get(model._meta.concrete_model)
+
+
+def get_catalog_queryset(source):
+    """Queryset for a source with the relations needed to build catalog entries."""
+    queryset = MEDIA_SOURCES[source][0].objects.all()
+    if source not in UNCATEGORIZED_SOURCES:
+        queryset = queryset.prefetch_related('categories')
+    return queryset
+
+
+def get_tag_names(model, pks):
+    """
+    Map each pk to its tag names in a single query.
+    Reads taggit's TaggedItem table directly, since ClusterTaggableManager
+    cannot resolve instance tags through the generic TaggedItem model.
+    """
+    tag_names = {pk: [] for pk in pks}
+    tagged_items = TaggedItem.objects.filter(
+        content_type=ContentType.objects.get_for_model(model),
+        object_id__in=list(tag_names),
+    ).order_by('tag__name').values_list('object_id', 'tag__name')
+    for object_id, name in tagged_items:
+        tag_names[object_id].append(name)
+    return tag_names
+
+
+def _file_size(obj):
+    size = getattr(obj, 'file_size', None)
+    if size is None and obj.file:
+        try:
+            size = obj.file.size
+        except Exception:
+            size = None
+    return size
+
+
+def _file_url(field_file):
+    if not field_file:
+        return ''
+    try:
+        return field_file.url
+    except ValueError:
+        return ''
+
+
+# Descriptive model fields copied into the full-text search text, where present
+SEARCH_TEXT_FIELDS = ('extracted_text', 'artist', 'album', 'director')
+
+
+def build_catalog_entry(obj, source=None, tag_names=None):
+    """Build an unsaved MediaCatalogEntry for a media object."""
+    source = source or get_source(obj)
+    if tag_names is None:
+        tag_names = get_tag_names(type(obj), [obj.pk])[obj.pk]
+    media_type = MEDIA_SOURCES[source][1]
+
+    # Image cards use pre-generated renditions (see thumbnails.py), never the original
+    if media_type == 'image':
+        thumbnail_url = ''
+    else:
+        thumbnail_url = _file_url(getattr(obj, 'thumbnail', None))
+
+    categories = []
+    category_names = []
+    if source not in UNCATEGORIZED_SOURCES:
+        for category in obj.categories.all():
+            categories.append(category.slug)
+            category_names.append(category.name)
+
+    search_text = ' '.join(filter(None, [
+        *category_names,
+        *(getattr(obj, field, '') or '' for field in SEARCH_TEXT_FIELDS),
+    ]))
+
+    entry = MediaCatalogEntry(
+        source=source,
+        object_id=obj.pk,
+        media_type=media_type,
+        title=obj.title,
+        sort_title=obj.title.lower(),
+        created_at=getattr(obj, 'created_at', None),
+        folder_id=getattr(obj, 'folder_id', None),
+        file_size=_file_size(obj),
+        file_url=_file_url(obj.file),
+        thumbnail_url=thumbnail_url,
+        tag_names=', '.join(tag_names),
+        category_slugs=f",{','.join(categories)}," if categories else '',
+        search_text=search_text,
+    )
+    # Kept alongside the entry so the facet terms can be written with it
+    entry.term_values = (
+        [('category', slug) for slug in categories] +
+        [('tag', name) for name in tag_names]
+    )
+    return entry
+
+
+def _build_terms(entry_id, term_values):
+    return [
+        MediaCatalogTerm(entry_id=entry_id, kind=kind, value=value[:255])
+        for kind, value in term_values
+    ]
+
+
+CATALOG_FIELDS = [
+    'media_type', 'title', 'sort_title', 'created_at', 'folder', 'file_size',
+    'file_url', 'thumbnail_url', 'tag_names', 'category_slugs', 'search_text',
+]
+
+
+def sync_catalog_entry(obj):
+    """Create or refresh the catalog entry for a media object."""
+    source = get_source(obj)
+    if source is None or obj.pk is None:
+        return None
+    entry = build_catalog_entry(obj, source)
+    with transaction.atomic():
+        saved, created = MediaCatalogEntry.objects.update_or_create(
+            source=source,
+            object_id=obj.pk,
+            defaults={field: getattr(entry, field) for field in CATALOG_FIELDS},
+        )
+        if not created:
+            saved.terms.all().delete()
+        MediaCatalogTerm.objects.bulk_create(_build_terms(saved.pk, entry.term_values))
+        index_entries([saved])
+        index_trigrams([saved])
+    schedule_related_refresh(saved.pk)
+    bump_facet_version()
+    return entry
+
+
+def sync_catalog_entry_by_id(model, pk):
+    """Refresh the catalog entry for a model/pk pair, removing it if the object is gone."""
+    source = get_source(model)
+    if source is None:
+        return
+    obj = get_catalog_queryset(source).filter(pk=pk).first()
+    if obj is None:
+        remove_catalog_entry(model, pk)
+    else:
+        sync_catalog_entry(obj)
+
+
+def remove_catalog_entry(model, pk):
+    """Delete the catalog entry for a model/pk pair."""
+    source = get_source(model)
+    if source is not None:
+        entries = MediaCatalogEntry.objects.filter(source=source, object_id=pk)
+        unindex_entries(list(entries.values_list('pk', flat=True)))
+        entries.delete()
+        bump_facet_version()
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _create_entries(source, model, objects):
+    """Insert catalog entries and terms for objects that have none; returns the saved entries."""
+    tag_names = get_tag_names(model, [obj.pk for obj in objects])
+    entries = [build_catalog_entry(obj, source, tag_names[obj.pk]) for obj in objects]
+    MediaCatalogEntry.objects.bulk_create(entries)
+    entry_ids = dict(
+        MediaCatalogEntry.objects.filter(
+            source=source, object_id__in=[entry.object_id for entry in entries]
+        ).values_list('object_id', 'pk')
+    )
+    for entry in entries:
+        entry.pk = entry_ids[entry.object_id]
+    MediaCatalogTerm.objects.bulk_create([
+        term
+        for entry in entries
+        for term in _build_terms(entry.pk, entry.term_values)
+    ])
+    return entries
+
+
+def rebuild_catalog(batch_size=1000, stdout=None):
+    """Rebuild every catalog entry from the media tables. Returns the number of entries."""
+    total = 0
+    with transaction.atomic():
+        MediaCatalogTerm.objects.all().delete()
+        MediaCatalogTrigram.objects.all().delete()
+        MediaRelation.objects.all().delete()
+        MediaCatalogEntry.objects.all().delete()
+        for source, (model, media_type) in MEDIA_SOURCES.items():
+            objects = get_catalog_queryset(source).order_by('pk').iterator(chunk_size=batch_size)
+            for batch in _batched(objects, batch_size):
+                _create_entries(source, model, batch)
+                total += len(batch)
+            if stdout is not None:
+                stdout.write(f'  {source}: done ({total} entries so far)')
+        rebuild_search_index()
+        rebuild_trigram_index(batch_size)
+        rebuild_related_media(batch_size)
+    bump_facet_version()
+    return total
+
+
+def add_missing_catalog_entries(batch_size=1000, stdout=None):
+    """
+    Create entries for media objects that have none, leaving existing
+    entries alone. Safe to run repeatedly; with a complete catalog it is
+    one indexed anti-join per source. Returns the number of entries added.
+    """
+    total = 0
+    for source, (model, media_type) in MEDIA_SOURCES.items():
+        existing = MediaCatalogEntry.objects.filter(source=source).values('object_id')
+        objects = (
+            get_catalog_queryset(source).exclude(pk__in=existing)
+            .order_by('pk').iterator(chunk_size=batch_size)
+        )
+        added = 0
+        for batch in _batched(objects, batch_size):
+            # Short transactions, so live signal writes are never blocked for long
+            with transaction.atomic():
+                entries = _create_entries(source, model, batch)
+                index_entries(entries)
+                index_trigrams(entries)
+                refresh_related(entries)
+            added += len(batch)
+        if stdout is not None and added:
+            stdout.write(f'  {source}: added {added} entries')
+        total += added
+    if total:
+        bump_facet_version()
+    return total
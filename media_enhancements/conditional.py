@@ -0,0 +1,118 @@
+"""
+Conditional GET
+ETag and Last-Modified validators derived from per-model ChangeStamp rows,
+so unchanged dashboard and API responses can be answered with 304 Not
+Modified before any serializer or template runs.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def get_model_label(model):
+    return model._meta.concrete_model._meta.label_lower
+
+
+def bump_change_stamps(*models):
+    """Record that objects of the given models changed."""
+    from .models import ChangeStamp
+
+    labels = {get_model_label(model) for model in models}
+    now = timezone.now()
+    updated = ChangeStamp.objects.filter(model_label__in=labels).update(
+        version=F('version') + 1, updated_at=now
+    )
+    if updated < len(labels):
+        ChangeStamp.objects.bulk_create(
+            [ChangeStamp(model_label=label, version=1, updated_at=now) for label in labels],
+            ignore_conflicts=True,
+        )
+
+
+def get_validators(models, *extra):
+    """
+    Return (etag, last_modified) for content built from the given models,
+    reading every stamp in one query. `extra` values (URL, user, ...) are
+    folded into the ETag.
+    """
+    from .models import ChangeStamp
+
+    labels = sorted({get_model_label(model) for model in models})
+    stamps = {}
+    last_modified = None
+    rows = ChangeStamp.objects.filter(model_label__in=labels).values_list('model_label', 'version', 'updated_at')
+    for label, version, updated_at in rows:
+        stamps[label] = version
+        if last_modified is None or updated_at > last_modified:
+            last_modified = updated_at
+    parts = [f'{label}:{stamps.get(label, 0)}' for label in labels]
+    parts.extend(str(value) for value in extra)
+    etag = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return etag, last_modified
+
+
+def request_validators(request, models, *extra):
+    """Validators for a response that also varies by URL, host, user and CSRF cookie."""
+    return get_validators(
+        models,
+        request.get_host(),
+        request.get_full_path(),
+        request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        *extra,
+    )
+
+
+def conditional_view(*models, extra=None):
+    """
+    Decorator for function views and viewset actions: answers 304 when the
+    request's validators match, otherwise runs the view and sets ETag and
+    Last-Modified. `extra(request)` may return further values to vary on.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            # Works for both view(request, ...) and method(self, request, ...)
+            request = args[1] if hasattr(args[0], 'request') else args[0]
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(*args, **kwargs)
+            etag, last_modified = request_validators(
+                request, models, *(extra(request) if extra else ())
+            )
+            etag = quote_etag(etag)
+            last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+            not_modified = get_conditional_response(
+                request, etag=etag, last_modified=last_modified_ts
+            )
+            if not_modified is not None:
+                return not_modified
+            response = view_func(*args, **kwargs)
+            if response.status_code == 200:
+                response.headers.setdefault('ETag', etag)
+                if last_modified_ts is not None:
+                    response.headers.setdefault('Last-Modified', http_date(last_modified_ts))
+                # Validators include the user and CSRF cookie
+                patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
+
+
+class ConditionalGetMixin:
+    """
+    Viewset mixin answering list and retrieve requests with 304 Not Modified
+    when none of `conditional_models` changed since the client's copy.
+    """
+    conditional_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return conditional_view(*self.conditional_models)(super().list)(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_view(*self.conditional_models)(super().retrieve)(request, *args, **kwargs)
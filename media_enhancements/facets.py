@@ -0,0 +1,116 @@
+"""
+Facet Counts
+Counts per media type, category, tag and folder for a filtered set of
+catalog entries, cached briefly so sidebars don't re-aggregate on every
+request.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .conditional import bump_change_stamps, get_model_label
+
+
+FACET_TAG_LIMIT = 20
+
+
+def get_facet_timeout():
+    return getattr(settings, 'MEDIA_FACET_CACHE_TIMEOUT', 30)
+
+
+def get_facet_version():
+    """Current catalog version; cached facets from older versions are ignored."""
+    from .models import ChangeStamp, MediaCatalogEntry
+
+    label = get_model_label(MediaCatalogEntry)
+    return ChangeStamp.objects.filter(model_label=label).values_list('version', flat=True).first() or 0
+
+
+def bump_facet_version():
+    """Invalidate every cached facet set after the catalog changes."""
+    from .models import MediaCatalogEntry
+
+    # A database stamp, so every process's facet cache sees the change
+    bump_change_stamps(MediaCatalogEntry)
+
+
+def _facet_cache_key(entries, tag_limit):
+    sql, params = entries.query.sql_with_params()
+    digest = hashlib.sha1(f'{sql}|{params!r}|{tag_limit}'.encode()).hexdigest()
+    return f'media_enhancements:facets:{get_facet_version()}:{digest}'
+
+
+def compute_facets(entries, tag_limit=FACET_TAG_LIMIT):
+    """
+    Aggregate facet counts for a MediaCatalogEntry queryset.
+
+    Media type and folder counts come from one query grouped on both
+    columns; category and tag counts come from the MediaCatalogTerm table.
+    """
+    from .models import Category, MediaCatalogTerm, MediaFolder
+
+    types = {'image': 0, 'document': 0, 'video': 0, 'audio': 0}
+    folder_counts = {}
+    grouped = (
+        entries.order_by()
+        .values_list('media_type', 'folder')
+        .annotate(count=Count('pk'))
+    )
+    for media_type, folder_id, count in grouped:
+        types[media_type] = types.get(media_type, 0) + count
+        if folder_id is not None:
+            folder_counts[folder_id] = folder_counts.get(folder_id, 0) + count
+
+    terms = MediaCatalogTerm.objects.filter(entry__in=entries.order_by().values('pk'))
+    category_counts = dict(
+        terms.filter(kind='category')
+        .values_list('value')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    tag_counts = list(
+        terms.filter(kind='tag')
+        .values_list('value')
+        .annotate(count=Count('pk'))
+        .order_by('-count', 'value')[:tag_limit]
+    )
+
+    category_names = dict(
+        Category.objects.filter(slug__in=category_counts).values_list('slug', 'name')
+    )
+    folder_names = dict(
+        MediaFolder.objects.filter(pk__in=folder_counts).values_list('pk', 'name')
+    )
+
+    return {
+        'types': types,
+        'total': sum(types.values()),
+        'categories': sorted(
+            (
+                {'slug': slug, 'name': category_names.get(slug, slug), 'count': count}
+                for slug, count in category_counts.items()
+            ),
+            key=lambda facet: (-facet['count'], facet['name']),
+        ),
+        'tags': [{'name': name, 'count': count} for name, count in tag_counts],
+        'folders': sorted(
+            (
+                {'id': pk, 'name': folder_names.get(pk, ''), 'count': count}
+                for pk, count in folder_counts.items()
+            ),
+            key=lambda facet: (-facet['count'], facet['name']),
+        ),
+    }
+
+
+def get_facets(entries, tag_limit=FACET_TAG_LIMIT):
+    """Facet counts for a MediaCatalogEntry queryset, served from cache when fresh."""
+    key = _facet_cache_key(entries, tag_limit)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(entries, tag_limit)
+        cache.set(key, facets, get_facet_timeout())
+    return facets
@@ -0,0 +1,76 @@
+"""
+Sparse Fieldsets
+`?fields=id,title` limits an API response to the named fields and
+`?expand=folder` adds optional fields to the default set. The queryset is
+narrowed with only() to the columns the selected fields read, and related
+data is only loaded for the fields that are present.
+"""
+
+from rest_framework.exceptions import ValidationError
+
+
+def _split(value):
+    return [name.strip() for name in value.split(',') if name.strip()] if value else []
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin accepting a `fields` keyword with the field names to
+    keep. Fields listed in `expandable_fields` are left out unless asked
+    for; `field_columns` maps method fields to the model columns they read.
+    """
+    expandable_fields = ()
+    field_columns = {}
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            fields = self.select_fields()
+        for name in list(self.fields):
+            if name not in fields:
+                self.fields.pop(name)
+
+    @classmethod
+    def select_fields(cls, fields=None, expand=None):
+        """Resolve requested and expanded names to the field names to serialize."""
+        available = list(cls.Meta.fields)
+        unknown = [name for name in (fields or []) + (expand or []) if name not in available]
+        if unknown:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}"})
+        if fields:
+            return [name for name in available if name in fields]
+        return [name for name in available if name not in cls.expandable_fields or name in (expand or [])]
+
+    @classmethod
+    def get_columns(cls, fields):
+        """Model columns needed to serialize the given fields."""
+        model_fields = {field.name for field in cls.Meta.model._meta.concrete_fields}
+        columns = {cls.Meta.model._meta.pk.name}
+        for name in fields:
+            if name in cls.field_columns:
+                columns.update(cls.field_columns[name])
+            elif name in model_fields:
+                columns.add(name)
+        return columns
+
+
+class SparseFieldsViewSetMixin:
+    """Viewset mixin reading `?fields=` and `?expand=` for a SparseFieldsMixin serializer."""
+
+    def get_selected_fields(self):
+        if not hasattr(self, '_selected_fields'):
+            params = self.request.query_params
+            self._selected_fields = self.get_serializer_class().select_fields(
+                _split(params.get('fields')), _split(params.get('expand'))
+            )
+        return self._selected_fields
+
+    def get_queryset(self):
+        columns = self.get_serializer_class().get_columns(self.get_selected_fields())
+        # Ordering and cursor pagination read these from the last row
+        columns.update(field.lstrip('-') for field in list(self.ordering) + list(self.ordering_fields))
+        return super().get_queryset().only(*columns)
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_selected_fields())
+        return super().get_serializer(*args, **kwargs)
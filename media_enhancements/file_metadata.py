@@ -0,0 +1,87 @@
+"""
+File Metadata
+Computes size, MIME type and SHA-256 content hash of media files once,
+when they are saved, so listings never need to query file storage.
+"""
+
+import hashlib
+import mimetypes
+
+import filetype
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+FILE_METADATA_FIELDS = ['file_size', 'mime_type', 'content_hash']
+
+
+def compute_file_metadata(field_file):
+    """
+    Stream a file once and return (size, mime_type, sha256 hex digest).
+    Works with uncommitted uploads as well as files already in storage.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    head = b''
+
+    # Leave uploads open for storage to save; close files we opened ourselves
+    should_close = field_file.closed
+    field_file.open('rb')
+    try:
+        for chunk in field_file.chunks(HASH_CHUNK_SIZE):
+            if len(head) < 261:
+                head += chunk[:261 - len(head)]
+            sha256.update(chunk)
+            size += len(chunk)
+        field_file.seek(0)
+    finally:
+        if should_close:
+            field_file.close()
+
+    kind = filetype.guess(head) if head else None
+    if kind is not None:
+        mime_type = kind.mime
+    else:
+        mime_type = mimetypes.guess_type(field_file.name or '')[0] or 'application/octet-stream'
+
+    return size, mime_type, sha256.hexdigest()
+
+
+def remember_file_name(instance):
+    """Record the current file name so later saves can tell whether the file changed."""
+    if 'file' in instance.__dict__:
+        value = instance.__dict__['file']
+        instance._loaded_file_name = getattr(value, 'name', value) or None
+
+
+def file_has_changed(instance):
+    """True when the instance's file was assigned or replaced since it was loaded or last saved."""
+    if 'file' not in instance.__dict__:
+        # Deferred and never assigned, so the file cannot have changed
+        return False
+    field_file = instance.file
+    if not getattr(field_file, '_committed', True):
+        return True
+    name = field_file.name or None
+    return name != getattr(instance, '_loaded_file_name', name)
+
+
+def file_metadata_is_stale(instance):
+    """
+    True when the instance's file is new or changed. Existing rows that
+    predate the metadata fields are left to backfill_file_metadata, so
+    unrelated edits never read the file from storage.
+    """
+    if 'file' not in instance.__dict__ or not instance.file:
+        return False
+    if file_has_changed(instance):
+        return True
+    # A new row created with a file that is already in storage
+    return instance._state.adding and not instance.content_hash
+
+
+def update_file_metadata(instance):
+    """Populate file_size, mime_type and content_hash from the instance's file."""
+    size, mime_type, content_hash = compute_file_metadata(instance.file)
+    instance.file_size = size
+    instance.mime_type = mime_type
+    instance.content_hash = content_hash
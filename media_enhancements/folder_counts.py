@@ -0,0 +1,82 @@
+"""
+Folder Counter Caches
+Incremental maintenance and reconciliation of the per-type and subtree
+media counts stored on MediaFolder.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import CustomImage, CustomDocument, Video, Audio, MediaFolder
+
+
+# Media model -> MediaFolder counter field for items directly in a folder
+FOLDER_COUNT_FIELDS = {
+    CustomImage: 'image_count',
+    CustomDocument: 'document_count',
+    Video: 'video_count',
+    Audio: 'audio_count',
+}
+
+
+def adjust_folder_counts(model, folder_id, delta):
+    """Add delta to a folder's count for a media model and to every ancestor's subtree count."""
+    if folder_id is None or not delta:
+        return
+    path = MediaFolder.objects.filter(pk=folder_id).values_list('path', flat=True).first()
+    if path is None:
+        return
+    field = FOLDER_COUNT_FIELDS[model]
+    with transaction.atomic():
+        MediaFolder.objects.filter(pk=folder_id).update(**{field: F(field) + delta})
+        MediaFolder.objects.filter(pk__in=MediaFolder.path_ids(path)).update(
+            subtree_media_count=F('subtree_media_count') + delta
+        )
+
+
+def remember_folder(instance):
+    """Record the folder the instance was loaded with, so moves can be detected."""
+    if 'folder_id' in instance.__dict__:
+        instance._loaded_folder_id = instance.folder_id
+
+
+def media_folder_changed(instance, created):
+    """Update counters after a media object is created or moved between folders."""
+    model = instance._meta.concrete_model
+    if created:
+        adjust_folder_counts(model, instance.folder_id, 1)
+    elif hasattr(instance, '_loaded_folder_id') and instance._loaded_folder_id != instance.folder_id:
+        adjust_folder_counts(model, instance._loaded_folder_id, -1)
+        adjust_folder_counts(model, instance.folder_id, 1)
+    remember_folder(instance)
+
+
+def reconcile_folder_counts():
+    """
+    Recompute every folder's counters from the media tables.
+    Returns the number of folders whose stored counts were wrong.
+    """
+    direct = {}
+    for model, field in FOLDER_COUNT_FIELDS.items():
+        rows = model.objects.filter(folder__isnull=False).values('folder').annotate(n=Count('pk'))
+        for row in rows:
+            direct.setdefault(row['folder'], {})[field] = row['n']
+
+    folders = list(MediaFolder.objects.only('pk', 'path', *MediaFolder.COUNTER_FIELDS))
+    subtree = {}
+    for folder in folders:
+        total = sum(direct.get(folder.pk, {}).values())
+        for ancestor_id in MediaFolder.path_ids(folder.path):
+            subtree[ancestor_id] = subtree.get(ancestor_id, 0) + total
+
+    changed = []
+    for folder in folders:
+        expected = {field: direct.get(folder.pk, {}).get(field, 0) for field in FOLDER_COUNT_FIELDS.values()}
+        expected['subtree_media_count'] = subtree.get(folder.pk, 0)
+        if any(getattr(folder, field) != value for field, value in expected.items()):
+            for field, value in expected.items():
+                setattr(folder, field, value)
+            changed.append(folder)
+
+    MediaFolder.objects.bulk_update(changed, MediaFolder.COUNTER_FIELDS, batch_size=500)
+    return len(changed)
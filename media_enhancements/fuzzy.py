@@ -0,0 +1,143 @@
+"""
+Fuzzy Search and Autocomplete
+Typo-tolerant matching on media titles and tag names. PostgreSQL uses
+pg_trgm word similarity over GIN trigram indexes; other databases use the
+MediaCatalogTrigram table, filled from trigrams computed in Python.
+"""
+
+import math
+import re
+
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Greatest, Lower
+from taggit.models import Tag
+
+
+# Share of the query's trigrams an entry must contain to count as a match
+TRIGRAM_THRESHOLD = 0.5
+AUTOCOMPLETE_LIMIT = 10
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: each lowercased word padded with two leading spaces and one trailing."""
+    grams = set()
+    for word in re.findall(r'\w+', (text or '').lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _uses_pg_trgm(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def index_trigrams(entries, using='default'):
+    """Refresh the stored trigrams of catalog entries (no-op on PostgreSQL)."""
+    from .models import MediaCatalogTrigram
+
+    if _uses_pg_trgm(using) or not entries:
+        return
+    MediaCatalogTrigram.objects.using(using).filter(entry__in=[entry.pk for entry in entries]).delete()
+    MediaCatalogTrigram.objects.using(using).bulk_create([
+        MediaCatalogTrigram(entry_id=entry.pk, gram=gram)
+        for entry in entries
+        for gram in sorted(trigrams(f'{entry.title} {entry.tag_names}'))
+    ])
+
+
+def rebuild_trigram_index(batch_size=1000, using='default'):
+    """Recompute every stored trigram from the catalog (no-op on PostgreSQL)."""
+    from .models import MediaCatalogEntry, MediaCatalogTrigram
+
+    if _uses_pg_trgm(using):
+        return
+    MediaCatalogTrigram.objects.using(using).all().delete()
+    entries = MediaCatalogEntry.objects.using(using).only('title', 'tag_names').order_by('pk')
+    batch = []
+    for entry in entries.iterator(chunk_size=batch_size):
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            index_trigrams(batch, using)
+            batch = []
+    index_trigrams(batch, using)
+
+
+def fuzzy_search_catalog(entries, query):
+    """
+    Filter a MediaCatalogEntry queryset to titles or tag names resembling the
+    query despite typos, annotated with `search_rank` (higher is better).
+    """
+    from .models import MediaCatalogTrigram
+
+    query = ' '.join(re.findall(r'\w+', (query or '').lower()))
+    if not query:
+        return entries.none()
+
+    if _uses_pg_trgm(entries.db):
+        return entries.filter(
+            TrigramWordSimilar(F('sort_title'), Value(query)) |
+            TrigramWordSimilar(F('tag_names'), Value(query))
+        ).annotate(
+            search_rank=Greatest(
+                TrigramWordSimilarity(query, 'sort_title'),
+                TrigramWordSimilarity(query, 'tag_names'),
+            )
+        )
+
+    grams = sorted(trigrams(query))
+    min_hits = max(1, math.ceil(len(grams) * TRIGRAM_THRESHOLD))
+    candidates = (
+        MediaCatalogTrigram.objects.filter(gram__in=grams)
+        .values('entry')
+        .annotate(hits=Count('pk'))
+        .filter(hits__gte=min_hits)
+        .values('entry')
+    )
+    hits = (
+        MediaCatalogTrigram.objects.filter(entry=OuterRef('pk'), gram__in=grams)
+        .order_by()
+        .values('entry')
+        .annotate(hits=Count('pk'))
+        .values('hits')
+    )
+    return entries.filter(pk__in=candidates).annotate(
+        search_rank=Cast(Subquery(hits), FloatField()) / Value(float(len(grams)))
+    )
+
+
+def autocomplete(prefix, limit=AUTOCOMPLETE_LIMIT, using='default'):
+    """
+    Titles and tag names starting with `prefix`, ignoring case, answered
+    with index range scans on the catalog title index and an index on
+    lowercased tag names.
+    """
+    from .models import MediaCatalogEntry
+
+    prefix = (prefix or '').strip()
+    if not prefix:
+        return {'titles': [], 'tags': []}
+    lowered = prefix.lower()
+
+    titles = (
+        MediaCatalogEntry.objects.using(using)
+        .filter(sort_title__gte=lowered, sort_title__lt=lowered + '\uffff')
+        .order_by('sort_title')
+        .values_list('title', flat=True)
+    )
+    # Tag names are unique in taggit's Tag table, so no DISTINCT pass is needed.
+    # The range on LOWER(name) is served by the taggit_tag_name_lower index.
+    tags = (
+        Tag.objects.using(using)
+        .annotate(lower_name=Lower('name'))
+        .filter(lower_name__gte=lowered, lower_name__lt=lowered + '\uffff')
+        .order_by('lower_name')
+        .values_list('name', flat=True)
+    )
+    return {
+        'titles': list(dict.fromkeys(titles[:limit * 2]))[:limit],
+        'tags': list(tags[:limit]),
+    }
+
@@ -3,12 +3,21 @@ Advanced Image Editing Tools
 Provides crop, rotate, flip, resize, watermark, compression, and format conversion
 """
 
-from PIL import Image, ImageDraw, ImageFont, ImageEnhance, ImageFilter
+from PIL import Image, ImageDraw, ImageFont, ImageEnhance, ImageFilter, features
 from io import BytesIO
 from django.core.files.base import ContentFile
+import math
 import os
 
 
+def _avif_available():
+    # AVIF support was added in Pillow 11.2 and needs libavif
+    try:
+        return features.check_module('avif')
+    except ValueError:
+        return False
+
+
 class ImageEditor:
     """
     Advanced image editing toolkit using Pillow.
@@ -29,23 +38,192 @@ class ImageEditor:
     }
     
     # Supported formats
-    SUPPORTED_FORMATS = ['JPEG', 'PNG', 'WEBP', 'GIF', 'BMP', 'TIFF']
+    SUPPORTED_FORMATS = ['JPEG', 'PNG', 'WEBP', 'GIF', 'BMP', 'TIFF'] + (['AVIF'] if _avif_available() else [])
+    
+    FORMAT_EXTENSIONS = {
+        'JPEG': 'jpg',
+        'PNG': 'png',
+        'WEBP': 'webp',
+        'GIF': 'gif',
+        'BMP': 'bmp',
+        'TIFF': 'tiff',
+        'AVIF': 'avif',
+    }
     
-    def __init__(self, image_path_or_file):
+    # Formats whose encoders take a 1-100 quality setting
+    LOSSY_FORMATS = ('JPEG', 'WEBP', 'AVIF')
+    
+    # Longest side of the downscaled copy auto_compress probes qualities on
+    PROBE_SIZE = 512
+    
+    # Recipe operation name -> call with its params, defaults included
+    OPERATIONS = {
+        'crop': lambda editor, p: editor.crop(p['left'], p['top'], p['right'], p['bottom']),
+        'crop_aspect': lambda editor, p: editor.crop_to_aspect_ratio(
+            p.get('aspect_ratio', 'square'), p.get('position', 'center')
+        ),
+        'rotate': lambda editor, p: editor.rotate(p.get('degrees', 90)),
+        'flip_horizontal': lambda editor, p: editor.flip_horizontal(),
+        'flip_vertical': lambda editor, p: editor.flip_vertical(),
+        'resize': lambda editor, p: editor.resize(
+            width=p.get('width'),
+            height=p.get('height'),
+            maintain_aspect=p.get('maintain_aspect', True),
+            quality=p.get('quality', 'high'),
+        ),
+        'watermark': lambda editor, p: editor.add_watermark(
+            text=p.get('text', '© Copyright'),
+            position=p.get('position', 'bottom-right'),
+            opacity=p.get('opacity', 128),
+            font_size=p.get('font_size', 36),
+            color=p.get('color', 'white'),
+        ),
+        'compress': lambda editor, p: editor.compress(quality=p.get('quality', 85)),
+        'auto_compress': lambda editor, p: editor.auto_compress(
+            target_size_kb=p.get('target_size_kb', 500),
+            format=p.get('format'),
+            subsampling=p.get('subsampling'),
+            allow_downscale=p.get('allow_downscale', False),
+        ),
+        'convert_format': lambda editor, p: editor.convert_format(p.get('format', 'WEBP')),
+        'enhance_brightness': lambda editor, p: editor.enhance_brightness(p.get('factor', 1.2)),
+        'enhance_contrast': lambda editor, p: editor.enhance_contrast(p.get('factor', 1.2)),
+        'enhance_color': lambda editor, p: editor.enhance_color(p.get('factor', 1.2)),
+        'enhance_sharpness': lambda editor, p: editor.enhance_sharpness(p.get('factor', 1.5)),
+        'apply_filter': lambda editor, p: editor.apply_filter(p.get('filter_name', 'sharpen')),
+        'grayscale': lambda editor, p: editor.grayscale(),
+    }
+    
+    # Params each operation takes as numbers; the rest (e.g. watermark text) stay strings
+    NUMERIC_PARAMS = {
+        'crop': ('left', 'top', 'right', 'bottom'),
+        'rotate': ('degrees',),
+        'resize': ('width', 'height'),
+        'watermark': ('opacity', 'font_size'),
+        'compress': ('quality',),
+        'auto_compress': ('target_size_kb',),
+        'enhance_brightness': ('factor',),
+        'enhance_contrast': ('factor',),
+        'enhance_color': ('factor',),
+        'enhance_sharpness': ('factor',),
+    }
+    
+    # Params given in source-image pixels, scaled when editing a preview proxy
+    PIXEL_PARAMS = {
+        'crop': ('left', 'top', 'right', 'bottom'),
+        'resize': ('width', 'height'),
+        'watermark': ('font_size',),
+    }
+    
+    def __init__(self, image_path_or_file, max_size=None):
         """
         Initialize with image path or file object.
+        
+        Args:
+            max_size: Decode a reduced proxy no larger than this many pixels
+                on either side, for fast previews. JPEGs are scaled by the
+                decoder itself (draft mode); other formats are box-reduced.
         """
         if isinstance(image_path_or_file, str):
             self.image = Image.open(image_path_or_file)
         else:
             self.image = Image.open(image_path_or_file)
         
+        # Operations return new images without a format, so remember it
+        self.source_format = self.image.format
+        self.source_size = self.image.size
+        self.scale = 1.0
+        if max_size:
+            self._reduce_to(max_size)
+        
         # Convert RGBA to RGB if needed for JPEG
         if self.image.mode == 'RGBA':
             self.original_mode = 'RGBA'
         else:
             self.original_mode = self.image.mode
     
+    def _reduce_to(self, max_size):
+        """Replace the image with a proxy at about max_size, decoding as little as possible."""
+        if max(self.image.size) <= max_size:
+            return
+        if self.image.format == 'JPEG':
+            # Shrink-on-load: decode at 1/2, 1/4 or 1/8 scale, still >= max_size
+            self.image.draft(self.image.mode, (max_size, max_size))
+        else:
+            factor = max(self.image.size) // max_size
+            if factor > 1:
+                try:
+                    self.image = self.image.reduce(factor)
+                except ValueError:
+                    # reduce() rejects some modes (P, 1, I;16); thumbnail() copes alone
+                    pass
+        self.image.thumbnail((max_size, max_size), Image.BILINEAR)
+        self.scale = self.image.width / self.source_size[0]
+    
+    def _scale_params(self, name, params):
+        if self.scale == 1.0 or name not in self.PIXEL_PARAMS:
+            return params
+        scaled = dict(params)
+        for key in self.PIXEL_PARAMS[name]:
+            value = scaled.get(key)
+            if value:
+                # Sizes never collapse to zero; zero coordinates stay zero
+                scaled[key] = max(1, round(value * self.scale))
+        return scaled
+    
+    @classmethod
+    def parse_recipe(cls, recipe):
+        """
+        Validate a recipe: a list of {"operation": name, "params": {...}}
+        steps, or a single such step. Returns [(name, params), ...].
+        """
+        if isinstance(recipe, dict):
+            recipe = [recipe]
+        if not isinstance(recipe, list) or not recipe:
+            raise ValueError("A recipe must be a non-empty list of operations")
+        steps = []
+        for step in recipe:
+            if not isinstance(step, dict):
+                raise ValueError("Each recipe step must be an object")
+            name = step.get('operation')
+            if name not in cls.OPERATIONS:
+                raise ValueError(f"Unknown operation: {name}")
+            params = step.get('params') or {}
+            if not isinstance(params, dict):
+                raise ValueError(f"Params for {name} must be an object")
+            steps.append((name, params))
+        return steps
+    
+    def apply_operation(self, name, params=None):
+        """Apply one named operation from OPERATIONS."""
+        if name not in self.OPERATIONS:
+            raise ValueError(f"Unknown operation: {name}")
+        self.OPERATIONS[name](self, self._scale_params(name, params or {}))
+        return self
+    
+    def apply_recipe(self, recipe):
+        """
+        Apply an ordered recipe to the decoded image. Every step works on
+        the same in-memory image, so the file is decoded once and encoded
+        once when saved, however many steps there are.
+        """
+        for name, params in self.parse_recipe(recipe):
+            self.apply_operation(name, params)
+        return self
+    
+    @property
+    def output_format(self):
+        """Format to encode with: the converted format, else the source format."""
+        format = getattr(self, 'target_format', None) or self.source_format
+        return format if format in self.SUPPORTED_FORMATS else 'JPEG'
+    
+    def output_filename(self, filename):
+        """filename with its extension changed to match output_format, if it doesn't already."""
+        root, ext = os.path.splitext(filename)
+        if Image.registered_extensions().get(ext.lower()) == self.output_format:
+            return filename
+        return f"{root}.{self.FORMAT_EXTENSIONS[self.output_format]}"
+    
     def crop(self, left, top, right, bottom):
         """
         Crop image to specified coordinates.
@@ -249,27 +427,141 @@ class ImageEditor:
         self.compression_quality = quality
         return self
     
-    def auto_compress(self, target_size_kb=500):
+    def auto_compress(self, target_size_kb=500, format=None, min_quality=10, max_quality=95,
+                      subsampling=None, allow_downscale=False):
         """
-        Automatically compress to target file size.
+        Pick the highest quality whose encoded size fits a target.
+        
+        Qualities are bisected on a downscaled probe, whose sizes are
+        scaled up to full size, and the choice is confirmed with a full-size
+        encode. A miss recalibrates the probe-to-full ratio from the real
+        encode and the search repeats; the result never exceeds the target
+        unless min_quality itself does.
         
         Args:
             target_size_kb: Target file size in kilobytes
+            format: JPEG, WEBP or AVIF (defaults to the output format when
+                lossy, else JPEG)
+            min_quality, max_quality: Quality search range
+            subsampling: Chroma subsampling for JPEG/AVIF, e.g. '4:2:0'
+            allow_downscale: Shrink the image when min_quality still doesn't fit
         """
-        quality = 95
-        while quality > 10:
-            output = BytesIO()
-            self.save_to_buffer(output, format='JPEG', quality=quality)
-            size_kb = len(output.getvalue()) / 1024
-            
-            if size_kb <= target_size_kb:
+        if format is None:
+            format = self.output_format if self.output_format in self.LOSSY_FORMATS else 'JPEG'
+        format = format.upper()
+        if format not in self.LOSSY_FORMATS or format not in self.SUPPORTED_FORMATS:
+            raise ValueError(f"Cannot compress to a target size as {format}")
+        self.target_format = format
+        self.chroma_subsampling = subsampling
+        target = target_size_kb * 1024
+        
+        for attempt in range(3):
+            quality, data = self._fit_quality(format, target, min_quality, max_quality)
+            if len(data) <= target or not allow_downscale:
                 break
-            
-            quality -= 5
+            # Bytes scale roughly with pixel count
+            factor = math.sqrt(target / len(data)) * 0.95
+            size = (max(1, int(self.image.width * factor)), max(1, int(self.image.height * factor)))
+            self.image = self.image.resize(size, Image.LANCZOS)
         
         self.compression_quality = quality
+        self.compressed_size = len(data)
+        # get_django_file() reuses this encode while the image is unchanged
+        self._encoded = (self.image, format, quality, subsampling, data)
         return self
     
+    def _fit_quality(self, format, target, min_quality, max_quality):
+        """Return (quality, full-size encoded bytes) for the best quality fitting target bytes."""
+        if format == 'JPEG' and self.image.mode not in ('RGB', 'L'):
+            self.image = self.image.convert('RGB')
+        probe = self.image
+        if max(probe.size) > self.PROBE_SIZE:
+            probe = probe.copy()
+            probe.thumbnail((self.PROBE_SIZE, self.PROBE_SIZE), Image.BILINEAR)
+        probe_sizes = {}
+        full = {}
+        # Full-size/probe byte ratio per quality encoded at full size; starts
+        # from the pixel count ratio
+        ratios = {}
+        pixel_ratio = (self.image.width * self.image.height) / (probe.width * probe.height)
+        
+        def ratio_at(quality):
+            if not ratios:
+                return pixel_ratio
+            known = sorted(ratios)
+            below = [q for q in known if q <= quality]
+            above = [q for q in known if q >= quality]
+            if not below or not above:
+                return ratios[below[-1] if below else above[0]]
+            low, high = below[-1], above[0]
+            if low == high:
+                return ratios[low]
+            weight = (quality - low) / (high - low)
+            return ratios[low] + (ratios[high] - ratios[low]) * weight
+        
+        def probe_size(quality):
+            if quality not in probe_sizes:
+                probe_sizes[quality] = len(self._encode(probe, format, quality))
+            return probe_sizes[quality]
+        
+        def full_size(quality):
+            if quality not in full:
+                full[quality] = self._encode(self.image, format, quality)
+            return len(full[quality])
+        
+        def bisect(low, high, fits):
+            best = None
+            while low <= high:
+                middle = (low + high) // 2
+                if fits(middle):
+                    best = middle
+                    low = middle + 1
+                else:
+                    high = middle - 1
+            return best
+        
+        # Highest quality known to fit, lowest known to overshoot
+        fitting, over = None, max_quality + 1
+        for attempt in range(4):
+            low = fitting + 1 if fitting is not None else min_quality
+            quality = bisect(low, over - 1, lambda q: probe_size(q) * ratio_at(q) <= target) or low
+            if quality >= over or quality in full:
+                break
+            size = full_size(quality)
+            if size <= target:
+                fitting = quality
+                # Within 10% of the target, or no higher quality left to try
+                if size >= target * 0.9 or quality == over - 1:
+                    break
+            else:
+                over = quality
+            ratios[quality] = size / probe_size(quality)
+        
+        if fitting is None or len(full[fitting]) < target * 0.9:
+            # The probe misled us; settle the remaining range with full-size encodes
+            low = fitting + 1 if fitting is not None else min_quality
+            fitting = bisect(low, over - 1, lambda q: full_size(q) <= target) or fitting
+            if fitting is None:
+                fitting = min_quality
+                full_size(fitting)
+        return fitting, full[fitting]
+    
+    def _save_kwargs(self, format, quality):
+        save_kwargs = {}
+        if format in self.LOSSY_FORMATS:
+            save_kwargs['quality'] = quality
+            if format == 'JPEG':
+                save_kwargs['optimize'] = True
+            subsampling = getattr(self, 'chroma_subsampling', None)
+            if subsampling and format in ('JPEG', 'AVIF'):
+                save_kwargs['subsampling'] = subsampling
+        return save_kwargs
+    
+    def _encode(self, image, format, quality):
+        buffer = BytesIO()
+        image.save(buffer, format=format, **self._save_kwargs(format, quality))
+        return buffer.getvalue()
+    
     def convert_format(self, format='WEBP'):
         """
         Convert image to different format.
@@ -358,11 +650,7 @@ class ImageEditor:
         if format == 'JPEG' and self.image.mode not in ('RGB', 'L'):
             self.image = self.image.convert('RGB')
         
-        save_kwargs = {}
-        if format in ('JPEG', 'WEBP'):
-            save_kwargs['quality'] = getattr(self, 'compression_quality', quality)
-            save_kwargs['optimize'] = True
-        
+        save_kwargs = self._save_kwargs(format, getattr(self, 'compression_quality', quality))
         self.image.save(output_path, format=format, **save_kwargs)
         return output_path
     
@@ -379,12 +667,14 @@ class ImageEditor:
         if format == 'JPEG' and self.image.mode not in ('RGB', 'L'):
             self.image = self.image.convert('RGB')
         
-        save_kwargs = {}
-        if format in ('JPEG', 'WEBP'):
-            save_kwargs['quality'] = getattr(self, 'compression_quality', quality)
-            save_kwargs['optimize'] = True
-        
-        self.image.save(buffer, format=format, **save_kwargs)
+        quality = getattr(self, 'compression_quality', quality)
+        encoded = getattr(self, '_encoded', None)
+        subsampling = getattr(self, 'chroma_subsampling', None)
+        if encoded and encoded[0] is self.image and encoded[1:4] == (format, quality, subsampling):
+            # auto_compress already produced exactly this encode
+            buffer.write(encoded[4])
+        else:
+            self.image.save(buffer, format=format, **self._save_kwargs(format, quality))
         buffer.seek(0)
         return buffer
     
@@ -4,11 +4,15 @@ Views for Image Editor functionality
 
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from .models import CustomImage
+from .batch_editing import run_batch
 from .image_editor import ImageEditor
+from .preview_cache import PreviewCache, preview_cache_key
 from io import BytesIO
 import json
 
@@ -34,86 +38,25 @@ def image_editor_view(request, image_id):
 def apply_edit(request, image_id):
     """
     Apply editing operations to an image.
+    Accepts {"recipe": [{"operation": ..., "params": {...}}, ...]} or a
+    single {"operation": ..., "params": {...}}.
     """
     image = get_object_or_404(CustomImage, id=image_id)
     
     try:
-        # Get edit parameters
+        # Get edit parameters: a "recipe" list, or a single operation
         data = json.loads(request.body)
-        operation = data.get('operation')
-        params = data.get('params', {})
+        recipe = data.get('recipe') or {'operation': data.get('operation'), 'params': data.get('params', {})}
         save_as_new = data.get('save_as_new', False)
         
-        # Create editor instance
-        editor = ImageEditor(image.file.path)
-        
-        # Apply operation
-        if operation == 'crop':
-            editor.crop(
-                params['left'],
-                params['top'],
-                params['right'],
-                params['bottom']
-            )
-        
-        elif operation == 'crop_aspect':
-            editor.crop_to_aspect_ratio(
-                params.get('aspect_ratio', 'square'),
-                params.get('position', 'center')
-            )
-        
-        elif operation == 'rotate':
-            editor.rotate(params.get('degrees', 90))
-        
-        elif operation == 'flip_horizontal':
-            editor.flip_horizontal()
-        
-        elif operation == 'flip_vertical':
-            editor.flip_vertical()
-        
-        elif operation == 'resize':
-            editor.resize(
-                width=params.get('width'),
-                height=params.get('height'),
-                maintain_aspect=params.get('maintain_aspect', True),
-                quality=params.get('quality', 'high')
-            )
-        
-        elif operation == 'watermark':
-            editor.add_watermark(
-                text=params.get('text', '© Copyright'),
-                position=params.get('position', 'bottom-right'),
-                opacity=params.get('opacity', 128),
-                font_size=params.get('font_size', 36),
-                color=params.get('color', 'white')
-            )
-        
-        elif operation == 'compress':
-            editor.compress(quality=params.get('quality', 85))
-        
-        elif operation == 'convert_format':
-            editor.convert_format(params.get('format', 'WEBP'))
-        
-        elif operation == 'enhance_brightness':
-            editor.enhance_brightness(params.get('factor', 1.2))
-        
-        elif operation == 'enhance_contrast':
-            editor.enhance_contrast(params.get('factor', 1.2))
-        
-        elif operation == 'enhance_color':
-            editor.enhance_color(params.get('factor', 1.2))
-        
-        elif operation == 'enhance_sharpness':
-            editor.enhance_sharpness(params.get('factor', 1.5))
-        
-        elif operation == 'apply_filter':
-            editor.apply_filter(params.get('filter_name', 'sharpen'))
-        
-        elif operation == 'grayscale':
-            editor.grayscale()
+        try:
+            ImageEditor.parse_recipe(recipe)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         
-        else:
-            return JsonResponse({'error': 'Unknown operation'}, status=400)
+        # Decode once, apply every step, encode once
+        editor = ImageEditor(image.file.path)
+        editor.apply_recipe(recipe)
         
         # Save the edited image
         if save_as_new:
@@ -127,14 +70,8 @@ def apply_edit(request, image_id):
             )
             
             # Save file
-            format_ext = params.get('format', 'JPEG').lower()
-            if format_ext == 'jpeg':
-                format_ext = 'jpg'
-            
-            filename = f"edited_{image.file.name.split('/')[-1]}"
-            filename = filename.rsplit('.', 1)[0] + f'.{format_ext}'
-            
-            django_file = editor.get_django_file(filename, format=params.get('format', 'JPEG'))
+            filename = editor.output_filename(f"edited_{image.file.name.split('/')[-1]}")
+            django_file = editor.get_django_file(filename, format=editor.output_format)
             new_image.file.save(filename, django_file, save=True)
             
             # Copy categories and tags
@@ -150,8 +87,8 @@ def apply_edit(request, image_id):
             })
         else:
             # Update existing image
-            filename = image.file.name.split('/')[-1]
-            django_file = editor.get_django_file(filename)
+            filename = editor.output_filename(image.file.name.split('/')[-1])
+            django_file = editor.get_django_file(filename, format=editor.output_format)
             image.file.save(filename, django_file, save=True)
             
             return JsonResponse({
@@ -164,107 +101,139 @@ def apply_edit(request, image_id):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+PREVIEW_SIZE = 800
+MAX_PREVIEW_SIZE = 2000
+
+# ?format= value -> (Pillow format, content type)
+PREVIEW_FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'webp': ('WEBP', 'image/webp'),
+}
+
+
+def _query_value(value):
+    """Numeric params arrive in query strings as text; convert them back."""
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _preview_response(data, content_type, etag):
+    response = HttpResponse(data, content_type=content_type)
+    response['ETag'] = etag
+    # The URL stays the same when the image is edited, so always revalidate
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @login_required
 def preview_edit(request, image_id):
     """
-    Preview editing operation without saving.
+    Preview editing operations without saving.
+    Takes ?recipe=<JSON list> or ?operation=...&<params>, plus ?size= for
+    the longest side and ?format=jpeg|webp. The original is decoded at
+    about that size, and results are cached by image content and recipe
+    (see preview_cache.py), so repeated previews skip Pillow entirely.
     """
     image = get_object_or_404(CustomImage, id=image_id)
     
     try:
-        # Get edit parameters from query string
-        operation = request.GET.get('operation')
-        
-        # Create editor instance
-        editor = ImageEditor(image.file.path)
-        
-        # Apply operation based on query parameters
-        if operation == 'rotate':
-            degrees = int(request.GET.get('degrees', 90))
-            editor.rotate(degrees)
-        
-        elif operation == 'flip_horizontal':
-            editor.flip_horizontal()
-        
-        elif operation == 'flip_vertical':
-            editor.flip_vertical()
-        
-        elif operation == 'grayscale':
-            editor.grayscale()
-        
-        elif operation == 'enhance_brightness':
-            factor = float(request.GET.get('factor', 1.2))
-            editor.enhance_brightness(factor)
+        recipe = None
+        if 'recipe' in request.GET:
+            recipe = json.loads(request.GET['recipe'])
+        elif 'operation' in request.GET:
+            operation = request.GET.get('operation')
+            numeric = ImageEditor.NUMERIC_PARAMS.get(operation, ())
+            params = {
+                key: _query_value(value) if key in numeric else value
+                for key, value in request.GET.items()
+                if key not in ('operation', 'size', 'format')
+            }
+            recipe = {'operation': operation, 'params': params}
+        size = max(1, min(int(request.GET.get('size', PREVIEW_SIZE)), MAX_PREVIEW_SIZE))
+        steps = ImageEditor.parse_recipe(recipe) if recipe is not None else []
+        format, content_type = PREVIEW_FORMATS[request.GET.get('format', 'jpeg').lower()]
+    except KeyError:
+        return HttpResponse("Error: Unsupported preview format", status=400)
+    except ValueError as e:
+        return HttpResponse(f"Error: {str(e)}", status=400)
+    
+    # Without a content hash there is nothing safe to key the cache on
+    key = preview_cache_key(image.content_hash, steps, size, format) if image.content_hash else None
+    preview_cache = PreviewCache()
+    if key:
+        etag = quote_etag(key)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            patch_cache_control(not_modified, private=True, no_cache=True)
+            return not_modified
+        data = preview_cache.get(key)
+        if data is not None:
+            return _preview_response(data, content_type, etag)
+    
+    try:
+        # Decode a reduced proxy and apply the recipe to it
+        editor = ImageEditor(image.file.path, max_size=size)
+        if recipe is not None:
+            editor.apply_recipe(recipe)
         
-        # Return image as HTTP response
         buffer = BytesIO()
-        editor.save_to_buffer(buffer, format='JPEG', quality=85)
-        
-        return HttpResponse(buffer.getvalue(), content_type='image/jpeg')
+        editor.save_to_buffer(buffer, format=format, quality=80)
+        data = buffer.getvalue()
     
     except Exception as e:
         return HttpResponse(f"Error: {str(e)}", status=500)
+    
+    if not key:
+        return HttpResponse(data, content_type=content_type)
+    preview_cache.set(key, data)
+    return _preview_response(data, content_type, etag)
 
 
 @login_required
 def batch_process(request):
     """
     Batch process multiple images.
+    Edits run in a process pool and are saved in chunks. Results come back
+    in request order, or with {"stream": true} as newline-delimited JSON in
+    the order images finish.
     """
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            image_ids = data.get('image_ids', [])
-            operation = data.get('operation')
-            params = data.get('params', {})
-            
-            results = []
-            
-            for image_id in image_ids:
-                try:
-                    image = CustomImage.objects.get(id=image_id)
-                    editor = ImageEditor(image.file.path)
-                    
-                    # Apply operation
-                    if operation == 'resize':
-                        editor.resize(
-                            width=params.get('width'),
-                            height=params.get('height')
-                        )
-                    elif operation == 'watermark':
-                        editor.add_watermark(
-                            text=params.get('text', '© Copyright'),
-                            position=params.get('position', 'bottom-right')
-                        )
-                    elif operation == 'convert_format':
-                        editor.convert_format(params.get('format', 'WEBP'))
-                    elif operation == 'compress':
-                        editor.compress(quality=params.get('quality', 85))
-                    
-                    # Save
-                    filename = image.file.name.split('/')[-1]
-                    django_file = editor.get_django_file(filename)
-                    image.file.save(filename, django_file, save=True)
-                    
-                    results.append({
-                        'image_id': image_id,
-                        'success': True
-                    })
-                
-                except Exception as e:
-                    results.append({
-                        'image_id': image_id,
-                        'success': False,
-                        'error': str(e)
-                    })
-            
-            return JsonResponse({
-                'success': True,
-                'results': results
-            })
+        except ValueError:
+            return JsonResponse({'error': 'Request body must be JSON'}, status=400)
+        image_ids = data.get('image_ids', [])
+        if not isinstance(image_ids, list) or not all(
+            isinstance(image_id, (int, float, str)) for image_id in image_ids
+        ):
+            return JsonResponse({'error': 'image_ids must be a list of image ids'}, status=400)
+        recipe = data.get('recipe') or {'operation': data.get('operation'), 'params': data.get('params', {})}
+        
+        try:
+            ImageEditor.parse_recipe(recipe)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        results = run_batch(image_ids, recipe)
+        if data.get('stream'):
+            # One JSON object per line, sent as each chunk of images finishes
+            return StreamingHttpResponse(
+                (json.dumps(result) + '\n' for result in results),
+                content_type='application/x-ndjson',
+            )
         
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
+        # Results echo the requested ids, so they sort back into request order
+        order = {}
+        for index, image_id in enumerate(image_ids):
+            order.setdefault(image_id, index)
+        return JsonResponse({
+            'success': True,
+            'results': sorted(results, key=lambda result: order[result['image_id']])
+        })
     
     # GET request - show batch processing interface
     images = CustomImage.objects.all()[:50]  # Limit for performance
@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from media_enhancements.file_metadata import FILE_METADATA_FIELDS, compute_file_metadata
+from media_enhancements.models import CustomImage, CustomDocument, Video, Audio
+
+
+def _hash_file(obj):
+    try:
+        return obj, compute_file_metadata(obj.file), None
+    except Exception as e:
+        return obj, None, e
+
+
+class Command(BaseCommand):
+    help = 'Store file size, MIME type and SHA-256 content hash for existing media files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=min(32, (os.cpu_count() or 1) * 4),
+            help='Number of files read and hashed in parallel',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Number of rows updated per database write',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Recompute metadata even for files that already have a content hash',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for model in (CustomImage, CustomDocument, Video, Audio):
+                queryset = model.objects.exclude(file='').only('pk', 'file', *FILE_METADATA_FIELDS)
+                if not options['force']:
+                    queryset = queryset.filter(Q(content_hash='') | Q(file_size__isnull=True))
+
+                updated = failed = 0
+                objects = queryset.order_by('pk').iterator(chunk_size=batch_size)
+                while chunk := list(islice(objects, batch_size)):
+                    # Storage reads overlap across threads; rows are written from this thread
+                    batch = []
+                    for obj, metadata, error in executor.map(_hash_file, chunk):
+                        if error is not None:
+                            failed += 1
+                            self.stdout.write(self.style.WARNING(
+                                f'  Skipped {model.__name__} {obj.pk} ({obj.file.name}): {error}'
+                            ))
+                            continue
+                        obj.file_size, obj.mime_type, obj.content_hash = metadata
+                        batch.append(obj)
+                    model.objects.bulk_update(batch, FILE_METADATA_FIELDS)
+                    updated += len(batch)
+
+                self.stdout.write(self.style.SUCCESS(
+                    f'{model._meta.verbose_name_plural}: updated {updated}, failed {failed}'
+                ))
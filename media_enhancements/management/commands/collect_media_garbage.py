@@ -0,0 +1,64 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from media_enhancements.media_gc import delete_files, find_orphans, get_referenced_files
+
+
+class Command(BaseCommand):
+    help = 'Find (and optionally delete) renditions and derivative files no longer referenced in the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='Delete the orphaned files (default is to only report them)',
+        )
+        parser.add_argument(
+            '--min-age-hours',
+            type=float,
+            default=24,
+            help='Ignore files modified more recently than this, e.g. renditions still being saved',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Number of parallel delete requests',
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Print every orphaned file',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Collecting referenced file paths...')
+        referenced = get_referenced_files()
+        self.stdout.write(f'  {len(referenced)} files referenced')
+
+        found = 0
+        reclaimable = 0
+
+        def orphans():
+            nonlocal found, reclaimable
+            min_age = options['min_age_hours'] * 3600
+            for name, size in find_orphans(default_storage, referenced, min_age):
+                found += 1
+                reclaimable += size
+                if options['list']:
+                    self.stdout.write(f'  {name} ({filesizeformat(size)})')
+                yield name
+
+        if options['delete']:
+            deleted = delete_files(default_storage, orphans(), workers=options['workers'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Deleted {deleted} of {found} orphaned files, reclaiming up to {filesizeformat(reclaimable)}'
+            ))
+        else:
+            for name in orphans():
+                pass
+            self.stdout.write(self.style.SUCCESS(
+                f'Found {found} orphaned files ({filesizeformat(reclaimable)} reclaimable). '
+                f'Run with --delete to remove them.'
+            ))
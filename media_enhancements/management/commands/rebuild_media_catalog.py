@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from media_enhancements.catalog import add_missing_catalog_entries, rebuild_catalog
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the unified media catalog from all media models'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of objects loaded and inserted per batch',
+        )
+        parser.add_argument(
+            '--missing-only',
+            action='store_true',
+            help='Only add entries for media that have none, leaving the rest of the catalog alone',
+        )
+
+    def handle(self, *args, **options):
+        if options['missing_only']:
+            self.stdout.write('Adding missing media catalog entries...')
+            total = add_missing_catalog_entries(batch_size=options['batch_size'], stdout=self.stdout)
+            self.stdout.write(self.style.SUCCESS(f'Added {total} catalog entries'))
+            return
+
+        self.stdout.write('Rebuilding media catalog...')
+        total = rebuild_catalog(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt media catalog with {total} entries')
+        )
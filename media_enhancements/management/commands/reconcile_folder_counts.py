@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from media_enhancements.folder_counts import reconcile_folder_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the cached media counts stored on every media folder'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Reconciling folder media counts...')
+        changed = reconcile_folder_counts()
+        if changed:
+            self.stdout.write(
+                self.style.WARNING(f'Corrected counts on {changed} folders')
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS('All folder counts are up to date'))
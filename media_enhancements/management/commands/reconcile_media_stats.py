@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from media_enhancements.media_stats import reconcile_media_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the media totals and per-category image counts used by the stats API'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Reconciling media stats...')
+        changed = reconcile_media_stats()
+        if changed:
+            self.stdout.write(
+                self.style.WARNING(f'Corrected {changed} counters')
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS('All media stats are up to date'))
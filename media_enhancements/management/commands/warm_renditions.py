@@ -0,0 +1,154 @@
+import json
+import multiprocessing
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from wagtail.images import get_image_model
+from wagtail.images.exceptions import InvalidFilterSpecError
+from wagtail.images.models import Filter
+
+from media_enhancements.models import CustomImage
+from media_enhancements.rendition_warming import (
+    find_template_filter_specs, init_worker, missing_renditions, render_batch,
+)
+from media_enhancements.thumbnails import THUMBNAIL_FILTERS
+
+
+class Command(BaseCommand):
+    help = 'Pre-generate missing image renditions in parallel, resuming where the last run stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'filter_specs',
+            nargs='*',
+            help='Filter specs to render, e.g. fill-300x200 "width-800|format-webp". '
+                 'Defaults to the specs found in templates plus the dashboard thumbnails.',
+        )
+        parser.add_argument(
+            '--from-templates',
+            action='store_true',
+            help='Also render every filter spec used by image tags in templates',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Number of images sent to a worker at a time',
+        )
+        parser.add_argument(
+            '--progress-file',
+            default=os.path.join(tempfile.gettempdir(), 'warm_renditions.json'),
+            help='File recording the last image processed, used to resume interrupted runs',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore saved progress and check every image again',
+        )
+
+    def get_filter_specs(self, options):
+        specs = list(options['filter_specs'])
+        if options['from_templates'] or not specs:
+            specs += find_template_filter_specs()
+        if not options['filter_specs']:
+            specs += THUMBNAIL_FILTERS
+        specs = sorted(set(specs))
+        for spec in specs:
+            try:
+                Filter(spec=spec).operations
+            except InvalidFilterSpecError as e:
+                raise CommandError(f'Invalid filter spec "{spec}": {e}')
+        return specs
+
+    def load_progress(self, path, specs, restart):
+        if restart or not os.path.exists(path):
+            return {}
+        try:
+            with open(path) as progress_file:
+                progress = json.load(progress_file)
+        except (OSError, ValueError):
+            return {}
+        # Progress only carries over to a run with the same filter specs
+        if progress.get('filter_specs') != specs:
+            return {}
+        return progress.get('last_pk', {})
+
+    def save_progress(self, path, specs, last_pk):
+        with open(path, 'w') as progress_file:
+            json.dump({'filter_specs': specs, 'last_pk': last_pk}, progress_file)
+
+    def handle(self, *args, **options):
+        specs = self.get_filter_specs(options)
+        if not specs:
+            self.stdout.write('No filter specs to render.')
+            return
+
+        progress_path = options['progress_file']
+        last_pk = self.load_progress(progress_path, specs, options['restart'])
+        batch_size = options['batch_size']
+        window = max(1, options['workers']) * 2
+        self.stdout.write(f'Warming {len(specs)} filter spec(s): {", ".join(specs)}')
+
+        # Spawned workers start clean and open their own database connections,
+        # rather than inheriting this process's connections through fork()
+        executor = ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+        )
+        with executor:
+            for image_model in dict.fromkeys([CustomImage, get_image_model()]):
+                model_label = image_model._meta.label
+                start_pk = last_pk.get(model_label, 0)
+                if start_pk:
+                    self.stdout.write(f'{model_label}: resuming after image {start_pk}')
+
+                images = (
+                    image_model.objects.filter(pk__gt=start_pk)
+                    .exclude(file='')
+                    .order_by('pk')
+                    .iterator(chunk_size=batch_size)
+                )
+                created = checked = 0
+                failed = []
+                pending = deque()
+
+                def collect():
+                    nonlocal created
+                    batch_last_pk, future = pending.popleft()
+                    if future is not None:
+                        batch_created, errors = future.result()
+                        created += batch_created
+                        failed.extend(errors)
+                    # Batches are collected in submission order, so every image
+                    # up to this one has been handled
+                    last_pk[model_label] = batch_last_pk
+                    self.save_progress(progress_path, specs, last_pk)
+
+                while batch := list(islice(images, batch_size)):
+                    checked += len(batch)
+                    work = list(missing_renditions(batch, specs).items())
+                    future = executor.submit(render_batch, model_label, work) if work else None
+                    pending.append((batch[-1].pk, future))
+                    if len(pending) >= window:
+                        collect()
+                        self.stdout.write(f'  Checked {checked} images, created {created} renditions')
+                while pending:
+                    collect()
+
+                for pk, error in failed:
+                    self.stdout.write(self.style.WARNING(f'  Failed image {pk}: {error}'))
+                self.stdout.write(self.style.SUCCESS(
+                    f'{model_label}: checked {checked} images, created {created} renditions, '
+                    f'{len(failed)} images failed'
+                ))
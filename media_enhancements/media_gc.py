@@ -0,0 +1,154 @@
+"""
+Media Garbage Collection
+Finds rendition and derivative files (thumbnails, previews, waveforms,
+GIFs) that no database row references any more, and deletes them.
+
+Storage listings are streamed: os.scandir for local files, paginated
+list_objects_v2 calls for S3, so memory is bounded by the set of
+referenced paths rather than the size of the bucket.
+"""
+
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.apps import apps
+from django.db import models
+
+
+# Wagtail writes every rendition (for any image model) under this directory
+RENDITIONS_DIR = 'images/'
+
+# Files written next to their source by the video, document and audio processors
+DERIVATIVE_PATTERN = re.compile(r'(_thumb(_\d+)?\.jpg|_preview\.jpg|_waveform\.png|\.gif)$', re.IGNORECASE)
+
+# S3 DeleteObjects accepts at most 1000 keys per request
+S3_DELETE_BATCH = 1000
+LOCAL_DELETE_BATCH = 100
+
+
+def is_collectable(name):
+    """Whether a storage path is a rendition or processor derivative, and so safe to collect."""
+    return name.startswith(RENDITIONS_DIR) or bool(DERIVATIVE_PATTERN.search(name))
+
+
+def get_referenced_files():
+    """Every file path stored in a FileField of any installed model."""
+    referenced = set()
+    for model in apps.get_models():
+        if model._meta.proxy or not model._meta.managed:
+            continue
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                names = (
+                    model._default_manager.exclude(**{field.name: ''})
+                    .exclude(**{f'{field.name}__isnull': True})
+                    .values_list(field.name, flat=True)
+                )
+                referenced.update(names.iterator(chunk_size=5000))
+    return referenced
+
+
+def _is_s3(storage):
+    return hasattr(storage, 'bucket') and hasattr(storage, 'bucket_name')
+
+
+def _iter_local_files(root, prefix=''):
+    """Yield (relative name, size, modified timestamp) under a directory using os.scandir."""
+    try:
+        entries = os.scandir(os.path.join(root, prefix))
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            name = f'{prefix}{entry.name}'
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_local_files(root, f'{name}/')
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                yield name, stat.st_size, stat.st_mtime
+
+
+def _iter_s3_files(storage):
+    """Yield (name, size, modified timestamp) for every object, one listing page at a time."""
+    location = storage.location.strip('/')
+    prefix = f'{location}/' if location else ''
+    paginator = storage.connection.meta.client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=storage.bucket_name, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            yield obj['Key'][len(prefix):], obj['Size'], obj['LastModified'].timestamp()
+
+
+def _iter_storage_files(storage, prefix=''):
+    """Fallback for other backends: walk listdir() and ask for sizes and times."""
+    directories, files = storage.listdir(prefix)
+    for name in files:
+        path = f'{prefix}{name}'
+        yield path, storage.size(path), storage.get_modified_time(path).timestamp()
+    for directory in directories:
+        yield from _iter_storage_files(storage, f'{prefix}{directory}/')
+
+
+def iter_files(storage):
+    """Stream (name, size, modified timestamp) for every file in a storage."""
+    if _is_s3(storage):
+        return _iter_s3_files(storage)
+    if hasattr(storage, 'location') and os.path.isdir(storage.location):
+        return _iter_local_files(storage.location)
+    return _iter_storage_files(storage)
+
+
+def find_orphans(storage, referenced, min_age=0):
+    """
+    Yield (name, size) for collectable files that are not referenced and
+    were last modified more than `min_age` seconds ago.
+    """
+    cutoff = time.time() - min_age
+    for name, size, modified in iter_files(storage):
+        if modified <= cutoff and is_collectable(name) and name not in referenced:
+            yield name, size
+
+
+def _delete_s3_batch(storage, names):
+    location = storage.location.strip('/')
+    prefix = f'{location}/' if location else ''
+    response = storage.connection.meta.client.delete_objects(
+        Bucket=storage.bucket_name,
+        Delete={'Objects': [{'Key': f'{prefix}{name}'} for name in names], 'Quiet': True},
+    )
+    return len(names) - len(response.get('Errors', []))
+
+
+def _delete_batch(storage, names):
+    deleted = 0
+    for name in names:
+        try:
+            storage.delete(name)
+            deleted += 1
+        except OSError:
+            pass
+    return deleted
+
+
+def delete_files(storage, names, workers=8, batch_size=None):
+    """Delete files in parallel batches. Returns the number deleted."""
+    if _is_s3(storage):
+        delete_batch = _delete_s3_batch
+        batch_size = min(batch_size or S3_DELETE_BATCH, S3_DELETE_BATCH)
+    else:
+        delete_batch = _delete_batch
+        batch_size = batch_size or LOCAL_DELETE_BATCH
+    names = iter(names)
+    deleted = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Keep a bounded number of batches in flight so names can keep streaming in
+        pending = deque()
+        while batch := list(islice(names, batch_size)):
+            pending.append(executor.submit(delete_batch, storage, batch))
+            if len(pending) >= workers * 2:
+                deleted += pending.popleft().result()
+        deleted += sum(future.result() for future in pending)
+    return deleted
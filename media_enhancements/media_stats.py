@@ -0,0 +1,98 @@
+"""
+Media Stats Snapshot
+Running totals for the stats API kept in MediaStatCounter rows and on
+Category.image_count, so the endpoint reads a handful of small rows and
+a bounded recent-uploads feed instead of counting whole tables.
+"""
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Category, CustomDocument, CustomImage, MediaStatCounter
+
+
+# Model -> MediaStatCounter name, adjusted on every create and delete
+STAT_COUNTERS = {
+    CustomImage: 'images',
+    CustomDocument: 'documents',
+    Category: 'categories',
+}
+
+RECENT_UPLOADS_LIMIT = 10
+
+
+def adjust_stat_counter(model, delta):
+    """Add delta to a model's counter after one of its rows was created or deleted."""
+    name = STAT_COUNTERS[model]
+    if not MediaStatCounter.objects.filter(name=name).update(value=F('value') + delta):
+        # First use: seed from the table, which already reflects this change
+        MediaStatCounter.objects.bulk_create(
+            [MediaStatCounter(name=name, value=model.objects.count())], ignore_conflicts=True
+        )
+
+
+def adjust_category_image_counts(category_ids, delta):
+    """Add delta to the image count of each given category after links were added or removed."""
+    if category_ids:
+        Category.objects.filter(pk__in=category_ids).update(image_count=F('image_count') + delta)
+
+
+def refresh_category_image_counts(category_ids=None):
+    """Recount the images in the given categories (all categories when None)."""
+    through = CustomImage.categories.through
+    counts = (
+        through.objects.filter(category=OuterRef('pk'))
+        .order_by().values('category')
+        .annotate(n=Count('pk')).values('n')
+    )
+    categories = Category.objects.all()
+    if category_ids is not None:
+        if not category_ids:
+            return
+        categories = categories.filter(pk__in=category_ids)
+    categories.update(image_count=Coalesce(Subquery(counts), 0))
+
+
+def get_media_stats():
+    """The stats API payload, read from the counters and two bounded queries."""
+    totals = dict(MediaStatCounter.objects.values_list('name', 'value'))
+    return {
+        'total_images': totals.get('images', 0),
+        'total_documents': totals.get('documents', 0),
+        'total_categories': totals.get('categories', 0),
+        'images_by_category': list(Category.objects.values('name', 'image_count')),
+        'recent_uploads': {
+            'images': list(
+                CustomImage.objects.order_by('-created_at')[:RECENT_UPLOADS_LIMIT].values(
+                    'id', 'title', 'created_at'
+                )
+            ),
+            'documents': list(
+                CustomDocument.objects.order_by('-created_at')[:RECENT_UPLOADS_LIMIT].values(
+                    'id', 'title', 'created_at'
+                )
+            ),
+        },
+    }
+
+
+def reconcile_media_stats():
+    """
+    Recompute every counter from the media tables.
+    Returns the number of counters whose stored value was wrong.
+    """
+    changed = 0
+    for model, name in STAT_COUNTERS.items():
+        actual = model.objects.count()
+        counter, created = MediaStatCounter.objects.get_or_create(name=name, defaults={'value': actual})
+        if counter.value != actual:
+            counter.value = actual
+            counter.save(update_fields=['value'])
+            changed += 1
+
+    expected = dict(
+        Category.objects.annotate(n=Count('customimage')).values_list('pk', 'n')
+    )
+    stale = [pk for pk, count in Category.objects.values_list('pk', 'image_count') if expected[pk] != count]
+    refresh_category_image_counts(stale)
+    return changed + len(stale)
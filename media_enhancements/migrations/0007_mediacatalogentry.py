@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_enhancements', '0006_alter_category_options_alter_customdocument_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaCatalogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('media_type', models.CharField(choices=[('image', 'Image'), ('document', 'Document'), ('video', 'Video'), ('audio', 'Audio')], max_length=20)),
+                ('title', models.CharField(max_length=255)),
+                ('sort_title', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('file_size', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('file_url', models.CharField(blank=True, max_length=500)),
+                ('thumbnail_url', models.CharField(blank=True, max_length=500)),
+                ('tag_names', models.TextField(blank=True)),
+                ('category_slugs', models.TextField(blank=True, help_text="Comma-delimited slugs wrapped in commas, e.g. ',nature,travel,'")),
+                ('folder', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='catalog_entries', to='media_enhancements.mediafolder')),
+            ],
+            options={
+                'verbose_name': 'Media Catalog Entry',
+                'verbose_name_plural': 'Media Catalog Entries',
+                'indexes': [models.Index(fields=['created_at', 'source', 'object_id'], name='catalog_created_idx'), models.Index(fields=['sort_title', 'source', 'object_id'], name='catalog_title_idx'), models.Index(fields=['media_type', '-created_at'], name='catalog_type_created_idx'), models.Index(fields=['folder', '-created_at'], name='catalog_folder_created_idx')],
+                'unique_together': {('source', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:23
+
+from django.db import migrations, models
+
+
+def populate_folder_paths(apps, schema_editor):
+    MediaFolder = apps.get_model('media_enhancements', 'MediaFolder')
+    folders = list(MediaFolder.objects.only('pk', 'parent_id'))
+    children = {}
+    for folder in folders:
+        children.setdefault(folder.parent_id, []).append(folder)
+
+    # Walk the tree down from the root folders
+    queue = [(folder, '/', 0) for folder in children.get(None, [])]
+    while queue:
+        folder, parent_path, depth = queue.pop()
+        folder.path = f'{parent_path}{folder.pk}/'
+        folder.depth = depth
+        queue.extend((child, folder.path, depth + 1) for child in children.get(folder.pk, []))
+
+    MediaFolder.objects.bulk_update(folders, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_enhancements', '0009_media_file_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafolder',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mediafolder',
+            name='path',
+            field=models.TextField(blank=True, db_index=True, editable=False),
+        ),
+        migrations.RunPython(populate_folder_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:25
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# Media model -> MediaFolder counter field for items directly in a folder
+FOLDER_COUNT_FIELDS = {
+    'CustomImage': 'image_count',
+    'CustomDocument': 'document_count',
+    'Video': 'video_count',
+    'Audio': 'audio_count',
+}
+
+
+def populate_folder_counts(apps, schema_editor):
+    MediaFolder = apps.get_model('media_enhancements', 'MediaFolder')
+    direct = {}
+    for model_name, field in FOLDER_COUNT_FIELDS.items():
+        model = apps.get_model('media_enhancements', model_name)
+        rows = model.objects.filter(folder__isnull=False).values('folder').annotate(n=Count('pk'))
+        for row in rows:
+            direct.setdefault(row['folder'], {})[field] = row['n']
+
+    folders = list(MediaFolder.objects.only('pk', 'path'))
+    subtree = {}
+    for folder in folders:
+        total = sum(direct.get(folder.pk, {}).values())
+        # The materialized path lists the folder's ancestors and itself
+        for ancestor_id in (int(pk) for pk in folder.path.strip('/').split('/') if pk):
+            subtree[ancestor_id] = subtree.get(ancestor_id, 0) + total
+
+    for folder in folders:
+        for field in FOLDER_COUNT_FIELDS.values():
+            setattr(folder, field, direct.get(folder.pk, {}).get(field, 0))
+        folder.subtree_media_count = subtree.get(folder.pk, 0)
+    MediaFolder.objects.bulk_update(
+        folders, [*FOLDER_COUNT_FIELDS.values(), 'subtree_media_count'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_enhancements', '0010_mediafolder_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafolder',
+            name='audio_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mediafolder',
+            name='document_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mediafolder',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mediafolder',
+            name='subtree_media_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Media in this folder and all of its subfolders'),
+        ),
+        migrations.AddField(
+            model_name='mediafolder',
+            name='video_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_folder_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_enhancements', '0011_mediafolder_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaCatalogTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('category', 'Category'), ('tag', 'Tag')], max_length=10)),
+                ('value', models.CharField(max_length=255)),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='media_enhancements.mediacatalogentry')),
+            ],
+            options={
+                'verbose_name': 'Media Catalog Term',
+                'verbose_name_plural': 'Media Catalog Terms',
+                'indexes': [models.Index(fields=['kind', 'value'], name='catalog_term_kind_value_idx')],
+            },
+        ),
+    ]
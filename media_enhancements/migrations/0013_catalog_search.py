@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:30
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import OperationalError, migrations, models
+
+
+def create_index(apps, schema_editor):
+    """GIN tsvector index on PostgreSQL; an FTS5 table on SQLite."""
+    MediaCatalogEntry = apps.get_model('media_enhancements', 'MediaCatalogEntry')
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        vector = (
+            SearchVector('title', weight='A', config='english') +
+            SearchVector('tag_names', weight='B', config='english') +
+            SearchVector('search_text', weight='C', config='english')
+        )
+        schema_editor.add_index(MediaCatalogEntry, GinIndex(vector, name='catalog_search_gin'))
+    elif connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS media_catalog_fts '
+                'USING fts5(title, tag_names, search_text, tokenize="porter unicode61")'
+            )
+        except OperationalError:
+            # SQLite built without FTS5: search falls back to icontains
+            return
+        schema_editor.execute(
+            'INSERT INTO media_catalog_fts (rowid, title, tag_names, search_text) '
+            f'SELECT id, title, tag_names, search_text FROM "{MediaCatalogEntry._meta.db_table}"'
+        )
+
+
+def drop_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS catalog_search_gin')
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS media_catalog_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_enhancements', '0012_mediacatalogterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediacatalogentry',
+            name='search_text',
+            field=models.TextField(blank=True, help_text='Category names and descriptive fields indexed for full-text search'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:34
+
+import re
+
+import django.db.models.deletion
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams, as computed when this migration was written."""
+    grams = set()
+    for word in re.findall(r'\w+', (text or '').lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def create_indexes(apps, schema_editor):
+    """pg_trgm GIN indexes on PostgreSQL; elsewhere, fill MediaCatalogTrigram."""
+    MediaCatalogEntry = apps.get_model('media_enhancements', 'MediaCatalogEntry')
+    if schema_editor.connection.vendor == 'postgresql':
+        for field in ('sort_title', 'tag_names'):
+            schema_editor.add_index(MediaCatalogEntry, GinIndex(
+                fields=[field], name=f'catalog_{field}_trgm', opclasses=['gin_trgm_ops'],
+            ))
+        return
+    MediaCatalogTrigram = apps.get_model('media_enhancements', 'MediaCatalogTrigram')
+    MediaCatalogTrigram.objects.bulk_create(
+        (
+            MediaCatalogTrigram(entry_id=pk, gram=gram)
+            for pk, title, tag_names in MediaCatalogEntry.objects.values_list('pk', 'title', 'tag_names').iterator()
+            for gram in sorted(trigrams(f'{title} {tag_names}'))
+        ),
+        batch_size=1000,
+    )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for field in ('sort_title', 'tag_names'):
+            schema_editor.execute(f'DROP INDEX IF EXISTS catalog_{field}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_enhancements', '0013_catalog_search'),
+    ]
+
+    operations = [
+        # Only runs on PostgreSQL; a no-op on other databases
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='MediaCatalogTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=3)),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='media_enhancements.mediacatalogentry')),
+            ],
+            options={
+                'verbose_name': 'Media Catalog Trigram',
+                'verbose_name_plural': 'Media Catalog Trigrams',
+                'indexes': [models.Index(fields=['gram', 'entry'], name='catalog_trigram_gram_idx')],
+                'unique_together': {('entry', 'gram')},
+            },
+        ),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_enhancements', '0015_changestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaRelation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relations', to='media_enhancements.mediacatalogentry')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='media_enhancements.mediacatalogentry')),
+            ],
+            options={
+                'verbose_name': 'Media Relation',
+                'verbose_name_plural': 'Media Relations',
+                'indexes': [models.Index(fields=['entry', '-score'], name='media_relation_score_idx')],
+                'unique_together': {('entry', 'related')},
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_media_stats(apps, schema_editor):
+    MediaStatCounter = apps.get_model('media_enhancements', 'MediaStatCounter')
+    CustomImage = apps.get_model('media_enhancements', 'CustomImage')
+    CustomDocument = apps.get_model('media_enhancements', 'CustomDocument')
+    Category = apps.get_model('media_enhancements', 'Category')
+
+    MediaStatCounter.objects.bulk_create(
+        [
+            MediaStatCounter(name='images', value=CustomImage.objects.count()),
+            MediaStatCounter(name='documents', value=CustomDocument.objects.count()),
+            MediaStatCounter(name='categories', value=Category.objects.count()),
+        ],
+        ignore_conflicts=True,
+    )
+
+    through = CustomImage._meta.get_field('categories').remote_field.through
+    counts = (
+        through.objects.filter(category=OuterRef('pk'))
+        .order_by().values('category')
+        .annotate(n=Count('pk')).values('n')
+    )
+    Category.objects.update(image_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_enhancements', '0016_mediarelation'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+        ('wagtailcore', '0096_referenceindex_referenceindex_source_object_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaStatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Media Stat Counter',
+                'verbose_name_plural': 'Media Stat Counters',
+            },
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_media_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_enhancements', '0017_media_stats'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        # Case-insensitive tag autocomplete range-scans LOWER(name); the
+        # index lives on taggit's table, so it is created here
+        migrations.RunSQL(
+            'CREATE INDEX taggit_tag_name_lower ON taggit_tag (LOWER(name))',
+            'DROP INDEX IF EXISTS taggit_tag_name_lower',
+        ),
+    ]
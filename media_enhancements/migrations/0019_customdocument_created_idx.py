@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_enhancements', '0018_tag_name_lower_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customdocument',
+            index=models.Index(fields=['-created_at'], name='customdocument_created_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_enhancements', '0019_customdocument_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerializerVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=100)),
+                ('object_id', models.PositiveBigIntegerField(default=0)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Serializer Version',
+                'verbose_name_plural': 'Serializer Versions',
+                'unique_together': {('model_label', 'object_id')},
+            },
+        ),
+    ]
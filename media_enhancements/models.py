@@ -1,4 +1,7 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.forms import CheckboxSelectMultiple
 from django.utils.translation import gettext_lazy as _
 from modelcluster.fields import ParentalKey
@@ -49,6 +52,10 @@ class CustomImage(AbstractImage):
         verbose_name=_("Folder")
     )
 
+    # Persisted file metadata (see file_metadata.py)
+    mime_type = models.CharField(max_length=100, blank=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
+
     # Use modelcluster tagging
     tags = ClusterTaggableManager(blank=True)
 
@@ -119,6 +126,10 @@ class CustomDocument(AbstractDocument):
         verbose_name=_("Folder")
     )
 
+    # Persisted file metadata (see file_metadata.py)
+    mime_type = models.CharField(max_length=100, blank=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
+
     # Use modelcluster tagging
     tags = ClusterTaggableManager(blank=True)
 
@@ -136,6 +147,9 @@ class CustomDocument(AbstractDocument):
     class Meta(AbstractDocument.Meta):
         verbose_name = _('Custom Document')
         verbose_name_plural = _('Custom Documents')
+        indexes = [
+            models.Index(fields=['-created_at'], name='customdocument_created_idx'),
+        ]
 
 
 # --- Taxonomy Model (Categories) ---
@@ -153,6 +167,9 @@ class Category(TranslatableMixin, ClusterableModel):
     )
     description = models.TextField(blank=True)
 
+    # Counter cache maintained by signals.py; repaired by reconcile_media_stats
+    image_count = models.PositiveIntegerField(default=0, editable=False)
+
     panels = [
         FieldPanel('name'),
         FieldPanel('slug'),
@@ -162,6 +179,15 @@ class Category(TranslatableMixin, ClusterableModel):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # Never write the counter from memory; it is only changed with UPDATE queries
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'image_count'
+            ]
+        super().save(*args, **kwargs)
+
     class Meta(TranslatableMixin.Meta):
         verbose_name_plural = 'Categories'
         ordering = ['name']
@@ -223,27 +249,104 @@ class MediaFolder(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Materialized path of ancestor ids including this folder, e.g. '/1/5/9/'.
+    # Maintained by save(); lets subtree and ancestor lookups run as one query.
+    path = models.TextField(blank=True, editable=False, db_index=True)
+    depth = models.PositiveIntegerField(default=0, editable=False)
+    
+    # Counter caches maintained by signals.py; repaired by reconcile_folder_counts
+    image_count = models.PositiveIntegerField(default=0, editable=False)
+    document_count = models.PositiveIntegerField(default=0, editable=False)
+    video_count = models.PositiveIntegerField(default=0, editable=False)
+    audio_count = models.PositiveIntegerField(default=0, editable=False)
+    subtree_media_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Media in this folder and all of its subfolders"
+    )
+    
+    COUNTER_FIELDS = ('image_count', 'document_count', 'video_count', 'audio_count', 'subtree_media_count')
+    
     def __str__(self):
         return self.name
     
+    @staticmethod
+    def path_ids(path):
+        """Folder ids encoded in a materialized path, from the root down."""
+        return [int(pk) for pk in path.strip('/').split('/') if pk]
+    
+    def clean(self):
+        super().clean()
+        if self.pk and self.parent_id:
+            if self.parent_id == self.pk or (self.path and self.parent.path.startswith(self.path)):
+                raise ValidationError({'parent': _("A folder cannot be moved inside itself.")})
+    
+    def save(self, *args, **kwargs):
+        old_path = None
+        if self.pk:
+            old_path = MediaFolder.objects.filter(pk=self.pk).values_list('path', flat=True).first()
+        parent_path = self.parent.path if self.parent_id else '/'
+        if old_path and parent_path.startswith(old_path):
+            raise ValueError("A folder cannot be moved inside itself.")
+        
+        if old_path is not None and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # Never write counters from memory; they are only changed with F() updates
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            
+            new_path = f'{parent_path}{self.pk}/'
+            if new_path == old_path:
+                return
+            new_depth = new_path.count('/') - 2
+            if old_path:
+                # Re-root the whole subtree in a single UPDATE
+                old_depth = old_path.count('/') - 2
+                MediaFolder.objects.filter(path__startswith=old_path).update(
+                    path=Concat(Value(new_path), Substr('path', len(old_path) + 1), output_field=models.TextField()),
+                    depth=F('depth') + (new_depth - old_depth),
+                )
+                # Move the subtree's media total from the old ancestors to the new ones
+                moved = MediaFolder.objects.filter(pk=self.pk).values_list('subtree_media_count', flat=True).get()
+                if moved:
+                    MediaFolder.objects.filter(pk__in=self.path_ids(old_path)[:-1]).update(
+                        subtree_media_count=F('subtree_media_count') - moved
+                    )
+                    MediaFolder.objects.filter(pk__in=self.path_ids(new_path)[:-1]).update(
+                        subtree_media_count=F('subtree_media_count') + moved
+                    )
+            else:
+                MediaFolder.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+            self.path = new_path
+            self.depth = new_depth
+    
     def get_children(self):
         return self.children.all()
     
+    def get_ancestors(self, include_self=False):
+        """Ancestors from the root down, fetched in one query."""
+        ids = self.path_ids(self.path)
+        if not include_self:
+            ids = ids[:-1]
+        return MediaFolder.objects.filter(pk__in=ids).order_by('depth')
+    
+    def get_descendants(self, include_self=False):
+        """Every folder in this folder's subtree, fetched with one indexed prefix query."""
+        descendants = MediaFolder.objects.filter(path__startswith=self.path)
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
+    
     def get_media_count(self):
-        count = 0
-        count += self.images.count() if hasattr(self, 'images') else 0
-        count += self.videos.count() if hasattr(self, 'videos') else 0
-        count += self.audio_files.count() if hasattr(self, 'audio_files') else 0
-        count += self.documents.count() if hasattr(self, 'documents') else 0
-        return count
+        return self.image_count + self.document_count + self.video_count + self.audio_count
+    get_media_count.short_description = 'Media'
     
     def get_breadcrumbs(self):
-        breadcrumbs = []
-        current = self
-        while current:
-            breadcrumbs.insert(0, current)
-            current = current.parent
-        return breadcrumbs
+        return list(self.get_ancestors(include_self=True))
     
     def can_delete(self):
         return not self.is_system_folder and self.get_media_count() == 0 and not self.get_children().exists()
@@ -260,6 +363,9 @@ class Video(models.Model):
     """Video file model."""
     title = models.CharField(max_length=255)
     file = models.FileField(upload_to='videos/')
+    file_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    mime_type = models.CharField(max_length=100, blank=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
     thumbnail = models.ImageField(upload_to='video_thumbnails/', blank=True, null=True)
     description = models.TextField(blank=True)
     duration = models.DurationField(blank=True, null=True)
@@ -292,6 +398,9 @@ class Audio(models.Model):
     """Audio file model."""
     title = models.CharField(max_length=255)
     file = models.FileField(upload_to='audio/')
+    file_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    mime_type = models.CharField(max_length=100, blank=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
     thumbnail = models.ImageField(upload_to='audio_thumbnails/', blank=True, null=True)
     description = models.TextField(blank=True)
     duration = models.DurationField(blank=True, null=True)
@@ -316,3 +425,194 @@ class Audio(models.Model):
         verbose_name = 'Audio'
         verbose_name_plural = 'Audio Files'
         ordering = ['-created_at']
+
+
+# --- Unified Media Catalog ---
+
+class MediaCatalogEntry(models.Model):
+    """
+    Denormalized listing row for every media object across all media models.
+    Kept in sync by the signal handlers in signals.py.
+    """
+    MEDIA_TYPE_CHOICES = [
+        ('image', 'Image'),
+        ('document', 'Document'),
+        ('video', 'Video'),
+        ('audio', 'Audio'),
+    ]
+
+    source = models.CharField(max_length=20)
+    object_id = models.PositiveBigIntegerField()
+    media_type = models.CharField(max_length=20, choices=MEDIA_TYPE_CHOICES)
+    title = models.CharField(max_length=255)
+    sort_title = models.CharField(max_length=255)
+    created_at = models.DateTimeField(null=True, blank=True)
+    folder = models.ForeignKey(
+        MediaFolder,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='catalog_entries'
+    )
+    file_size = models.PositiveBigIntegerField(null=True, blank=True)
+    file_url = models.CharField(max_length=500, blank=True)
+    thumbnail_url = models.CharField(max_length=500, blank=True)
+    tag_names = models.TextField(blank=True)
+    category_slugs = models.TextField(
+        blank=True,
+        help_text="Comma-delimited slugs wrapped in commas, e.g. ',nature,travel,'"
+    )
+    search_text = models.TextField(
+        blank=True,
+        help_text="Category names and descriptive fields indexed for full-text search"
+    )
+
+    def __str__(self):
+        return f"{self.media_type}: {self.title}"
+
+    class Meta:
+        verbose_name = 'Media Catalog Entry'
+        verbose_name_plural = 'Media Catalog Entries'
+        unique_together = (('source', 'object_id'),)
+        indexes = [
+            models.Index(fields=['created_at', 'source', 'object_id'], name='catalog_created_idx'),
+            models.Index(fields=['sort_title', 'source', 'object_id'], name='catalog_title_idx'),
+            models.Index(fields=['media_type', '-created_at'], name='catalog_type_created_idx'),
+            models.Index(fields=['folder', '-created_at'], name='catalog_folder_created_idx'),
+        ]
+
+
+class MediaCatalogTerm(models.Model):
+    """
+    One row per category or tag attached to a catalog entry, so facet counts
+    can be computed with a grouped query instead of parsing delimited strings.
+    """
+    KIND_CHOICES = [
+        ('category', 'Category'),
+        ('tag', 'Tag'),
+    ]
+
+    entry = models.ForeignKey(
+        MediaCatalogEntry,
+        on_delete=models.CASCADE,
+        related_name='terms'
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    value = models.CharField(max_length=255)
+
+    def __str__(self):
+        return f"{self.kind}: {self.value}"
+
+    class Meta:
+        verbose_name = 'Media Catalog Term'
+        verbose_name_plural = 'Media Catalog Terms'
+        indexes = [
+            models.Index(fields=['kind', 'value'], name='catalog_term_kind_value_idx'),
+        ]
+
+
+class MediaCatalogTrigram(models.Model):
+    """
+    Trigrams of catalog entry titles and tag names, used for typo-tolerant
+    search on databases without pg_trgm (see fuzzy.py).
+    """
+    entry = models.ForeignKey(
+        MediaCatalogEntry,
+        on_delete=models.CASCADE,
+        related_name='trigrams'
+    )
+    gram = models.CharField(max_length=3)
+
+    def __str__(self):
+        return self.gram
+
+    class Meta:
+        verbose_name = 'Media Catalog Trigram'
+        verbose_name_plural = 'Media Catalog Trigrams'
+        unique_together = (('entry', 'gram'),)
+        indexes = [
+            models.Index(fields=['gram', 'entry'], name='catalog_trigram_gram_idx'),
+        ]
+
+
+class MediaStatCounter(models.Model):
+    """
+    Running totals shown by the media stats API, adjusted by signals.py on
+    every create and delete so the endpoint never counts whole tables.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+    class Meta:
+        verbose_name = 'Media Stat Counter'
+        verbose_name_plural = 'Media Stat Counters'
+
+
+class MediaRelation(models.Model):
+    """
+    Precomputed "related media" pairs between catalog entries of the same
+    source, scored by shared categories, shared tags and folder proximity.
+    Maintained by related.py whenever an entry's catalog row is synced.
+    """
+    entry = models.ForeignKey(
+        MediaCatalogEntry,
+        on_delete=models.CASCADE,
+        related_name='relations'
+    )
+    related = models.ForeignKey(
+        MediaCatalogEntry,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField()
+
+    def __str__(self):
+        return f"{self.entry_id} -> {self.related_id} ({self.score})"
+
+    class Meta:
+        verbose_name = 'Media Relation'
+        verbose_name_plural = 'Media Relations'
+        unique_together = (('entry', 'related'),)
+        indexes = [
+            models.Index(fields=['entry', '-score'], name='media_relation_score_idx'),
+        ]
+
+
+class ChangeStamp(models.Model):
+    """
+    Per-model change counter, bumped whenever an object of that model (or
+    its tags/categories) changes. Used to build cheap HTTP validators.
+    """
+    model_label = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.model_label} v{self.version}"
+
+    class Meta:
+        verbose_name = 'Change Stamp'
+        verbose_name_plural = 'Change Stamps'
+
+
+class SerializerVersion(models.Model):
+    """
+    Version of an object's cached API representation, bumped by signals.py
+    when the object, its tags or its categories change. object_id 0 stands
+    for every object of the model. Kept in the database so a bump made by
+    one process is seen by all of them.
+    """
+    model_label = models.CharField(max_length=100)
+    object_id = models.PositiveBigIntegerField(default=0)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.model_label}:{self.object_id} v{self.version}"
+
+    class Meta:
+        verbose_name = 'Serializer Version'
+        verbose_name_plural = 'Serializer Versions'
+        unique_together = (('model_label', 'object_id'),)
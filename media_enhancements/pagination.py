@@ -0,0 +1,145 @@
+"""
+Keyset (cursor) pagination for media listings.
+Pages are located with an indexed WHERE clause on the sort key instead of
+OFFSET, so deep pages cost the same as the first one and no COUNT is run.
+"""
+
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.pagination import CursorPagination
+
+
+class MediaCursorPagination(CursorPagination):
+    """
+    Cursor pagination for the media API viewsets, newest first.
+    Honours OrderingFilter, e.g. ?ordering=title. DRF's cursor seeks on the
+    first ordering field only and steps past rows sharing its value with an
+    offset, so the trailing id just keeps those ties in a stable order.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def encode_cursor(values):
+    """Encode a tuple of sort key values as an opaque URL-safe cursor."""
+    payload = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor created by encode_cursor. Raises ValueError on bad input."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(values, list):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return values
+
+
+class KeysetPage:
+    """A single page of a keyset-paginated listing."""
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by a tuple of fields sharing one direction,
+    e.g. ('-created_at', '-source', '-object_id'). The last field must be unique
+    within the listing so that every row has a distinct position.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        descending = {field.startswith('-') for field in ordering}
+        if len(descending) != 1:
+            raise ValueError("Keyset ordering fields must all sort in the same direction")
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in ordering]
+        self.descending = descending.pop()
+        self.per_page = per_page
+
+    def _position(self, obj):
+        return tuple(getattr(obj, field) for field in self.fields)
+
+    def _to_python(self, values):
+        if len(values) != len(self.fields):
+            raise ValueError("Cursor does not match the listing ordering")
+        return [self._output_field(field).to_python(value) for field, value in zip(self.fields, values)]
+
+    def _output_field(self, field):
+        annotation = self.queryset.query.annotations.get(field)
+        if annotation is not None:
+            return annotation.output_field
+        return self.queryset.model._meta.get_field(field)
+
+    def _seek(self, values, forward):
+        """Q object selecting rows strictly after (or before) the given position."""
+        lookup = 'lt' if self.descending == forward else 'gt'
+        clauses = []
+        for i, field in enumerate(self.fields):
+            equal = {name: value for name, value in zip(self.fields[:i], values[:i])}
+            clauses.append(Q(**equal, **{f'{field}__{lookup}': values[i]}))
+        return reduce(or_, clauses)
+
+    def get_page(self, after=None, before=None):
+        """
+        Return the page following the `after` cursor, preceding the `before`
+        cursor, or the first page. Invalid cursors fall back to the first page.
+        """
+        queryset = self.queryset
+        forward = True
+        try:
+            if before:
+                queryset = queryset.filter(self._seek(self._to_python(decode_cursor(before)), forward=False))
+                forward = False
+            elif after:
+                queryset = queryset.filter(self._seek(self._to_python(decode_cursor(after)), forward=True))
+        except (ValueError, ValidationError):
+            queryset, forward, after, before = self.queryset, True, None, None
+
+        if forward:
+            ordering = self.ordering
+        else:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        has_next = has_more if forward else True
+        has_previous = bool(after) if forward else has_more
+        return KeysetPage(
+            rows,
+            has_next=has_next and bool(rows),
+            has_previous=has_previous and bool(rows),
+            next_cursor=encode_cursor(self._position(rows[-1])) if rows else None,
+            previous_cursor=encode_cursor(self._position(rows[0])) if rows else None,
+        )
@@ -0,0 +1,134 @@
+"""
+Editor Preview Cache
+Rendered previews stored on disk under a key derived from the image's
+content hash, the normalized recipe and the output size and format, so a
+repeated preview is served without running Pillow. Hits refresh the file's
+modification time; when the directory grows past its byte budget the
+least recently used previews are evicted, down to a low-water mark.
+
+Each process keeps a running estimate of the directory's size, so writes
+under budget don't walk the directory. It is re-measured once the
+estimate passes the budget, and every RESCAN_INTERVAL writes to take in
+other processes' writes.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+
+# Eviction stops once the cache is back under this share of its budget
+LOW_WATER_RATIO = 0.9
+
+# Writes after which the directory is re-measured even under budget
+RESCAN_INTERVAL = 100
+
+# Directory -> [estimated bytes, writes since it was measured]
+_usage = {}
+_usage_lock = threading.Lock()
+
+
+def get_preview_cache_dir():
+    return getattr(
+        settings, 'MEDIA_PREVIEW_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'media_previews')
+    )
+
+
+def get_preview_cache_max_bytes():
+    return getattr(settings, 'MEDIA_PREVIEW_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+
+
+def preview_cache_key(content_hash, steps, size, format):
+    """Key for a preview of the given file content, parsed recipe steps, size and format."""
+    payload = json.dumps(
+        {'content': content_hash, 'steps': steps, 'size': size, 'format': format},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PreviewCache:
+    """Size-bounded LRU cache of preview images in a directory."""
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or get_preview_cache_dir()
+        self.max_bytes = max_bytes if max_bytes is not None else get_preview_cache_max_bytes()
+
+    def _path(self, key):
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """Cached bytes for a key, or None. Marks the entry as recently used."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as cached:
+                data = cached.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def set(self, key, data):
+        """Store bytes for a key, then evict old entries if likely over budget."""
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error caching preview {key}: {e}")
+            return
+        with _usage_lock:
+            usage = _usage.get(self.directory)
+            if usage is not None:
+                usage[0] += len(data)
+                usage[1] += 1
+                if usage[0] <= self.max_bytes and usage[1] < RESCAN_INTERVAL:
+                    return
+        self.evict()
+
+    def _entries(self):
+        try:
+            subdirs = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        for subdir in subdirs:
+            if not subdir.is_dir(follow_symlinks=False):
+                continue
+            with os.scandir(subdir.path) as files:
+                for entry in files:
+                    if entry.is_file(follow_symlinks=False) and not entry.name.endswith('.tmp'):
+                        stat = entry.stat(follow_symlinks=False)
+                        yield entry.path, stat.st_size, stat.st_mtime
+
+    def evict(self):
+        """
+        Measure the cache and, if it is over budget, delete least recently
+        used entries until it is back under the low-water mark.
+        """
+        entries = list(self._entries())
+        total = sum(size for path, size, mtime in entries)
+        removed = 0
+        if total > self.max_bytes:
+            low_water = self.max_bytes * LOW_WATER_RATIO
+            for path, size, mtime in sorted(entries, key=lambda entry: entry[2]):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+                if total <= low_water:
+                    break
+        with _usage_lock:
+            _usage[self.directory] = [total, 0]
+        return removed
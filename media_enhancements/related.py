@@ -0,0 +1,146 @@
+"""
+Related Media
+Precomputed MediaRelation rows linking each catalog entry to the entries
+of the same source it has most in common with: shared categories, shared
+tags and nearby folders. Rows are refreshed when an entry is synced, so
+looking up related items is a single indexed query.
+
+Scores are symmetric and stored in both directions. Refreshing an entry
+replaces every pair it takes part in; other entries' lists can drift
+slightly until they are synced again or rebuild_related_media() runs.
+
+Syncs schedule the refresh for when their transaction commits, so an
+object saved along with several tags is rescored once.
+"""
+
+import threading
+
+from django.db import transaction
+from django.db.models import Case, FloatField, Q, Sum, Value, When
+
+
+CATEGORY_WEIGHT = 3.0
+TAG_WEIGHT = 2.0
+SAME_FOLDER_WEIGHT = 2.0
+# Parent, child or sibling folder
+NEAR_FOLDER_WEIGHT = 1.0
+
+# Related entries kept per entry, and candidates considered before ranking
+RELATED_LIMIT = 20
+CANDIDATE_LIMIT = 200
+
+# Entry pks waiting for a refresh, per thread
+_pending = threading.local()
+
+
+def score_related(entry):
+    """Map related entry pk to score for a saved MediaCatalogEntry, best RELATED_LIMIT only."""
+    from .models import MediaCatalogEntry, MediaCatalogTerm, MediaFolder
+
+    scores = {}
+    condition = Q()
+    for kind, value in entry.terms.values_list('kind', 'value'):
+        condition |= Q(kind=kind, value=value)
+    if condition:
+        shared = (
+            MediaCatalogTerm.objects.filter(condition, entry__source=entry.source)
+            .exclude(entry=entry.pk)
+            .values('entry')
+            .annotate(score=Sum(Case(
+                When(kind='category', then=Value(CATEGORY_WEIGHT)),
+                default=Value(TAG_WEIGHT),
+                output_field=FloatField(),
+            )))
+            .order_by('-score')[:CANDIDATE_LIMIT]
+        )
+        scores = {row['entry']: row['score'] for row in shared}
+
+    if entry.folder_id:
+        siblings = MediaCatalogEntry.objects.filter(
+            source=entry.source, folder=entry.folder_id,
+        ).exclude(pk=entry.pk).order_by('-created_at').values_list('pk', flat=True)[:CANDIDATE_LIMIT]
+        for pk in siblings:
+            scores[pk] = scores.get(pk, 0) + SAME_FOLDER_WEIGHT
+
+        parent_id = MediaFolder.objects.filter(pk=entry.folder_id).values_list('parent', flat=True).first()
+        near = Q(parent=entry.folder_id)
+        if parent_id:
+            near |= Q(pk=parent_id) | Q(parent=parent_id)
+        near_folders = set(MediaFolder.objects.filter(near).exclude(pk=entry.folder_id).values_list('pk', flat=True))
+        candidates = MediaCatalogEntry.objects.filter(pk__in=list(scores), folder__in=near_folders)
+        for pk in candidates.values_list('pk', flat=True):
+            scores[pk] += NEAR_FOLDER_WEIGHT
+
+    best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:RELATED_LIMIT]
+    return dict(best)
+
+
+def _relation_rows(entry_pk, scores):
+    from .models import MediaRelation
+
+    for related_pk, score in scores.items():
+        yield MediaRelation(entry_id=entry_pk, related_id=related_pk, score=score)
+        yield MediaRelation(entry_id=related_pk, related_id=entry_pk, score=score)
+
+
+def refresh_related(entries):
+    """Recompute the relations of saved catalog entries."""
+    from .models import MediaRelation
+
+    if not entries:
+        return
+    pks = [entry.pk for entry in entries]
+    MediaRelation.objects.filter(Q(entry__in=pks) | Q(related__in=pks)).delete()
+    MediaRelation.objects.bulk_create(
+        [row for entry in entries for row in _relation_rows(entry.pk, score_related(entry))],
+        ignore_conflicts=True,
+    )
+
+
+def schedule_related_refresh(entry_pk):
+    """
+    Refresh an entry's relations once the current transaction commits.
+    Requests made before then are merged, so each entry is rescored once.
+    """
+    if not hasattr(_pending, 'pks'):
+        _pending.pks = set()
+    _pending.pks.add(entry_pk)
+    # Every request registers the callback; the first to run takes the whole
+    # set, so entries left over from a rolled-back transaction are not stranded
+    transaction.on_commit(_refresh_pending)
+
+
+def _refresh_pending():
+    from .models import MediaCatalogEntry
+
+    pks = getattr(_pending, 'pks', None)
+    if not pks:
+        return
+    _pending.pks = set()
+    refresh_related(list(MediaCatalogEntry.objects.filter(pk__in=pks).only('source', 'folder')))
+
+
+def rebuild_related_media(batch_size=1000):
+    """Recompute every relation from the catalog."""
+    from .models import MediaCatalogEntry, MediaRelation
+
+    MediaRelation.objects.all().delete()
+    entries = MediaCatalogEntry.objects.only('source', 'folder').order_by('pk')
+    rows = []
+    for entry in entries.iterator(chunk_size=batch_size):
+        rows.extend(_relation_rows(entry.pk, score_related(entry)))
+        if len(rows) >= batch_size:
+            MediaRelation.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    MediaRelation.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def get_related_ids(source, object_id, limit=RELATED_LIMIT):
+    """Object ids of the media most related to a source/object_id pair, best first."""
+    from .models import MediaRelation
+
+    return list(
+        MediaRelation.objects.filter(entry__source=source, entry__object_id=object_id)
+        .order_by('-score', 'related')
+        .values_list('related__object_id', flat=True)[:limit]
+    )
@@ -0,0 +1,134 @@
+"""
+Rendition Warming
+Finds the filter specs used by templates and renders missing image
+renditions ahead of time, so visitors never wait for them.
+
+Worker functions run in separate processes and import models lazily,
+after django.setup() has run in the worker.
+"""
+
+import os
+
+import django
+from django.template.base import Lexer, TokenType
+
+
+IMAGE_TAGS = ('image', 'srcset_image', 'picture')
+TEMPLATE_EXTENSIONS = ('.html', '.txt', '.xml')
+
+
+def get_template_dirs():
+    """
+    The project's template directories: configured DIRS plus the template
+    directories of apps inside BASE_DIR (installed packages are skipped).
+    """
+    from django.conf import settings
+    from django.template import engines
+    from django.template.utils import get_app_template_dirs
+
+    dirs = []
+    for engine in engines.all():
+        dirs.extend(str(path) for path in getattr(engine, 'dirs', []))
+    base_dir = os.path.realpath(settings.BASE_DIR)
+    dirs.extend(
+        str(path) for path in get_app_template_dirs('templates')
+        if os.path.realpath(path).startswith(base_dir + os.sep)
+    )
+    return list(dict.fromkeys(dirs))
+
+
+def filter_specs_in_template(source):
+    """Filter specs used by {% image %}, {% srcset_image %} and {% picture %} tags in a template."""
+    from wagtail.images.models import Filter
+
+    specs = set()
+    for token in Lexer(source).tokenize():
+        if token.token_type != TokenType.BLOCK:
+            continue
+        bits = token.split_contents()
+        if not bits or bits[0] not in IMAGE_TAGS:
+            continue
+        operations = []
+        for bit in bits[2:]:
+            if bit == 'as':
+                break
+            if '=' not in bit and Filter.expanding_spec_pattern.match(bit):
+                operations.append(bit)
+        if not operations:
+            continue
+        if bits[0] == 'image':
+            specs.add('|'.join(operations))
+        else:
+            specs.update(Filter.expand_spec(operations))
+    return specs
+
+
+def find_template_filter_specs(dirs=None):
+    """Scan template directories for the filter specs used with image tags."""
+    specs = set()
+    for directory in dirs if dirs is not None else get_template_dirs():
+        for root, subdirs, files in os.walk(directory):
+            for name in files:
+                if not name.endswith(TEMPLATE_EXTENSIONS):
+                    continue
+                try:
+                    with open(os.path.join(root, name), encoding='utf-8') as template_file:
+                        specs |= filter_specs_in_template(template_file.read())
+                except (OSError, UnicodeDecodeError):
+                    continue
+    return sorted(specs)
+
+
+def missing_renditions(images, specs):
+    """
+    Map image pk to the specs it has no rendition for, checking the existing
+    (image, filter_spec, focal_point_key) rows with a single query.
+    """
+    from wagtail.images.models import Filter
+
+    if not images:
+        return {}
+    filters = [Filter(spec=spec) for spec in specs]
+    rendition_model = type(images[0]).get_rendition_model()
+    existing = set(
+        rendition_model.objects.filter(
+            image_id__in=[image.pk for image in images], filter_spec__in=specs,
+        ).values_list('image_id', 'filter_spec', 'focal_point_key')
+    )
+    missing = {}
+    for image in images:
+        wanted = [
+            rendition_filter.spec for rendition_filter in filters
+            if (image.pk, rendition_filter.spec, rendition_filter.get_cache_key(image)) not in existing
+        ]
+        if wanted:
+            missing[image.pk] = wanted
+    return missing
+
+
+def init_worker():
+    """Process pool initializer: make the ORM usable in a fresh worker process."""
+    django.setup()
+
+
+def render_batch(model_label, work):
+    """
+    Render renditions for [(image pk, [spec, ...]), ...] in a worker process.
+    Returns (renditions created, list of (pk, error message)).
+    """
+    from django.apps import apps
+
+    model = apps.get_model(model_label)
+    images = model.objects.in_bulk([pk for pk, specs in work])
+    created = 0
+    errors = []
+    for pk, specs in work:
+        image = images.get(pk)
+        if image is None:
+            continue
+        try:
+            image.get_renditions(*specs)
+            created += len(specs)
+        except Exception as e:
+            errors.append((pk, str(e)))
+    return created, errors
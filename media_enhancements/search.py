@@ -0,0 +1,130 @@
+"""
+Full-Text Search
+Ranked search over the media catalog. PostgreSQL uses a GIN-indexed
+tsvector expression; SQLite uses an FTS5 table kept up to date as catalog
+entries are saved. Databases with neither fall back to icontains filters.
+"""
+
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+
+FTS_TABLE = 'media_catalog_fts'
+SEARCH_CONFIG = 'english'
+
+# Relative weights of title, tag names and the remaining search text
+FTS5_WEIGHTS = (10.0, 5.0, 1.0)
+
+_fts_tables = {}
+
+
+def search_vector():
+    """tsvector expression matching the catalog_search_gin index on PostgreSQL."""
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+        SearchVector('tag_names', weight='B', config=SEARCH_CONFIG) +
+        SearchVector('search_text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def search_terms(query):
+    """Split a user query into plain word tokens, dropping search syntax."""
+    return re.findall(r'\w+', query or '')
+
+
+def get_search_backend(using='default'):
+    """Return 'postgres', 'fts5' or 'basic' for the given database alias."""
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        return 'postgres'
+    if connection.vendor == 'sqlite':
+        if using not in _fts_tables:
+            with connection.cursor() as cursor:
+                _fts_tables[using] = FTS_TABLE in connection.introspection.table_names(cursor)
+        if _fts_tables[using]:
+            return 'fts5'
+    return 'basic'
+
+
+def search_catalog(entries, query):
+    """
+    Filter a MediaCatalogEntry queryset to entries matching every word of the
+    query (as prefixes), annotated with `search_rank` (higher is better).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return entries.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    backend = get_search_backend(entries.db)
+    if backend == 'postgres':
+        vector = search_vector()
+        search_query = SearchQuery(
+            ' & '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG
+        )
+        return entries.annotate(
+            search=vector,
+            search_rank=SearchRank(vector, search_query),
+        ).filter(search=search_query)
+
+    if backend == 'fts5':
+        table = entries.model._meta.db_table
+        match = ' '.join('"{}"*'.format(term) for term in terms)
+        return entries.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        ).annotate(
+            # bm25() is lower-is-better, so negate it to sort like ts_rank
+            search_rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, %s, %s, %s) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id"',
+                [*FTS5_WEIGHTS, match],
+                output_field=FloatField(),
+            )
+        )
+
+    for term in terms:
+        entries = entries.filter(
+            Q(title__icontains=term) |
+            Q(tag_names__icontains=term) |
+            Q(search_text__icontains=term)
+        )
+    return entries.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def index_entries(entries, using='default'):
+    """Write catalog entries to the FTS5 table (no-op on other backends)."""
+    if get_search_backend(using) != 'fts5' or not entries:
+        return
+    rows = [(entry.pk, entry.title, entry.tag_names, entry.search_text) for entry in entries]
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, tag_names, search_text) VALUES (%s, %s, %s, %s)',
+            rows,
+        )
+
+
+def unindex_entries(entry_ids, using='default'):
+    """Remove catalog entries from the FTS5 table (no-op on other backends)."""
+    if get_search_backend(using) != 'fts5' or not entry_ids:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in entry_ids])
+
+
+def rebuild_search_index(using='default'):
+    """Repopulate the FTS5 table from the catalog (no-op on other backends)."""
+    if get_search_backend(using) != 'fts5':
+        return
+    from .models import MediaCatalogEntry
+
+    table = MediaCatalogEntry._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, tag_names, search_text) '
+            f'SELECT id, title, tag_names, search_text FROM "{table}"'
+        )
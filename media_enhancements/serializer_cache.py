@@ -0,0 +1,130 @@
+"""
+Serialized Fragment Cache
+API serializers cache each object's representation under a key built from
+its model, pk and a version number. Signals bump the version when the
+object, its categories or its tags change, so list responses are stitched
+together from cached fragments and only changed objects are serialized
+again.
+
+Versions live in the SerializerVersion table rather than the cache, so
+every process sees a bump immediately even when each keeps its own local
+cache of fragments.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from django.db.models import F, Q, prefetch_related_objects
+from rest_framework import serializers
+
+from .catalog import get_tag_names
+from .conditional import get_model_label
+
+
+def get_serializer_cache_timeout():
+    return getattr(settings, 'MEDIA_API_CACHE_TIMEOUT', 3600)
+
+
+def bump_serializer_version(model, pk=None):
+    """
+    Invalidate cached fragments for one object, or for every serializer
+    that depends on `model` when no pk is given.
+    """
+    from .models import SerializerVersion
+
+    label, object_id = get_model_label(model), pk or 0
+    versions = SerializerVersion.objects.filter(model_label=label, object_id=object_id)
+    if not versions.update(version=F('version') + 1):
+        SerializerVersion.objects.bulk_create(
+            [SerializerVersion(model_label=label, object_id=object_id, version=1)],
+            ignore_conflicts=True,
+        )
+
+
+def _get_versions(dependencies, model, pks):
+    """Map (model label, object id) to version for the dependency models and objects, in one query."""
+    from .models import SerializerVersion
+
+    label = get_model_label(model)
+    condition = Q(model_label=label, object_id__in=pks)
+    dependency_labels = [get_model_label(dependency) for dependency in dependencies]
+    if dependency_labels:
+        condition |= Q(model_label__in=dependency_labels, object_id=0)
+    rows = SerializerVersion.objects.filter(condition).values_list('model_label', 'object_id', 'version')
+    return {(row_label, object_id): version for row_label, object_id, version in rows}
+
+
+class CachedListSerializer(serializers.ListSerializer):
+    """List serializer that reads and writes every item's fragment in one cache round trip."""
+
+    def to_representation(self, data):
+        items = data.all() if isinstance(data, models.manager.BaseManager) else data
+        return self.child.cached_representations(list(items))
+
+
+class CachedSerializerMixin:
+    """
+    Caches to_representation() per object. Serializers list the models
+    their nested fields read in `cache_dependencies` and the relations to
+    prefetch for uncached objects in `prefetch_fields`; `tags` fields are
+    filled from one TaggedItem query per batch.
+    """
+    cache_dependencies = ()
+    prefetch_fields = ()
+
+    def _cache_prefix(self, model):
+        request = self.context.get('request')
+        # file_url is absolute, so fragments differ per scheme and host
+        base_url = request.build_absolute_uri('/') if request else ''
+        digest = hashlib.sha1(f'{base_url}|{",".join(self.fields)}'.encode()).hexdigest()
+        return f'media_enhancements:api:{get_model_label(model)}:{type(self).__name__}:{digest}'
+
+    def prepare(self, instances):
+        """Load related data for a batch of objects about to be serialized."""
+        prefetch = [name for name in self.prefetch_fields if name in self.fields]
+        if prefetch:
+            prefetch_related_objects(instances, *prefetch)
+        if 'tags' in self.fields:
+            tag_names = get_tag_names(type(instances[0]), [instance.pk for instance in instances])
+            for instance in instances:
+                instance._tag_names = tag_names[instance.pk]
+
+    def get_tags(self, obj):
+        tag_names = getattr(obj, '_tag_names', None)
+        if tag_names is None:
+            tag_names = get_tag_names(type(obj), [obj.pk])[obj.pk]
+        return tag_names
+
+    def cached_representations(self, instances):
+        if not instances:
+            return []
+        model = type(instances[0])
+        label = get_model_label(model)
+        versions = _get_versions(self.cache_dependencies, model, [instance.pk for instance in instances])
+
+        prefix = self._cache_prefix(model)
+        dependency_version = '.'.join(
+            str(versions.get((get_model_label(dependency), 0), 0)) for dependency in self.cache_dependencies
+        )
+        keys = {
+            instance.pk: f'{prefix}:{dependency_version}:{instance.pk}:{versions.get((label, instance.pk), 0)}'
+            for instance in instances
+        }
+        fragments = cache.get_many(list(keys.values()))
+
+        missing = [instance for instance in instances if keys[instance.pk] not in fragments]
+        if missing:
+            self.prepare(missing)
+            fresh = {
+                keys[instance.pk]: super(CachedSerializerMixin, self).to_representation(instance)
+                for instance in missing
+            }
+            cache.set_many(fresh, get_serializer_cache_timeout())
+            fragments.update(fresh)
+
+        return [fragments[keys[instance.pk]] for instance in instances]
+
+    def to_representation(self, instance):
+        return self.cached_representations([instance])[0]
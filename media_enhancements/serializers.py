@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import CustomImage, CustomDocument, Category
+from .fieldsets import SparseFieldsMixin
+from .models import CustomImage, CustomDocument, Category, MediaFolder, Video, Audio
+from .serializer_cache import CachedListSerializer, CachedSerializerMixin
+from .thumbnails import get_thumbnail_urls
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -10,21 +13,52 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'slug', 'description']
 
 
-class CustomImageSerializer(serializers.ModelSerializer):
+class MediaFolderSummarySerializer(serializers.ModelSerializer):
+    """Serializer for the folder of an expanded media item."""
+    
+    class Meta:
+        model = MediaFolder
+        fields = ['id', 'name', 'slug', 'path']
+
+
+class CustomImageSerializer(SparseFieldsMixin, CachedSerializerMixin, serializers.ModelSerializer):
     """Serializer for CustomImage model."""
     
     categories = CategorySerializer(many=True, read_only=True)
-    tags = serializers.StringRelatedField(many=True, read_only=True)
+    tags = serializers.SerializerMethodField()
     file_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    folder = MediaFolderSummarySerializer(read_only=True)
+    
+    cache_dependencies = (Category, MediaFolder)
+    prefetch_fields = ('categories', 'folder')
+    expandable_fields = ('thumbnail_url', 'folder')
+    field_columns = {
+        'file_url': ('file',),
+        # Rendition lookups match on the focal point
+        'thumbnail_url': (
+            'file', 'width', 'height', 'focal_point_x', 'focal_point_y',
+            'focal_point_width', 'focal_point_height',
+        ),
+    }
     
     class Meta:
         model = CustomImage
+        list_serializer_class = CachedListSerializer
         fields = [
             'id', 'title', 'file_url', 'width', 'height',
             'created_at', 'copyright_holder', 'source_url',
-            'categories', 'alt_text_override', 'tags'
+            'categories', 'alt_text_override', 'tags',
+            'thumbnail_url', 'folder'
         ]
     
+    def prepare(self, instances):
+        super().prepare(instances)
+        if 'thumbnail_url' in self.fields:
+            urls = get_thumbnail_urls(instances)
+            for instance in instances:
+                instance._thumbnail_urls = urls.get(instance.pk)
+    
     def get_file_url(self, obj):
         if obj.file:
             request = self.context.get('request')
@@ -32,20 +66,40 @@ class CustomImageSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.file.url)
             return obj.file.url
         return None
+    
+    def get_thumbnail_url(self, obj):
+        if hasattr(obj, '_thumbnail_urls'):
+            urls = obj._thumbnail_urls
+        else:
+            urls = get_thumbnail_urls([obj]).get(obj.pk)
+        if urls:
+            request = self.context.get('request')
+            if request:
+                return request.build_absolute_uri(urls[0])
+            return urls[0]
+        return None
 
 
-class CustomDocumentSerializer(serializers.ModelSerializer):
+class CustomDocumentSerializer(SparseFieldsMixin, CachedSerializerMixin, serializers.ModelSerializer):
     """Serializer for CustomDocument model."""
     
-    tags = serializers.StringRelatedField(many=True, read_only=True)
+    tags = serializers.SerializerMethodField()
     file_url = serializers.SerializerMethodField()
     file_size = serializers.SerializerMethodField()
+    folder = MediaFolderSummarySerializer(read_only=True)
+    
+    cache_dependencies = (MediaFolder,)
+    prefetch_fields = ('folder',)
+    expandable_fields = ('folder',)
+    field_columns = {'file_url': ('file',)}
     
     class Meta:
         model = CustomDocument
+        list_serializer_class = CachedListSerializer
         fields = [
             'id', 'title', 'file_url', 'file_size', 'created_at',
-            'document_version', 'expiry_date', 'department', 'tags'
+            'document_version', 'expiry_date', 'department', 'tags',
+            'folder'
         ]
     
     def get_file_url(self, obj):
@@ -57,6 +111,61 @@ class CustomDocumentSerializer(serializers.ModelSerializer):
         return None
     
     def get_file_size(self, obj):
-        if obj.file:
-            return obj.file.size
+        # Stored at upload time, so no storage request is made per row
+        return obj.file_size
+
+
+class TimeBasedMediaSerializer(SparseFieldsMixin, CachedSerializerMixin, serializers.ModelSerializer):
+    """Shared fields for the Video and Audio serializers."""
+    
+    categories = CategorySerializer(many=True, read_only=True)
+    tags = serializers.SerializerMethodField()
+    file_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    folder = MediaFolderSummarySerializer(read_only=True)
+    
+    cache_dependencies = (Category, MediaFolder)
+    prefetch_fields = ('categories', 'folder')
+    expandable_fields = ('folder',)
+    field_columns = {'file_url': ('file',), 'thumbnail_url': ('thumbnail',)}
+    
+    def _absolute_url(self, file):
+        if file:
+            request = self.context.get('request')
+            if request:
+                return request.build_absolute_uri(file.url)
+            return file.url
         return None
+    
+    def get_file_url(self, obj):
+        return self._absolute_url(obj.file)
+    
+    def get_thumbnail_url(self, obj):
+        return self._absolute_url(obj.thumbnail)
+
+
+class VideoSerializer(TimeBasedMediaSerializer):
+    """Serializer for Video model."""
+    
+    class Meta:
+        model = Video
+        list_serializer_class = CachedListSerializer
+        fields = [
+            'id', 'title', 'file_url', 'thumbnail_url', 'file_size', 'created_at',
+            'description', 'duration', 'resolution', 'video_type', 'director',
+            'producer', 'copyright_holder', 'source_url', 'categories', 'tags',
+            'folder'
+        ]
+
+
+class AudioSerializer(TimeBasedMediaSerializer):
+    """Serializer for Audio model."""
+    
+    class Meta:
+        model = Audio
+        list_serializer_class = CachedListSerializer
+        fields = [
+            'id', 'title', 'file_url', 'thumbnail_url', 'file_size', 'created_at',
+            'description', 'duration', 'artist', 'album', 'genre', 'year',
+            'copyright_holder', 'source_url', 'categories', 'tags', 'folder'
+        ]
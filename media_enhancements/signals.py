@@ -0,0 +1,252 @@
+"""
+Signal handlers keeping denormalized media data in sync with the media models.
+"""
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import F
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete, m2m_changed
+from taggit.models import TaggedItem
+
+from .conditional import bump_change_stamps
+from .serializer_cache import bump_serializer_version
+from .catalog import MEDIA_SOURCES, UNCATEGORIZED_SOURCES, sync_catalog_entry, sync_catalog_entry_by_id, remove_catalog_entry
+from .file_metadata import file_has_changed, file_metadata_is_stale, remember_file_name, update_file_metadata
+from .media_stats import (
+    STAT_COUNTERS, adjust_category_image_counts, adjust_stat_counter, refresh_category_image_counts,
+)
+from .folder_counts import FOLDER_COUNT_FIELDS, adjust_folder_counts, media_folder_changed, remember_folder
+from .models import Category, CustomImage, CustomDocument, Video, Audio, MediaFolder
+from .thumbnails import delete_renditions, schedule_thumbnails
+
+# Media models that persist their own file metadata and are counted per folder
+FILE_METADATA_MODELS = (CustomImage, CustomDocument, Video, Audio)
+
+# Rendition model -> image model, filled in by connect_signals()
+RENDITION_IMAGE_MODELS = {}
+
+
+def media_initialized(sender, instance, **kwargs):
+    remember_file_name(instance)
+    remember_folder(instance)
+
+
+def media_file_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'file' not in update_fields):
+        return
+    if file_metadata_is_stale(instance):
+        update_file_metadata(instance)
+
+
+def media_file_post_save(sender, instance, created=False, raw=False, **kwargs):
+    remember_file_name(instance)
+    if not raw:
+        media_folder_changed(instance, created)
+
+
+def media_file_post_delete(sender, instance, **kwargs):
+    adjust_folder_counts(sender, instance.folder_id, -1)
+
+
+def folder_pre_delete(sender, instance, **kwargs):
+    # Subfolders deleted by the cascade get their own pre_delete, so each
+    # folder only removes the media stored directly in it from its ancestors.
+    counts = MediaFolder.objects.filter(pk=instance.pk).values_list(*FOLDER_COUNT_FIELDS.values()).first()
+    if counts and sum(counts):
+        MediaFolder.objects.filter(pk__in=MediaFolder.path_ids(instance.path)[:-1]).update(
+            subtree_media_count=F('subtree_media_count') - sum(counts)
+        )
+
+
+def media_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    sync_catalog_entry(instance)
+    bump_change_stamps(sender)
+    bump_serializer_version(sender, instance.pk)
+
+
+def image_initialized(sender, instance, **kwargs):
+    remember_file_name(instance)
+
+
+def image_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._file_replaced = (
+        not raw and not instance._state.adding
+        and (update_fields is None or 'file' in update_fields)
+        and file_has_changed(instance)
+    )
+
+
+def image_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance._file_replaced:
+        # Renditions of the old file would otherwise be served indefinitely
+        delete_renditions(instance)
+    remember_file_name(instance)
+    schedule_thumbnails(instance)
+
+
+def rendition_saved(sender, instance, raw=False, **kwargs):
+    # New renditions change the thumbnails shown for their image model
+    if not raw:
+        bump_change_stamps(RENDITION_IMAGE_MODELS[sender])
+        bump_serializer_version(RENDITION_IMAGE_MODELS[sender], instance.image_id)
+
+
+def media_deleted(sender, instance, **kwargs):
+    remove_catalog_entry(sender, instance.pk)
+    bump_change_stamps(sender)
+    bump_serializer_version(sender, instance.pk)
+
+
+def model_changed(sender, raw=False, **kwargs):
+    if not raw:
+        bump_change_stamps(sender)
+        bump_serializer_version(sender)
+
+
+def media_categories_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        sync_catalog_entry_by_id(type(instance), instance.pk)
+        bump_change_stamps(type(instance))
+        bump_serializer_version(type(instance), instance.pk)
+    else:
+        # Changed from the category side; clear() gives no pk_set
+        bump_serializer_version(type(instance))
+        if pk_set:
+            for pk in pk_set:
+                sync_catalog_entry_by_id(model, pk)
+            bump_change_stamps(model)
+
+
+def tagged_item_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    model = ContentType.objects.get_for_id(instance.content_type_id).model_class()
+    if model is not None:
+        sync_catalog_entry_by_id(model, instance.object_id)
+        bump_change_stamps(model)
+        bump_serializer_version(model, instance.object_id)
+
+
+def stat_counter_saved(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        adjust_stat_counter(sender, 1)
+
+
+def stat_counter_deleted(sender, instance, **kwargs):
+    adjust_stat_counter(sender, -1)
+    if hasattr(instance, '_stat_category_ids'):
+        refresh_category_image_counts(instance._stat_category_ids)
+
+
+def image_pre_delete(sender, instance, **kwargs):
+    # The category links are deleted without m2m_changed, so remember them
+    instance._stat_category_ids = list(instance.categories.values_list('pk', flat=True))
+
+
+def category_image_counts_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # post_add only lists new links, but remove() reports every pk it was
+    # given, so look up the links that actually exist before they go
+    if action == 'pre_remove':
+        if reverse:
+            instance._stat_removed = sender.objects.filter(category=instance.pk, customimage__in=pk_set).count()
+        else:
+            instance._stat_removed = list(
+                sender.objects.filter(customimage=instance.pk, category__in=pk_set).values_list('category', flat=True)
+            )
+    elif reverse:
+        if action == 'post_add':
+            adjust_category_image_counts([instance.pk], len(pk_set))
+        elif action == 'post_remove':
+            adjust_category_image_counts([instance.pk], -instance._stat_removed)
+        elif action == 'post_clear':
+            refresh_category_image_counts([instance.pk])
+    elif action == 'pre_clear':
+        instance._stat_category_ids = list(instance.categories.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        refresh_category_image_counts(getattr(instance, '_stat_category_ids', None))
+    elif action == 'post_add':
+        adjust_category_image_counts(pk_set, 1)
+    elif action == 'post_remove':
+        adjust_category_image_counts(instance._stat_removed, -1)
+
+
+def _category_members(category):
+    """(model, [pk, ...]) for every categorized media model, listing the category's items."""
+    return [
+        (model, list(model.objects.filter(categories=category).values_list('pk', flat=True)))
+        for source, (model, media_type) in MEDIA_SOURCES.items()
+        if source not in UNCATEGORIZED_SOURCES
+    ]
+
+
+def _sync_category_members(members):
+    for model, pks in members:
+        for pk in pks:
+            sync_catalog_entry_by_id(model, pk)
+        if pks:
+            bump_change_stamps(model)
+
+
+def category_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # A renamed slug changes the summaries of every item in the category
+    _sync_category_members(_category_members(instance))
+
+
+def category_pre_delete(sender, instance, **kwargs):
+    # The category links are deleted without m2m_changed, so remember the members
+    instance._catalog_members = _category_members(instance)
+
+
+def category_deleted(sender, instance, **kwargs):
+    _sync_category_members(getattr(instance, '_catalog_members', []))
+
+
+def connect_signals():
+    for model in FILE_METADATA_MODELS:
+        uid = f'media_file_metadata_{model._meta.model_name}'
+        post_init.connect(media_initialized, sender=model, dispatch_uid=uid)
+        pre_save.connect(media_file_pre_save, sender=model, dispatch_uid=uid)
+        post_save.connect(media_file_post_save, sender=model, dispatch_uid=uid)
+        post_delete.connect(media_file_post_delete, sender=model, dispatch_uid=uid)
+    pre_delete.connect(folder_pre_delete, sender=MediaFolder, dispatch_uid='media_folder_counts')
+
+    for source, (model, media_type) in MEDIA_SOURCES.items():
+        uid = f'media_catalog_{source}'
+        post_save.connect(media_saved, sender=model, dispatch_uid=uid)
+        post_delete.connect(media_deleted, sender=model, dispatch_uid=uid)
+        if media_type == 'image':
+            post_init.connect(image_initialized, sender=model, dispatch_uid=f'media_thumbnails_{source}')
+            pre_save.connect(image_pre_save, sender=model, dispatch_uid=f'media_thumbnails_{source}')
+            post_save.connect(image_saved, sender=model, dispatch_uid=f'media_thumbnails_{source}')
+            RENDITION_IMAGE_MODELS[model.get_rendition_model()] = model
+            post_save.connect(rendition_saved, sender=model.get_rendition_model(), dispatch_uid=f'media_renditions_{source}')
+        if source not in UNCATEGORIZED_SOURCES:
+            m2m_changed.connect(media_categories_changed, sender=model.categories.through, dispatch_uid=uid)
+
+    post_save.connect(tagged_item_changed, sender=TaggedItem, dispatch_uid='media_catalog_tags')
+    post_delete.connect(tagged_item_changed, sender=TaggedItem, dispatch_uid='media_catalog_tags')
+    post_save.connect(category_changed, sender=Category, dispatch_uid='media_catalog_category')
+    pre_delete.connect(category_pre_delete, sender=Category, dispatch_uid='media_catalog_category')
+    post_delete.connect(category_deleted, sender=Category, dispatch_uid='media_catalog_category')
+
+    for model in STAT_COUNTERS:
+        uid = f'media_stats_{model._meta.model_name}'
+        post_save.connect(stat_counter_saved, sender=model, dispatch_uid=uid)
+        post_delete.connect(stat_counter_deleted, sender=model, dispatch_uid=uid)
+    pre_delete.connect(image_pre_delete, sender=CustomImage, dispatch_uid='media_stats_category_counts')
+    m2m_changed.connect(
+        category_image_counts_changed, sender=CustomImage.categories.through,
+        dispatch_uid='media_stats_category_counts',
+    )
+
+    for model in (Category, MediaFolder):
+        uid = f'media_change_stamp_{model._meta.model_name}'
+        post_save.connect(model_changed, sender=model, dispatch_uid=uid)
+        post_delete.connect(model_changed, sender=model, dispatch_uid=uid)
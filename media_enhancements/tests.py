@@ -1,3 +1,1318 @@
-from django.test import TestCase
+import hashlib
+import importlib
+import json
+import os
+import tempfile
+from io import BytesIO
+from io import StringIO
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.files.images import ImageFile
+from PIL import Image as PILImage
+from taggit.models import Tag, TaggedItem
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .catalog import MEDIA_SOURCES
+from .facets import get_facets
+from .image_editor import ImageEditor
+from .preview_cache import PreviewCache
+from .fuzzy import autocomplete, fuzzy_search_catalog
+from .related import get_related_ids, refresh_related
+from .search import search_catalog
+from .serializer_cache import bump_serializer_version
+from .serializers import CustomDocumentSerializer, CustomImageSerializer
+from .models import (
+    Audio, Category, CustomDocument, CustomImage, MediaCatalogEntry, MediaFolder, MediaStatCounter,
+    SerializerVersion, Video,
+)
+from .rendition_warming import filter_specs_in_template, missing_renditions
+from .thumbnails import THUMBNAIL_FILTERS
+from .unified_dashboard import build_unified_items
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class UnifiedDashboardTests(TestCase):
+    """
+    Tests for the merged, database-paginated media listing.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('editor', password='password')
+        self.client.force_login(self.user)
+        now = timezone.now()
+        for i in range(30):
+            video = Video.objects.create(title=f'Video {i:02d}', file=ContentFile(b'v', name=f'v{i}.mp4'))
+            video.created_at = now - timedelta(minutes=2 * i)
+            video.save()
+        for i in range(5):
+            audio = Audio.objects.create(title=f'Audio {i:02d}', file=ContentFile(b'a', name=f'a{i}.mp3'))
+            audio.created_at = now - timedelta(minutes=2 * i + 1)
+            audio.save()
+
+    def test_first_page_is_merged_and_sorted(self):
+        response = self.client.get(reverse('media_enhancements:unified_dashboard'))
+        items = list(response.context['media_items'])
+        self.assertEqual(len(items), 24)
+        self.assertEqual(
+            [item.title for item in items[:4]],
+            ['Video 00', 'Audio 00', 'Video 01', 'Audio 01'],
+        )
+        self.assertEqual(response.context['stats']['total'], 35)
+
+    def test_cursor_pages_with_title_sort(self):
+        url = reverse('media_enhancements:unified_dashboard')
+        first = self.client.get(url, {'sort': 'title'}).context['media_items']
+        self.assertTrue(first.has_next)
+        self.assertFalse(first.has_previous)
+
+        second = self.client.get(url, {'sort': 'title', 'after': first.next_cursor}).context['media_items']
+        items = list(second)
+        self.assertEqual(len(items), 11)
+        self.assertEqual(items[-1].title, 'Video 29')
+        self.assertFalse(second.has_next)
+        self.assertTrue(second.has_previous)
+
+        back = self.client.get(url, {'sort': 'title', 'before': second.previous_cursor}).context['media_items']
+        self.assertEqual([item.title for item in back], [item.title for item in first])
+        self.assertFalse(back.has_previous)
+
+    def test_cursor_pages_with_relevance_sort(self):
+        url = reverse('media_enhancements:unified_dashboard')
+        first = self.client.get(url, {'q': 'video'}).context['media_items']
+        second = self.client.get(url, {'q': 'video', 'after': first.next_cursor}).context['media_items']
+        titles = [item.title for item in first] + [item.title for item in second]
+        self.assertEqual(len(titles), 30)
+        self.assertEqual(len(set(titles)), 30)
+        self.assertFalse(second.has_next)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('media_enhancements:unified_dashboard'), {'after': 'not-a-cursor'})
+        self.assertEqual(list(response.context['media_items'])[0].title, 'Video 00')
+
+    def test_page_items_use_constant_queries(self):
+        category = Category.objects.create(name='Nature', slug='nature')
+        folder = MediaFolder.objects.create(name='Clips', slug='clips')
+        for video in Video.objects.all():
+            video.folder = folder
+            video.save()
+            video.tags.add('clip', f'tag-{video.pk}')
+            video.categories.add(category)
+        entries = list(MediaCatalogEntry.objects.all())
+        build_unified_items(entries[:1])
+
+        # one query each for objects, categories and tags, per media type
+        with self.assertNumQueries(6):
+            items = build_unified_items(entries)
+            for item in items:
+                item.tags, list(item.categories), item.folder, item.file_size, item.metadata
+        self.assertEqual(len(items), 35)
+        video_item = next(item for item in items if item.media_type == 'video')
+        self.assertIn('clip', video_item.tags)
+        self.assertEqual(video_item.folder, folder)
+
+    def test_type_filter(self):
+        response = self.client.get(reverse('media_enhancements:unified_dashboard'), {'type': 'audio'})
+        self.assertEqual(response.context['stats']['total'], 5)
+        self.assertTrue(all(item.media_type == 'audio' for item in response.context['media_items']))
+
+    def test_category_filter_uses_catalog_terms(self):
+        category = Category.objects.create(name='Nature', slug='nature')
+        for video in Video.objects.order_by('title')[:2]:
+            video.categories.add(category)
+        url = reverse('media_enhancements:unified_dashboard')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'category': 'nature'})
+        self.assertNotIn(' LIKE ', ' '.join(query['sql'] for query in queries))
+        titles = [item.title for item in response.context['media_items'] if item.media_type == 'video']
+        self.assertEqual(titles, ['Video 00', 'Video 01'])
+
+    def test_recursive_mode_includes_subfolders(self):
+        root = MediaFolder.objects.create(name='Marketing', slug='marketing')
+        child = MediaFolder.objects.create(name='Campaigns', slug='campaigns', parent=root)
+        other = MediaFolder.objects.create(name='Archive', slug='archive')
+        videos = list(Video.objects.order_by('title')[:3])
+        for video, folder in zip(videos, (root, child, other)):
+            video.folder = folder
+            video.save()
+
+        url = reverse('media_enhancements:unified_dashboard')
+        flat = self.client.get(url, {'folder': root.pk}).context['media_items']
+        self.assertEqual([item.title for item in flat], ['Video 00'])
+
+        response = self.client.get(url, {'folder': root.pk, 'recursive': '1'})
+        self.assertTrue(response.context['recursive'])
+        self.assertEqual(
+            [item.title for item in response.context['media_items']], ['Video 00', 'Video 01']
+        )
+        self.assertEqual(response.context['stats']['total'], 2)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class MediaCatalogTests(TestCase):
+    """
+    Tests for the signal-maintained unified media catalog.
+    """
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Nature', slug='nature')
+        self.video = Video.objects.create(title='Forest Walk', file=ContentFile(b'v', name='forest.mp4'))
+
+    def get_entry(self):
+        return MediaCatalogEntry.objects.get(source='video', object_id=self.video.pk)
+
+    def test_entry_follows_saves_tags_and_categories(self):
+        self.video.title = 'Forest Run'
+        self.video.save()
+        self.video.tags.add('trees', 'outdoor')
+        self.video.categories.add(self.category)
+
+        entry = self.get_entry()
+        self.assertEqual(entry.media_type, 'video')
+        self.assertEqual(entry.sort_title, 'forest run')
+        self.assertEqual(entry.category_slugs, ',nature,')
+        self.assertEqual(sorted(entry.tag_names.split(', ')), ['outdoor', 'trees'])
+
+        self.video.tags.remove('trees')
+        self.category.slug = 'wildlife'
+        self.category.save()
+        entry = self.get_entry()
+        self.assertEqual(entry.tag_names, 'outdoor')
+        self.assertEqual(entry.category_slugs, ',wildlife,')
+
+    def test_delete_removes_entry(self):
+        self.video.delete()
+        self.assertFalse(MediaCatalogEntry.objects.exists())
+
+    def test_category_delete_updates_member_entries(self):
+        self.video.categories.add(self.category)
+        self.category.delete()
+        entry = self.get_entry()
+        self.assertEqual(entry.category_slugs, '')
+        self.assertNotIn('Nature', entry.search_text)
+        self.assertFalse(entry.terms.filter(kind='category').exists())
+
+    def test_rebuild_command(self):
+        self.video.tags.add('trees')
+        MediaCatalogEntry.objects.all().delete()
+        call_command('rebuild_media_catalog', stdout=StringIO())
+        self.assertEqual(self.get_entry().title, 'Forest Walk')
+        self.assertEqual(list(self.get_entry().terms.values_list('kind', 'value')), [('tag', 'trees')])
+
+    def test_missing_only_adds_entries_without_touching_others(self):
+        other = Audio.objects.create(title='Birdsong', file=ContentFile(b'a', name='b.mp3'))
+        MediaCatalogEntry.objects.filter(source='audio').delete()
+        kept = self.get_entry().pk
+        call_command('rebuild_media_catalog', missing_only=True, stdout=StringIO())
+        self.assertEqual(self.get_entry().pk, kept)
+        self.assertTrue(MediaCatalogEntry.objects.filter(source='audio', object_id=other.pk).exists())
+        self.assertEqual(search_catalog(MediaCatalogEntry.objects.all(), 'birdsong').count(), 1)
+        with self.assertNumQueries(len(MEDIA_SOURCES)):
+            call_command('rebuild_media_catalog', missing_only=True, stdout=StringIO())
+
+    def test_facets_follow_catalog_changes(self):
+        folder = MediaFolder.objects.create(name='Clips', slug='clips')
+        self.video.folder = folder
+        self.video.save()
+        self.video.tags.add('trees')
+        self.video.categories.add(self.category)
+        Audio.objects.create(title='Birdsong', file=ContentFile(b'a', name='bird.mp3'))
+
+        facets = get_facets(MediaCatalogEntry.objects.all())
+        self.assertEqual(facets['types'], {'image': 0, 'document': 0, 'video': 1, 'audio': 1})
+        self.assertEqual(facets['total'], 2)
+        self.assertEqual(facets['categories'], [{'slug': 'nature', 'name': 'Nature', 'count': 1}])
+        self.assertEqual(facets['tags'], [{'name': 'trees', 'count': 1}])
+        self.assertEqual(facets['folders'], [{'id': folder.pk, 'name': 'Clips', 'count': 1}])
+
+        # Cached until the catalog changes; only the version stamp is read
+        with self.assertNumQueries(1):
+            get_facets(MediaCatalogEntry.objects.all())
+        self.video.tags.add('forest')
+        facets = get_facets(MediaCatalogEntry.objects.all())
+        self.assertEqual([tag['name'] for tag in facets['tags']], ['forest', 'trees'])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FileMetadataTests(TestCase):
+    """
+    Tests for file size, MIME type and content hash persisted on save.
+    """
+
+    def test_metadata_stored_on_upload_and_file_change(self):
+        audio = Audio.objects.create(title='Song', file=ContentFile(b'ID3' + b'x' * 100, name='song.mp3'))
+        audio.refresh_from_db()
+        self.assertEqual(audio.file_size, 103)
+        self.assertEqual(audio.mime_type, 'audio/mpeg')
+        self.assertEqual(audio.content_hash, hashlib.sha256(b'ID3' + b'x' * 100).hexdigest())
+
+        audio.file.save('other.mp3', ContentFile(b'ID3'), save=True)
+        audio.refresh_from_db()
+        self.assertEqual(audio.file_size, 3)
+        self.assertEqual(
+            MediaCatalogEntry.objects.get(source='audio', object_id=audio.pk).file_size, 3
+        )
+
+    def test_legacy_rows_are_not_hashed_on_unrelated_saves(self):
+        video = Video.objects.create(title='Clip', file=ContentFile(b'data', name='clip.mp4'))
+        Video.objects.filter(pk=video.pk).update(file_size=None, content_hash='', mime_type='')
+        video = Video.objects.get(pk=video.pk)
+        video.title = 'Renamed'
+        with mock.patch('media_enhancements.signals.update_file_metadata') as update:
+            video.save()
+        update.assert_not_called()
+
+    def test_backfill_command(self):
+        video = Video.objects.create(title='Clip', file=ContentFile(b'data', name='clip.mp4'))
+        Video.objects.filter(pk=video.pk).update(file_size=None, content_hash='', mime_type='')
+        call_command('backfill_file_metadata', workers=2, stdout=StringIO())
+        video.refresh_from_db()
+        self.assertEqual(video.file_size, 4)
+        self.assertEqual(video.content_hash, hashlib.sha256(b'data').hexdigest())
+
+
+class MediaFolderTreeTests(TestCase):
+    """
+    Tests for the materialized-path folder hierarchy.
+    """
+
+    def setUp(self):
+        self.root = MediaFolder.objects.create(name='Marketing', slug='marketing')
+        self.child = MediaFolder.objects.create(name='Campaigns', slug='campaigns', parent=self.root)
+        self.leaf = MediaFolder.objects.create(name='2024', slug='2024', parent=self.child)
+        self.other = MediaFolder.objects.create(name='Archive', slug='archive')
+
+    def test_paths_and_single_query_lookups(self):
+        self.assertEqual(self.leaf.path, f'/{self.root.pk}/{self.child.pk}/{self.leaf.pk}/')
+        self.assertEqual(self.leaf.depth, 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.leaf.get_breadcrumbs(), [self.root, self.child, self.leaf])
+        with self.assertNumQueries(1):
+            self.assertEqual(set(self.root.get_descendants()), {self.child, self.leaf})
+
+    def test_moving_a_folder_moves_its_subtree(self):
+        self.child.parent = self.other
+        self.child.save()
+        self.leaf.refresh_from_db()
+        self.assertEqual(self.leaf.path, f'/{self.other.pk}/{self.child.pk}/{self.leaf.pk}/')
+        self.assertEqual(self.leaf.get_breadcrumbs(), [self.other, self.child, self.leaf])
+        self.assertFalse(self.root.get_descendants().exists())
+
+    def test_cannot_move_into_own_subtree(self):
+        self.root.parent = self.leaf
+        with self.assertRaises(ValueError):
+            self.root.save()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FolderCountTests(TestCase):
+    """
+    Tests for the counter-cached media counts on MediaFolder.
+    """
+
+    def setUp(self):
+        self.root = MediaFolder.objects.create(name='Marketing', slug='marketing')
+        self.child = MediaFolder.objects.create(name='Campaigns', slug='campaigns', parent=self.root)
+        self.other = MediaFolder.objects.create(name='Archive', slug='archive')
+
+    def counts(self, folder):
+        folder.refresh_from_db()
+        return folder.video_count, folder.audio_count, folder.subtree_media_count
+
+    def test_counts_follow_create_move_and_delete(self):
+        video = Video.objects.create(title='Clip', file=ContentFile(b'v', name='clip.mp4'), folder=self.child)
+        Audio.objects.create(title='Song', file=ContentFile(b'a', name='song.mp3'), folder=self.child)
+        self.assertEqual(self.counts(self.child), (1, 1, 2))
+        self.assertEqual(self.counts(self.root), (0, 0, 2))
+        self.assertEqual(self.child.get_media_count(), 2)
+
+        video.folder = self.other
+        video.save()
+        self.assertEqual(self.counts(self.child), (0, 1, 1))
+        self.assertEqual(self.counts(self.other), (1, 0, 1))
+
+        video.delete()
+        self.assertEqual(self.counts(self.other), (0, 0, 0))
+        self.assertTrue(self.other.can_delete())
+
+    def test_folder_moves_and_deletes_update_ancestors(self):
+        Video.objects.create(title='Clip', file=ContentFile(b'v', name='clip.mp4'), folder=self.child)
+        self.child.parent = self.other
+        self.child.save()
+        self.assertEqual(self.counts(self.root)[2], 0)
+        self.assertEqual(self.counts(self.other)[2], 1)
+
+        self.child.delete()
+        self.assertEqual(self.counts(self.other)[2], 0)
+
+    def test_reconcile_command(self):
+        Video.objects.create(title='Clip', file=ContentFile(b'v', name='clip.mp4'), folder=self.child)
+        MediaFolder.objects.update(video_count=7, subtree_media_count=7)
+        call_command('reconcile_folder_counts', stdout=StringIO())
+        self.assertEqual(self.counts(self.child), (1, 0, 1))
+        self.assertEqual(self.counts(self.root), (0, 0, 1))
+        self.assertEqual(self.counts(self.other), (0, 0, 0))
+
+    def test_migration_backfills_existing_media(self):
+        Video.objects.create(title='Clip', file=ContentFile(b'v', name='clip.mp4'), folder=self.child)
+        MediaFolder.objects.update(video_count=0, subtree_media_count=0)
+        migration = importlib.import_module('media_enhancements.migrations.0011_mediafolder_counts')
+        migration.populate_folder_counts(django_apps, None)
+        self.assertEqual(self.counts(self.child), (1, 0, 1))
+        self.assertEqual(self.counts(self.root), (0, 0, 1))
+        self.assertFalse(self.root.can_delete())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class CatalogSearchTests(TestCase):
+    """
+    Tests for ranked full-text search over the media catalog.
+    """
+
+    def setUp(self):
+        self.nature = Category.objects.create(name='Wildlife', slug='wildlife')
+        self.ocean = Video.objects.create(
+            title='Ocean Waves', director='Jane Harbour', file=ContentFile(b'v', name='ocean.mp4')
+        )
+        self.harbour = Video.objects.create(title='Harbour Lights', file=ContentFile(b'v', name='harbour.mp4'))
+        self.song = Audio.objects.create(
+            title='Morning', artist='The Harbour Band', album='Tides', file=ContentFile(b'a', name='m.mp3')
+        )
+        self.song.categories.add(self.nature)
+
+    def search(self, query):
+        results = search_catalog(MediaCatalogEntry.objects.all(), query).order_by('-search_rank', 'title')
+        return [entry.title for entry in results]
+
+    def test_matches_descriptive_fields_and_ranks_titles_first(self):
+        results = self.search('harbour')
+        self.assertEqual(results[0], 'Harbour Lights')
+        self.assertEqual(sorted(results[1:]), ['Morning', 'Ocean Waves'])
+        self.assertEqual(self.search('tides'), ['Morning'])
+        self.assertEqual(self.search('wildlife'), ['Morning'])
+        self.assertEqual(self.search('harb lig'), ['Harbour Lights'])
+        # Search syntax in user input is ignored rather than raising errors
+        self.assertEqual(self.search('harbour "lights"!*'), ['Harbour Lights'])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.harbour.title = 'Evening Lights'
+        self.harbour.save()
+        self.ocean.tags.add('surf')
+        self.assertEqual(sorted(self.search('harbour')), ['Morning', 'Ocean Waves'])
+        self.assertEqual(self.search('surf'), ['Ocean Waves'])
+        self.ocean.delete()
+        self.assertEqual(self.search('harbour'), ['Morning'])
+
+    def test_dashboard_search_defaults_to_relevance(self):
+        user = User.objects.create_user('editor', password='password')
+        self.client.force_login(user)
+        response = self.client.get(reverse('media_enhancements:unified_dashboard'), {'q': 'harbour'})
+        self.assertEqual(response.context['sort_by'], 'relevance')
+        self.assertEqual(response.context['stats']['total'], 3)
+        self.assertEqual(list(response.context['media_items'])[0].title, 'Harbour Lights')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FuzzySearchTests(TestCase):
+    """
+    Tests for typo-tolerant search and title/tag autocomplete.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('editor', password='password')
+        self.client.force_login(self.user)
+        Video.objects.create(title='Mountain Sunrise', file=ContentFile(b'v', name='m.mp4'))
+        Video.objects.create(title='Mountains at Dusk', file=ContentFile(b'v', name='d.mp4'))
+        song = Audio.objects.create(title='Birdsong', file=ContentFile(b'a', name='b.mp3'))
+        song.tags.add('morning chorus')
+
+    def test_fuzzy_search_tolerates_typos(self):
+        results = fuzzy_search_catalog(MediaCatalogEntry.objects.all(), 'montain sunrse')
+        self.assertEqual(results.order_by('-search_rank').first().title, 'Mountain Sunrise')
+        tagged = fuzzy_search_catalog(MediaCatalogEntry.objects.all(), 'chorsu')
+        self.assertEqual([entry.title for entry in tagged], ['Birdsong'])
+
+    def test_autocomplete_matches_title_and_tag_prefixes(self):
+        self.assertEqual(
+            autocomplete('Mount'),
+            {'titles': ['Mountain Sunrise', 'Mountains at Dusk'], 'tags': []},
+        )
+        self.assertEqual(autocomplete('morn')['tags'], ['morning chorus'])
+        Tag.objects.create(name='Nature', slug='nature')
+        self.assertEqual(autocomplete('nat')['tags'], ['Nature'])
+        self.assertEqual(autocomplete('MORN')['tags'], ['morning chorus'])
+
+    def test_autocomplete_endpoint_suggests_close_titles(self):
+        url = reverse('media_enhancements:media_autocomplete_api')
+        data = self.client.get(url, {'q': 'birdsnog'}).json()
+        self.assertEqual(data['titles'], [])
+        self.assertEqual(data['suggestions'], ['Birdsong'])
+
+    def test_dashboard_falls_back_to_fuzzy_results(self):
+        response = self.client.get(reverse('media_enhancements:unified_dashboard'), {'q': 'mountian'})
+        self.assertTrue(response.context['fuzzy_results'])
+        self.assertEqual(
+            sorted(item.title for item in response.context['media_items']),
+            ['Mountain Sunrise', 'Mountains at Dusk'],
+        )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ThumbnailTests(TestCase):
+    """
+    Tests for rendition-based dashboard thumbnails.
+    """
+
+    def setUp(self):
+        # Wagtail caches renditions by image id, which rolled-back tests reuse
+        cache.clear()
+
+    def create_image(self, title):
+        buffer = BytesIO()
+        PILImage.new('RGB', (1200, 900), 'teal').save(buffer, 'JPEG')
+        return CustomImage.objects.create(title=title, file=ImageFile(buffer, name=f'{title}.jpg'))
+
+    def test_renditions_generated_on_upload_and_used_by_cards(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = self.create_image('lake')
+        self.assertEqual(
+            set(image.renditions.values_list('filter_spec', flat=True)), set(THUMBNAIL_FILTERS)
+        )
+
+        entries = list(MediaCatalogEntry.objects.filter(source='customimage'))
+        # object, categories, tags and renditions
+        with self.assertNumQueries(4):
+            item = build_unified_items(entries)[0]
+            url, url_2x = item.thumbnail_url, item.thumbnail_url_2x
+        self.assertIn('fill-300x200', url)
+        self.assertIn('fill-600x400', url_2x)
+        self.assertNotEqual(url, image.file.url)
+
+    def test_api_thumbnail_field(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = self.create_image('reef')
+        data = CustomImageSerializer(image, fields=['id', 'thumbnail_url']).data
+        self.assertEqual(set(data), {'id', 'thumbnail_url'})
+        self.assertIn('fill-300x200', data['thumbnail_url'])
+
+    def test_edit_replaces_thumbnails(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = self.create_image('lake')
+        before = CustomImageSerializer(image, fields=['id', 'thumbnail_url']).data['thumbnail_url']
+
+        user = User.objects.create_user('editor', password='password')
+        self.client.force_login(user)
+        url = reverse('media_enhancements:apply_edit', args=[image.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                url, json.dumps({'operation': 'grayscale'}), content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+        image = CustomImage.objects.get(pk=image.pk)
+        after = CustomImageSerializer(image, fields=['id', 'thumbnail_url']).data['thumbnail_url']
+        self.assertIn('fill-300x200', after)
+        self.assertNotEqual(after, before)
+        self.assertEqual(image.renditions.count(), len(THUMBNAIL_FILTERS))
+
+    def test_missing_renditions_skips_existing_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = self.create_image('dune')
+        missing = missing_renditions([image], ['fill-300x200', 'width-100'])
+        self.assertEqual(missing, {image.pk: ['width-100']})
+
+    def test_filter_specs_found_in_templates(self):
+        source = (
+            '{% load wagtailimages_tags %}'
+            '{% image page.photo fill-300x200 format-webp class="hero" %}'
+            '{% image page.photo width-800 as photo %}'
+            '{% srcset_image page.photo width-{400,800} sizes="100vw" %}'
+        )
+        self.assertEqual(
+            filter_specs_in_template(source),
+            {'fill-300x200|format-webp', 'width-800', 'width-400'},
+        )
+
+    def test_placeholder_until_renditions_exist(self):
+        self.create_image('pending')
+        item = build_unified_items(MediaCatalogEntry.objects.filter(source='customimage'))[0]
+        self.assertIsNone(item.thumbnail_url)
+        self.assertIsNone(item.thumbnail_url_2x)
+
+
+class MediaGarbageCollectionTests(TestCase):
+    """
+    Tests for the orphaned rendition and derivative file collector.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.video = Video.objects.create(title='Clip', file=ContentFile(b'v', name='clip.mp4'))
+        self.video.thumbnail.save('clip_thumb.jpg', ContentFile(b't'))
+
+    def write(self, name, size=10):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        return path
+
+    def test_reports_then_deletes_only_unreferenced_derivatives(self):
+        orphans = [
+            self.write('videos/old_thumb.jpg', 100),
+            self.write('videos/old.gif', 200),
+            self.write('documents/report_preview.jpg', 300),
+            self.write('images/gone.fill-300x200.jpg', 400),
+        ]
+        upload = self.write('videos/unreferenced.mp4')
+
+        out = StringIO()
+        call_command('collect_media_garbage', min_age_hours=0, stdout=out)
+        self.assertIn('Found 4 orphaned files (1000', out.getvalue())
+        self.assertTrue(all(os.path.exists(path) for path in orphans))
+
+        call_command('collect_media_garbage', min_age_hours=0, delete=True, stdout=StringIO())
+        self.assertFalse(any(os.path.exists(path) for path in orphans))
+        self.assertTrue(os.path.exists(upload))
+        self.assertTrue(os.path.exists(self.video.file.path))
+        self.assertTrue(os.path.exists(self.video.thumbnail.path))
+
+    def test_recent_files_are_kept(self):
+        path = self.write('videos/new_thumb.jpg')
+        call_command('collect_media_garbage', delete=True, stdout=StringIO())
+        self.assertTrue(os.path.exists(path))
+
+
+class ConditionalGetTests(TestCase):
+    """
+    Tests for ETag / Last-Modified validators on the dashboard and APIs.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('editor', password='password')
+        self.client.force_login(self.user)
+        Category.objects.create(name='Nature', slug='nature')
+
+    def assertRevalidates(self, url):
+        # The first visit sets the CSRF cookie, which the validators include
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Category.objects.create(name=f'Urban {etag}', slug=etag.strip('"'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_dashboard(self):
+        self.assertRevalidates(reverse('media_enhancements:unified_dashboard'))
+
+    def test_stats_api(self):
+        self.assertRevalidates(reverse('media_enhancements:media_stats_api'))
+
+    def test_media_api(self):
+        self.assertRevalidates('/api/media/images/')
+        self.assertRevalidates('/api/media/categories/nature/')
+
+    def test_validators_vary_by_url(self):
+        url = reverse('media_enhancements:unified_dashboard')
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, {'type': 'video'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_media_change_invalidates(self):
+        url = reverse('media_enhancements:unified_dashboard')
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Video.objects.create(title='Clip', file=ContentFile(b'v', name='clip.mp4'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SerializerCacheTests(TestCase):
+    """
+    Tests for cached per-object API representations.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.documents = [
+            CustomDocument.objects.create(title=f'Report {i}', file=ContentFile(b'd', name=f'report{i}.pdf'))
+            for i in range(3)
+        ]
+        self.tag(self.documents[0], 'finance')
+
+    def tag(self, obj, name):
+        # ClusterTaggableManager cannot add tags through the generic TaggedItem model
+        tag, created = Tag.objects.get_or_create(name=name, slug=name)
+        TaggedItem.objects.create(tag=tag, content_object=obj)
+
+    def serialize(self):
+        documents = list(CustomDocument.objects.order_by('pk'))
+        return CustomDocumentSerializer(documents, many=True).data
+
+    def test_second_listing_is_served_from_cache(self):
+        # documents, versions, then one TaggedItem query for the batch
+        with self.assertNumQueries(3):
+            first = self.serialize()
+        self.assertEqual(first[0]['tags'], ['finance'])
+        with self.assertNumQueries(2):
+            self.assertEqual(self.serialize(), first)
+
+    def test_changes_invalidate_only_that_object(self):
+        self.serialize()
+        document = self.documents[1]
+        document.title = 'Renamed'
+        document.save()
+        self.tag(self.documents[2], 'legal')
+        # documents, versions, then tags for the two changed objects
+        with self.assertNumQueries(3):
+            data = self.serialize()
+        self.assertEqual(data[1]['title'], 'Renamed')
+        self.assertEqual(data[2]['tags'], ['legal'])
+
+    def test_versions_are_shared_through_the_database(self):
+        first = self.serialize()
+        # Another process bumps the version; this process's cache never hears of it
+        CustomDocument.objects.filter(pk=self.documents[1].pk).update(title='Renamed')
+        bump_serializer_version(CustomDocument, self.documents[1].pk)
+        self.assertEqual(
+            SerializerVersion.objects.get(object_id=self.documents[1].pk).version, 2
+        )
+        data = self.serialize()
+        self.assertEqual(data[1]['title'], 'Renamed')
+        self.assertEqual(data[0], first[0])
+
+    def test_category_change_invalidates_nested_categories(self):
+        buffer = BytesIO()
+        PILImage.new('RGB', (40, 30), 'teal').save(buffer, 'JPEG')
+        image = CustomImage.objects.create(title='lake', file=ImageFile(buffer, name='lake.jpg'))
+        category = Category.objects.create(name='Nature', slug='nature')
+        image.categories.add(category)
+
+        data = CustomImageSerializer(image).data
+        self.assertEqual([c['name'] for c in data['categories']], ['Nature'])
+        category.name = 'Outdoors'
+        category.save()
+        data = CustomImageSerializer(CustomImage.objects.get(pk=image.pk)).data
+        self.assertEqual([c['name'] for c in data['categories']], ['Outdoors'])
+
+
+class SparseFieldsetTests(TestCase):
+    """
+    Tests for ?fields= and ?expand= on the media API.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.folder = MediaFolder.objects.create(name='Reports', slug='reports')
+        self.document = CustomDocument.objects.create(
+            title='Annual report', file=ContentFile(b'd', name='annual.pdf'), folder=self.folder
+        )
+
+    def get(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/media/documents/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'], ' '.join(query['sql'] for query in queries)
+
+    def test_default_fields_leave_out_expandable_ones(self):
+        results, sql = self.get()
+        self.assertIn('tags', results[0])
+        self.assertNotIn('folder', results[0])
+
+    def test_fields_narrow_payload_and_query(self):
+        results, sql = self.get(fields='id,title')
+        self.assertEqual(results, [{'id': self.document.pk, 'title': 'Annual report'}])
+        self.assertNotIn('department', sql)
+        self.assertNotIn('taggit_taggeditem', sql)
+
+    def test_expand_folder(self):
+        results, sql = self.get(expand='folder')
+        self.assertEqual(results[0]['folder']['name'], 'Reports')
+        self.assertIn('file_url', results[0])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/media/documents/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DocumentOrderingTests(TestCase):
+    """
+    Tests for cursor-paginated document ordering.
+    """
+
+    def setUp(self):
+        cache.clear()
+        today = timezone.localdate()
+        for i, days in enumerate([30, None, 10, 20]):
+            CustomDocument.objects.create(
+                title=f'Contract {i}', file=ContentFile(b'd', name=f'contract{i}.pdf'),
+                expiry_date=today + timedelta(days=days) if days is not None else None,
+            )
+
+    def test_expiry_date_ordering_pages_over_dated_documents(self):
+        titles = []
+        url, params = '/api/media/documents/', {'ordering': 'expiry_date', 'page_size': 2, 'fields': 'title'}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            titles += [item['title'] for item in data['results']]
+            url, params = data['next'], None
+        self.assertEqual(titles, ['Contract 2', 'Contract 3', 'Contract 0'])
+
+
+class BulkLookupTests(TestCase):
+    """
+    Tests for the bulk/ lookup action on the media API.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.videos = [
+            Video.objects.create(title=f'Clip {i}', file=ContentFile(b'v', name=f'clip{i}.mp4'))
+            for i in range(3)
+        ]
+        self.videos[1].tags.add('drone')
+
+    def test_results_follow_requested_order(self):
+        ids = [self.videos[2].pk, self.videos[0].pk, 9999, self.videos[1].pk]
+        response = self.client.get('/api/media/videos/bulk/', {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([item['id'] for item in data['results']], [ids[0], ids[1], ids[3]])
+        self.assertEqual(data['results'][2]['tags'], ['drone'])
+        self.assertEqual(data['missing'], [9999])
+
+    def test_invalid_and_oversized_requests(self):
+        self.assertEqual(self.client.get('/api/media/audio/bulk/', {'ids': '1,x'}).status_code, 400)
+        ids = ','.join(str(pk) for pk in range(1, 502))
+        self.assertEqual(self.client.get('/api/media/documents/bulk/', {'ids': ids}).status_code, 400)
+
+    def test_sparse_fields_apply(self):
+        response = self.client.get('/api/media/videos/bulk/', {'ids': self.videos[0].pk, 'fields': 'id,title'})
+        self.assertEqual(response.json()['results'], [{'id': self.videos[0].pk, 'title': 'Clip 0'}])
+
+
+class RelatedMediaTests(TestCase):
+    """
+    Tests for the precomputed related-media index.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.nature = Category.objects.create(name='Nature', slug='nature')
+        self.folder = MediaFolder.objects.create(name='Shoots', slug='shoots')
+
+    def video(self, title, categories=(), tags=(), folder=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            video = Video.objects.create(title=title, file=ContentFile(b'v', name=f'{title}.mp4'), folder=folder)
+            video.categories.add(*categories)
+            if tags:
+                video.tags.add(*tags)
+        return video
+
+    def test_scored_by_categories_tags_and_folder(self):
+        main = self.video('main', [self.nature], ['forest', 'river'], folder=self.folder)
+        both = self.video('both', [self.nature], ['forest'])
+        tag_only = self.video('tag-only', tags=['river'])
+        same_folder = self.video('same-folder', folder=self.folder)
+        self.video('unrelated', tags=['city'])
+        audio = Audio.objects.create(title='song', file=ContentFile(b'a', name='song.mp3'))
+        audio.categories.add(self.nature)
+
+        self.assertEqual(
+            get_related_ids('video', main.pk),
+            [both.pk, tag_only.pk, same_folder.pk],
+        )
+        # Relations are stored both ways
+        self.assertEqual(get_related_ids('video', both.pk), [main.pk])
+
+    def test_refreshed_when_tags_change(self):
+        main = self.video('main', [self.nature], ['forest', 'river'])
+        first = self.video('first', [self.nature])
+        second = self.video('second', tags=['river'])
+        self.assertEqual(get_related_ids('video', main.pk), [first.pk, second.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.tags.add('forest')
+        self.assertEqual(get_related_ids('video', main.pk), [second.pk, first.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            main.categories.remove(self.nature)
+        self.assertEqual(get_related_ids('video', main.pk), [second.pk])
+
+    def test_refreshed_once_per_transaction(self):
+        with mock.patch('media_enhancements.related.refresh_related', wraps=refresh_related) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                main = Video.objects.create(title='main', file=ContentFile(b'v', name='main.mp4'))
+                main.categories.add(self.nature)
+                main.tags.add('forest', 'river', 'lake')
+                self.assertEqual(refresh.call_count, 0)
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual([entry.object_id for entry in refresh.call_args.args[0]], [main.pk])
+
+    def test_rebuild_matches_incremental(self):
+        main = self.video('main', [self.nature], ['forest'])
+        other = self.video('other', [self.nature])
+        call_command('rebuild_media_catalog', stdout=StringIO())
+        self.assertEqual(get_related_ids('video', main.pk), [other.pk])
+
+    def test_image_api_related_action(self):
+        buffer = BytesIO()
+        PILImage.new('RGB', (40, 30), 'teal').save(buffer, 'JPEG')
+        with self.captureOnCommitCallbacks(execute=True):
+            image = CustomImage.objects.create(title='lake', file=ImageFile(buffer, name='lake.jpg'))
+            other = CustomImage.objects.create(title='river', file=ImageFile(buffer, name='river.jpg'))
+            CustomImage.objects.create(title='city', file=ImageFile(buffer, name='city.jpg'))
+            image.categories.add(self.nature)
+            other.categories.add(self.nature)
+
+        response = self.client.get(f'/api/media/images/{image.pk}/related/')
+        self.assertEqual([item['id'] for item in response.json()], [other.pk])
+
+
+class MediaStatsTests(TestCase):
+    """
+    Tests for the counter-backed media stats API.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('editor', password='password')
+        self.client.force_login(self.user)
+        self.nature = Category.objects.create(name='Nature', slug='nature')
+        self.urban = Category.objects.create(name='Urban', slug='urban')
+
+    def create_image(self, title):
+        buffer = BytesIO()
+        PILImage.new('RGB', (40, 30), 'teal').save(buffer, 'JPEG')
+        return CustomImage.objects.create(title=title, file=ImageFile(buffer, name=f'{title}.jpg'))
+
+    def get_stats(self):
+        return self.client.get(reverse('media_enhancements:media_stats_api')).json()
+
+    def category_counts(self, stats):
+        return {row['name']: row['image_count'] for row in stats['images_by_category']}
+
+    def test_migration_backfills_existing_media(self):
+        lake = self.create_image('lake')
+        lake.categories.add(self.nature)
+        MediaStatCounter.objects.all().delete()
+        Category.objects.update(image_count=0)
+
+        migration = importlib.import_module('media_enhancements.migrations.0017_media_stats')
+        migration.populate_media_stats(django_apps, None)
+        stats = self.get_stats()
+        self.assertEqual((stats['total_images'], stats['total_categories']), (1, 2))
+        self.assertEqual(self.category_counts(stats), {'Nature': 1, 'Urban': 0})
+
+    def test_counters_follow_creates_deletes_and_links(self):
+        lake = self.create_image('lake')
+        tower = self.create_image('tower')
+        lake.categories.add(self.nature, self.urban)
+        tower.categories.add(self.urban)
+        CustomDocument.objects.create(title='Report', file=ContentFile(b'd', name='report.pdf'))
+
+        stats = self.get_stats()
+        self.assertEqual((stats['total_images'], stats['total_documents'], stats['total_categories']), (2, 1, 2))
+        self.assertEqual(self.category_counts(stats), {'Nature': 1, 'Urban': 2})
+
+        lake.categories.remove(self.urban)
+        self.urban.customimage_set.remove(tower)
+        self.assertEqual(self.category_counts(self.get_stats()), {'Nature': 1, 'Urban': 0})
+
+        tower.categories.add(self.nature)
+        lake.delete()
+        stats = self.get_stats()
+        self.assertEqual(stats['total_images'], 1)
+        self.assertEqual(self.category_counts(stats), {'Nature': 1, 'Urban': 0})
+
+        # Saving a category loaded earlier must not overwrite its counter
+        self.nature.description = 'Outdoors'
+        self.nature.save()
+        self.assertEqual(self.category_counts(self.get_stats())['Nature'], 1)
+
+    def test_link_changes_adjust_counts_without_recounting(self):
+        lake = self.create_image('lake')
+        tower = self.create_image('tower')
+        with CaptureQueriesContext(connection) as queries:
+            lake.categories.add(self.nature, self.urban)
+            lake.categories.add(self.nature)
+            self.nature.customimage_set.add(tower)
+            lake.categories.remove(self.urban)
+            tower.categories.remove(self.urban)
+            self.nature.customimage_set.remove(lake, tower)
+            self.nature.customimage_set.remove(lake)
+        self.assertNotIn('COUNT(', ' '.join(query['sql'] for query in queries if 'UPDATE' in query['sql']))
+        self.assertEqual(self.category_counts(self.get_stats()), {'Nature': 0, 'Urban': 0})
+
+        tower.categories.add(self.nature, self.urban)
+        tower.categories.clear()
+        self.assertEqual(self.category_counts(self.get_stats()), {'Nature': 0, 'Urban': 0})
+
+    def test_recent_uploads_are_bounded(self):
+        for i in range(12):
+            CustomDocument.objects.create(title=f'Doc {i}', file=ContentFile(b'd', name=f'doc{i}.pdf'))
+        self.assertEqual(len(self.get_stats()['recent_uploads']['documents']), 10)
+
+    def test_reconcile_repairs_counters(self):
+        image = self.create_image('lake')
+        image.categories.add(self.nature)
+        MediaStatCounter.objects.update(value=99)
+        Category.objects.update(image_count=5)
+        out = StringIO()
+        call_command('reconcile_media_stats', stdout=out)
+        self.assertIn('Corrected 5 counters', out.getvalue())
+        stats = self.get_stats()
+        self.assertEqual((stats['total_images'], stats['total_categories']), (1, 2))
+        self.assertEqual(self.category_counts(stats), {'Nature': 1, 'Urban': 0})
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImageEditorRecipeTests(TestCase):
+    """
+    Tests for multi-step edit recipes.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('editor', password='password')
+        self.client.force_login(self.user)
+        buffer = BytesIO()
+        PILImage.new('RGB', (800, 600), 'teal').save(buffer, 'JPEG')
+        self.image = CustomImage.objects.create(title='lake', file=ImageFile(buffer, name='lake.jpg'))
+
+    def post(self, url, data):
+        return self.client.post(url, json.dumps(data), content_type='application/json')
+
+    RECIPE = [
+        {'operation': 'crop_aspect', 'params': {'aspect_ratio': 'square'}},
+        {'operation': 'resize', 'params': {'width': 200}},
+        {'operation': 'enhance_sharpness'},
+        {'operation': 'watermark', 'params': {'text': 'Demo'}},
+        {'operation': 'convert_format', 'params': {'format': 'WEBP'}},
+    ]
+
+    def test_recipe_decodes_and_encodes_once(self):
+        with mock.patch.object(PILImage, 'open', wraps=PILImage.open) as decode, \
+                mock.patch.object(PILImage.Image, 'save', autospec=True, side_effect=PILImage.Image.save) as encode:
+            editor = ImageEditor(self.image.file.path).apply_recipe(self.RECIPE)
+            django_file = editor.get_django_file(editor.output_filename('lake.jpg'), format=editor.output_format)
+        self.assertEqual((decode.call_count, encode.call_count), (1, 1))
+        self.assertEqual(django_file.name, 'lake.webp')
+
+    def test_apply_edit_with_recipe(self):
+        url = reverse('media_enhancements:apply_edit', args=[self.image.pk])
+        response = self.post(url, {'recipe': self.RECIPE})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.image.refresh_from_db()
+        self.assertTrue(self.image.file.name.endswith('.webp'))
+        with PILImage.open(self.image.file.path) as result:
+            self.assertEqual((result.format, result.size), ('WEBP', (200, 200)))
+
+    def test_single_operation_still_accepted(self):
+        url = reverse('media_enhancements:apply_edit', args=[self.image.pk])
+        response = self.post(url, {'operation': 'rotate', 'params': {'degrees': 90}})
+        self.assertEqual(response.status_code, 200)
+        self.image.refresh_from_db()
+        with PILImage.open(self.image.file.path) as result:
+            self.assertEqual((result.format, result.size), ('JPEG', (600, 800)))
+
+    def test_invalid_recipe_is_rejected_before_editing(self):
+        url = reverse('media_enhancements:apply_edit', args=[self.image.pk])
+        response = self.post(url, {'recipe': [{'operation': 'grayscale'}, {'operation': 'explode'}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('explode', response.json()['error'])
+
+    def test_batch_process_applies_recipe(self):
+        response = self.post(reverse('media_enhancements:batch_process'), {
+            'image_ids': [self.image.pk, 9999],
+            'recipe': [{'operation': 'grayscale'}, {'operation': 'resize', 'params': {'width': 100}}],
+        })
+        results = response.json()['results']
+        self.assertEqual([result['success'] for result in results], [True, False])
+        self.image.refresh_from_db()
+        with PILImage.open(self.image.file.path) as result:
+            self.assertEqual(result.size, (100, 75))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), MEDIA_PREVIEW_CACHE_DIR=tempfile.mkdtemp())
+class ImagePreviewTests(TestCase):
+    """
+    Tests for reduced-resolution edit previews.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('editor', password='password')
+        self.client.force_login(self.user)
+
+    def create_image(self, format, size=(4000, 3000), mode='RGB'):
+        buffer = BytesIO()
+        PILImage.new('RGB', size, 'teal').convert(mode).save(buffer, format)
+        name = f'big.{format.lower()}'
+        return CustomImage.objects.create(title='big', file=ImageFile(buffer, name=name))
+
+    def preview(self, image, **params):
+        url = reverse('media_enhancements:preview_edit', args=[image.pk])
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return PILImage.open(BytesIO(response.content))
+
+    def test_jpeg_is_decoded_at_reduced_scale(self):
+        image = self.create_image('JPEG')
+        editor = ImageEditor(image.file.path, max_size=800)
+        # draft() picks the 1/4 DCT scale, then thumbnail() finishes the job
+        self.assertEqual(editor.image.size, (800, 600))
+        self.assertEqual(editor.scale, 0.2)
+        self.assertEqual(self.preview(image, size=800).size, (800, 600))
+
+    def test_png_is_reduced(self):
+        image = self.create_image('PNG')
+        self.assertEqual(self.preview(image, size=500).size, (500, 375))
+
+    def test_palette_images_are_reduced(self):
+        for format in ('GIF', 'PNG'):
+            image = self.create_image(format, size=(3000, 2000), mode='P')
+            self.assertEqual(self.preview(image, size=500).size, (500, 333))
+
+    def test_recipe_pixel_params_follow_the_proxy_scale(self):
+        image = self.create_image('JPEG')
+        recipe = [
+            {'operation': 'crop', 'params': {'left': 0, 'top': 0, 'right': 2000, 'bottom': 3000}},
+            {'operation': 'rotate', 'params': {'degrees': 90}},
+        ]
+        result = self.preview(image, size=800, recipe=json.dumps(recipe))
+        self.assertEqual(result.size, (600, 400))
+
+    def test_legacy_query_parameters(self):
+        image = self.create_image('JPEG', size=(300, 200))
+        self.assertEqual(self.preview(image, operation='rotate', degrees='90').size, (200, 300))
+        self.assertEqual(self.preview(image).size, (300, 200))
+
+    def test_only_numeric_query_parameters_are_converted(self):
+        image = self.create_image('JPEG', size=(300, 200))
+        with mock.patch.object(ImageEditor, 'add_watermark', autospec=True, return_value=None) as watermark:
+            self.preview(image, operation='watermark', text='2024', opacity='64')
+        kwargs = watermark.call_args.kwargs
+        self.assertEqual((kwargs['text'], kwargs['opacity']), ('2024', 64))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class PreviewCacheTests(TestCase):
+    """
+    Tests for the content-addressed editor preview cache.
+    """
+
+    def setUp(self):
+        cache.clear()
+        cache_dir = tempfile.mkdtemp()
+        override = override_settings(MEDIA_PREVIEW_CACHE_DIR=cache_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user('editor', password='password')
+        self.client.force_login(self.user)
+        buffer = BytesIO()
+        PILImage.new('RGB', (600, 400), 'teal').save(buffer, 'JPEG')
+        self.image = CustomImage.objects.create(title='lake', file=ImageFile(buffer, name='lake.jpg'))
+        self.url = reverse('media_enhancements:preview_edit', args=[self.image.pk])
+
+    def test_repeated_preview_is_served_from_cache(self):
+        params = {'operation': 'rotate', 'degrees': '90', 'size': '300'}
+        first = self.client.get(self.url, params)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+
+        with mock.patch('media_enhancements.image_editor_views.ImageEditor.__init__') as editor:
+            second = self.client.get(self.url, params)
+        editor.assert_not_called()
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        revalidated = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_key_follows_recipe_format_and_content(self):
+        etag = self.client.get(self.url, {'operation': 'grayscale'})['ETag']
+        self.assertNotEqual(self.client.get(self.url, {'operation': 'flip_vertical'})['ETag'], etag)
+        webp = self.client.get(self.url, {'operation': 'grayscale', 'format': 'webp'})
+        self.assertEqual(webp['Content-Type'], 'image/webp')
+        self.assertNotEqual(webp['ETag'], etag)
+
+        CustomImage.objects.filter(pk=self.image.pk).update(content_hash='0' * 64)
+        self.assertNotEqual(self.client.get(self.url, {'operation': 'grayscale'})['ETag'], etag)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        preview_cache = PreviewCache(max_bytes=250)
+        for i, key in enumerate(['aa01', 'aa02', 'aa03']):
+            preview_cache.set(key, b'x' * 100)
+            os.utime(preview_cache._path(key), (1000 + i, 1000 + i))
+        # aa01 was evicted when aa03 pushed the total to 300 bytes
+        self.assertIsNone(preview_cache.get('aa01'))
+        preview_cache.get('aa02')
+        preview_cache.set('aa04', b'x' * 100)
+        self.assertIsNotNone(preview_cache.get('aa02'))
+        self.assertIsNone(preview_cache.get('aa03'))
+
+    def test_writes_under_budget_do_not_walk_the_directory(self):
+        preview_cache = PreviewCache(max_bytes=1000)
+        # The first write in a process measures the directory
+        preview_cache.set('aa00', b'x' * 100)
+        with mock.patch.object(PreviewCache, '_entries', wraps=preview_cache._entries) as entries:
+            for i in range(1, 10):
+                preview_cache.set(f'aa{i:02d}', b'x' * 100)
+            entries.assert_not_called()
+            # 1100 bytes: evicted down to the 900 byte low-water mark
+            preview_cache.set('aa10', b'x' * 100)
+            entries.assert_called_once()
+        self.assertEqual(len(os.listdir(os.path.join(preview_cache.directory, 'aa'))), 9)
+
+
+class ImageAutoCompressTests(TestCase):
+    """
+    Tests for target-size compression.
+    """
+
+    def setUp(self):
+        noise = PILImage.effect_noise((1200, 900), 40).convert('RGB')
+        gradient = PILImage.linear_gradient('L').resize((1200, 900)).convert('RGB')
+        buffer = BytesIO()
+        PILImage.blend(gradient, noise, 0.3).save(buffer, 'PNG')
+        self.source = buffer.getvalue()
+
+    def compress(self, **kwargs):
+        editor = ImageEditor(BytesIO(self.source))
+        with mock.patch.object(editor, '_encode', wraps=editor._encode) as encode:
+            editor.auto_compress(**kwargs)
+        full_encodes = [call for call in encode.call_args_list if call.args[0].size == (1200, 900)]
+        return editor, len(full_encodes)
+
+    def test_fits_target_with_few_full_encodes(self):
+        editor, full_encodes = self.compress(target_size_kb=90, format='JPEG')
+        self.assertLessEqual(editor.compressed_size, 90 * 1024)
+        self.assertLess(full_encodes, 8)
+        # One step up overshoots, so the search didn't settle early
+        larger = len(editor._encode(editor.image, 'JPEG', editor.compression_quality + 1))
+        self.assertTrue(larger > 90 * 1024 or editor.compression_quality == 95)
+
+    def test_webp_target(self):
+        editor, full_encodes = self.compress(target_size_kb=60, format='WEBP')
+        self.assertLessEqual(editor.compressed_size, 60 * 1024)
+        self.assertEqual(editor.output_format, 'WEBP')
+
+    def test_saving_reuses_the_confirmed_encode(self):
+        editor, full_encodes = self.compress(target_size_kb=90, format='JPEG', subsampling='4:2:0')
+        with mock.patch.object(PILImage.Image, 'save') as save:
+            django_file = editor.get_django_file('out.jpg', format=editor.output_format)
+        save.assert_not_called()
+        self.assertEqual(django_file.size, editor.compressed_size)
+
+    def test_downscales_when_min_quality_does_not_fit(self):
+        editor, full_encodes = self.compress(target_size_kb=5, format='JPEG', allow_downscale=True)
+        self.assertLessEqual(editor.compressed_size, 5 * 1024)
+        self.assertLess(editor.image.width, 1200)
+
+    def test_recipe_step(self):
+        editor = ImageEditor(BytesIO(self.source)).apply_recipe(
+            [{'operation': 'auto_compress', 'params': {'target_size_kb': 70, 'format': 'WEBP'}}]
+        )
+        self.assertLessEqual(editor.compressed_size, 70 * 1024)
+        self.assertEqual(editor.output_filename('photo.png'), 'photo.webp')
+
+    def test_lossless_source_falls_back_to_jpeg(self):
+        editor, full_encodes = self.compress(target_size_kb=100)
+        self.assertLessEqual(editor.compressed_size, 100 * 1024)
+        self.assertEqual(editor.output_filename('photo.png'), 'photo.jpg')
+
+    def test_rejects_lossless_format(self):
+        with self.assertRaises(ValueError):
+            ImageEditor(BytesIO(self.source)).auto_compress(format='PNG')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), MEDIA_BATCH_WORKERS=2, MEDIA_BATCH_CHUNK_SIZE=2)
+class BatchProcessTests(TestCase):
+    """
+    Tests for pooled, chunked batch editing.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('editor', password='password')
+        self.client.force_login(self.user)
+        self.images = []
+        for i in range(5):
+            buffer = BytesIO()
+            PILImage.new('RGB', (400, 300), 'teal').save(buffer, 'JPEG')
+            self.images.append(CustomImage.objects.create(title=f'lake {i}', file=ImageFile(buffer, name=f'lake{i}.jpg')))
+        self.url = reverse('media_enhancements:batch_process')
+        self.recipe = [{'operation': 'resize', 'params': {'width': 100}}, {'operation': 'convert_format'}]
+
+    def post(self, data):
+        return self.client.post(self.url, json.dumps(data), content_type='application/json')
+
+    def test_chunks_run_in_the_pool_and_results_keep_request_order(self):
+        image_ids = [image.pk for image in reversed(self.images)] + [9999]
+        response = self.post({'image_ids': image_ids, 'recipe': self.recipe})
+        results = response.json()['results']
+        self.assertEqual([result['image_id'] for result in results], image_ids)
+        self.assertEqual([result['success'] for result in results], [True] * 5 + [False])
+        for image in self.images:
+            image.refresh_from_db()
+            self.assertTrue(image.file.name.endswith('.webp'))
+            with PILImage.open(image.file.path) as result:
+                self.assertEqual((result.format, result.size), ('WEBP', (100, 75)))
+
+    def test_results_echo_requested_ids(self):
+        pk = self.images[0].pk
+        response = self.post({
+            'image_ids': [f'0{pk}', pk, 'abc', 9999.0],
+            'recipe': {'operation': 'grayscale'},
+        })
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['image_id'] for result in results], [f'0{pk}', 'abc', 9999.0])
+        self.assertEqual([result['success'] for result in results], [True, False, False])
+
+    def test_malformed_requests_are_rejected(self):
+        response = self.client.post(self.url, 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.post({'image_ids': [[1]], 'recipe': {'operation': 'grayscale'}})
+        self.assertEqual(response.status_code, 400)
+
+    def test_images_are_fetched_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.post({'image_ids': [image.pk for image in self.images[:2]], 'recipe': {'operation': 'grayscale'}})
+        image_table = CustomImage._meta.db_table
+        selects = [q for q in queries if q['sql'].startswith('SELECT') and f'FROM "{image_table}"' in q['sql']]
+        self.assertEqual(len(selects), 1)
+
+    def test_streamed_results(self):
+        response = self.post({
+            'image_ids': [str(self.images[0].pk), 'abc', self.images[1].pk],
+            'recipe': {'operation': 'grayscale'},
+            'stream': True,
+        })
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        outcomes = {str(line['image_id']): line['success'] for line in lines}
+        self.assertEqual(
+            outcomes, {str(self.images[0].pk): True, 'abc': False, str(self.images[1].pk): True}
+        )
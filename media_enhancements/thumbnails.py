@@ -0,0 +1,79 @@
+"""
+Dashboard Thumbnails
+Image cards use small renditions generated when an image is uploaded,
+instead of the original file. Renditions for a page of cards are looked up
+in one query per image model.
+"""
+
+from django.db import transaction
+from wagtail.images.models import Filter
+
+
+THUMBNAIL_FILTER = 'fill-300x200'
+THUMBNAIL_FILTER_2X = 'fill-600x400'
+THUMBNAIL_FILTERS = (THUMBNAIL_FILTER, THUMBNAIL_FILTER_2X)
+
+
+def generate_thumbnails(image):
+    """Create any missing dashboard renditions for an image."""
+    if not image.file:
+        return {}
+    try:
+        return image.get_renditions(*THUMBNAIL_FILTERS)
+    except Exception as e:
+        print(f"Error generating thumbnails for image {image.pk}: {e}")
+        return {}
+
+
+def delete_renditions(image):
+    """
+    Delete every rendition of an image whose file was replaced, so they are
+    rendered again from the new file. The old rendition files are left for
+    collect_media_garbage.
+    """
+    renditions = list(image.renditions.all())
+    if not renditions:
+        return
+    type(image).get_rendition_model().objects.filter(pk__in=[rendition.pk for rendition in renditions]).delete()
+    for rendition in renditions:
+        rendition.purge_from_cache()
+
+
+def schedule_thumbnails(image):
+    """Generate an image's dashboard renditions once the current transaction commits."""
+    transaction.on_commit(lambda: generate_thumbnails(image))
+
+
+def get_thumbnail_urls(images):
+    """
+    Map image pk to a (1x URL, 2x URL) pair for every image whose dashboard
+    renditions exist. Images still waiting for renditions are left out.
+    `images` must all be instances of the same image model.
+    """
+    images = [image for image in images if image.file]
+    if not images:
+        return {}
+
+    filters = {spec: Filter(spec=spec) for spec in THUMBNAIL_FILTERS}
+    wanted = {
+        (image.pk, spec, filters[spec].get_cache_key(image))
+        for image in images
+        for spec in THUMBNAIL_FILTERS
+    }
+    rendition_model = type(images[0]).get_rendition_model()
+    renditions = rendition_model.objects.filter(
+        image_id__in=[image.pk for image in images],
+        filter_spec__in=THUMBNAIL_FILTERS,
+    )
+
+    urls = {}
+    for rendition in renditions:
+        key = (rendition.image_id, rendition.filter_spec, rendition.focal_point_key)
+        if key in wanted:
+            urls.setdefault(rendition.image_id, {})[rendition.filter_spec] = rendition.url
+
+    return {
+        pk: (found[THUMBNAIL_FILTER], found.get(THUMBNAIL_FILTER_2X, found[THUMBNAIL_FILTER]))
+        for pk, found in urls.items()
+        if THUMBNAIL_FILTER in found
+    }
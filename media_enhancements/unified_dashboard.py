@@ -5,41 +5,55 @@ Displays Images, Videos, Audio, and Documents in a single view
 
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.db.models import Q
-from itertools import chain
-from operator import attrgetter
-from datetime import datetime
 
-from .models import CustomImage, CustomDocument, Video, Audio, Category, MediaFolder
-from wagtail.images.models import Image
-from wagtail.documents.models import Document
+from .catalog import MEDIA_SOURCES, FOLDERLESS_SOURCES, UNCATEGORIZED_SOURCES, get_tag_names
+from .conditional import conditional_view
+from .facets import get_facets
+from .fuzzy import fuzzy_search_catalog
+from .pagination import KeysetPaginator
+from .search import search_catalog
+from .thumbnails import get_thumbnail_urls
+from .models import (
+    CustomImage, CustomDocument, Video, Audio, Category, MediaFolder, MediaCatalogEntry, MediaCatalogTerm,
+)
 
 
 class UnifiedMediaItem:
     """
     Standardized wrapper for all media types.
     Converts different media models into a unified format.
+    
+    Attributes are computed lazily from the wrapped object, its catalog entry
+    and batch-loaded tags, so rendering a card never issues extra queries.
     """
     
-    def __init__(self, obj):
+    __slots__ = ('original_object', 'media_type', 'catalog_entry', '_tags', '_thumbnails', '_metadata')
+    
+    ICONS = {
+        'image': 'fa-image',
+        'document': 'fa-file-alt',
+        'video': 'fa-video',
+        'audio': 'fa-music',
+    }
+    
+    COLORS = {
+        'image': '#667eea',
+        'document': '#f5576c',
+        'video': '#4facfe',
+        'audio': '#43e97b',
+    }
+    
+    def __init__(self, obj, catalog_entry=None, tags=None, thumbnails=None):
         self.original_object = obj
-        self.media_type = self._get_media_type(obj)
-        self.id = obj.id
-        self.title = obj.title
-        self.created_at = self._get_created_at(obj)
-        self.file_url = self._get_file_url(obj)
-        self.thumbnail_url = self._get_thumbnail_url(obj)
-        self.file_size = self._get_file_size(obj)
-        self.categories = self._get_categories(obj)
-        self.tags = self._get_tags(obj)
-        self.folder = self._get_folder(obj)
-        self.metadata = self._get_metadata(obj)
-        self.detail_url = self._get_detail_url(obj)
-        self.icon = self._get_icon()
-        self.color = self._get_color()
-    
-    def _get_media_type(self, obj):
+        self.media_type = catalog_entry.media_type if catalog_entry else self._get_media_type(obj)
+        self.catalog_entry = catalog_entry
+        self._tags = tags
+        self._thumbnails = thumbnails
+        self._metadata = None
+    
+    @staticmethod
+    def _get_media_type(obj):
         """Determine the media type."""
         class_name = obj.__class__.__name__
         if class_name in ['CustomImage', 'Image']:
@@ -52,51 +66,85 @@ class UnifiedMediaItem:
             return 'audio'
         return 'unknown'
     
-    def _get_created_at(self, obj):
+    @property
+    def id(self):
+        return self.original_object.id
+    
+    @property
+    def title(self):
+        return self.original_object.title
+    
+    @property
+    def created_at(self):
         """Get creation timestamp."""
-        return getattr(obj, 'created_at', None)
+        return getattr(self.original_object, 'created_at', None)
     
-    def _get_file_url(self, obj):
+    @property
+    def file_url(self):
         """Get file URL."""
+        if self.catalog_entry:
+            return self.catalog_entry.file_url or None
+        obj = self.original_object
         if hasattr(obj, 'file') and obj.file:
             return obj.file.url
         return None
     
-    def _get_thumbnail_url(self, obj):
-        """Get thumbnail URL."""
+    @property
+    def thumbnail_url(self):
+        """
+        Get thumbnail URL. Images use their 300x200 rendition; None (shown
+        as a placeholder) while the rendition is still being generated.
+        """
         if self.media_type == 'image':
-            return obj.file.url if obj.file else None
-        elif hasattr(obj, 'thumbnail') and obj.thumbnail:
+            return self._thumbnails[0] if self._thumbnails else None
+        if self.catalog_entry:
+            return self.catalog_entry.thumbnail_url or None
+        obj = self.original_object
+        if hasattr(obj, 'thumbnail') and obj.thumbnail:
             return obj.thumbnail.url
         return None
     
-    def _get_file_size(self, obj):
-        """Get file size."""
-        if hasattr(obj, 'file') and obj.file:
-            try:
-                return obj.file.size
-            except:
-                return 0
-        return 0
-    
-    def _get_categories(self, obj):
-        """Get categories."""
-        if hasattr(obj, 'categories'):
-            return obj.categories.all()
-        return []
+    @property
+    def thumbnail_url_2x(self):
+        """Get the high-density thumbnail URL, where one exists."""
+        if self.media_type == 'image' and self._thumbnails:
+            return self._thumbnails[1]
+        return None
     
-    def _get_tags(self, obj):
-        """Get tags."""
-        if hasattr(obj, 'tags'):
-            return obj.tags.all()
+    @property
+    def file_size(self):
+        """Get the stored file size without touching file storage."""
+        if self.catalog_entry and self.catalog_entry.file_size is not None:
+            return self.catalog_entry.file_size
+        return getattr(self.original_object, 'file_size', None) or 0
+    
+    @property
+    def categories(self):
+        """Get categories (prefetched)."""
+        if hasattr(self.original_object, 'categories'):
+            return self.original_object.categories.all()
         return []
     
-    def _get_folder(self, obj):
-        """Get folder."""
-        return getattr(obj, 'folder', None)
-    
-    def _get_metadata(self, obj):
+    @property
+    def tags(self):
+        """Get tag names."""
+        if self._tags is None:
+            obj = self.original_object
+            self._tags = get_tag_names(type(obj), [obj.pk])[obj.pk]
+        return self._tags
+    
+    @property
+    def folder(self):
+        """Get folder (select_related)."""
+        return getattr(self.original_object, 'folder', None)
+    
+    @property
+    def metadata(self):
         """Get type-specific metadata."""
+        if self._metadata is not None:
+            return self._metadata
+        
+        obj = self.original_object
         metadata = {}
         
         if self.media_type == 'image':
@@ -119,42 +167,80 @@ class UnifiedMediaItem:
             metadata['album'] = getattr(obj, 'album', None)
             metadata['genre'] = getattr(obj, 'genre', None)
         
-        return {k: v for k, v in metadata.items() if v}
+        self._metadata = {k: v for k, v in metadata.items() if v}
+        return self._metadata
     
-    def _get_detail_url(self, obj):
+    @property
+    def detail_url(self):
         """Get detail page URL."""
-        if self.media_type == 'image':
-            return f'/media/image/{obj.id}/'
-        elif self.media_type == 'document':
-            return f'/media/document/{obj.id}/'
-        elif self.media_type == 'video':
-            return f'/media/video/{obj.id}/'
-        elif self.media_type == 'audio':
-            return f'/media/audio/{obj.id}/'
+        if self.media_type in self.ICONS:
+            return f'/media/{self.media_type}/{self.id}/'
         return '#'
     
-    def _get_icon(self):
+    @property
+    def icon(self):
         """Get Font Awesome icon for media type."""
-        icons = {
-            'image': 'fa-image',
-            'document': 'fa-file-alt',
-            'video': 'fa-video',
-            'audio': 'fa-music',
-        }
-        return icons.get(self.media_type, 'fa-file')
-    
-    def _get_color(self):
+        return self.ICONS.get(self.media_type, 'fa-file')
+    
+    @property
+    def color(self):
         """Get color scheme for media type."""
-        colors = {
-            'image': '#667eea',
-            'document': '#f5576c',
-            'video': '#4facfe',
-            'audio': '#43e97b',
-        }
-        return colors.get(self.media_type, '#6c757d')
+        return self.COLORS.get(self.media_type, '#6c757d')
+
+
+# Keyset orderings for catalog listings; source and object_id break ties
+# so that every entry has a unique, stable position.
+CATALOG_ORDERING = {
+    '-created_at': ('-created_at', '-source', '-object_id'),
+    'created_at': ('created_at', 'source', 'object_id'),
+    'title': ('sort_title', 'source', 'object_id'),
+    '-title': ('-sort_title', '-source', '-object_id'),
+    'relevance': ('-search_rank', '-source', '-object_id'),
+}
+
+
+def build_unified_items(entries):
+    """
+    Build UnifiedMediaItems for a page of catalog entries, preserving entry order.
+    Loads each media source with select_related/prefetch_related plus one tag
+    query, so the query count depends on the number of sources, not items.
+    """
+    entries = list(entries)
+    ids_by_source = {}
+    for entry in entries:
+        ids_by_source.setdefault(entry.source, []).append(entry.object_id)
+    
+    objects = {}
+    tags = {}
+    thumbnails = {}
+    for source, ids in ids_by_source.items():
+        model = MEDIA_SOURCES[source][0]
+        queryset = model.objects.filter(pk__in=ids)
+        if source not in FOLDERLESS_SOURCES:
+            queryset = queryset.select_related('folder')
+        if source not in UNCATEGORIZED_SOURCES:
+            queryset = queryset.prefetch_related('categories')
+        for obj in queryset:
+            objects[(source, obj.pk)] = obj
+        if MEDIA_SOURCES[source][1] == 'image':
+            source_objects = [objects[(source, pk)] for pk in ids if (source, pk) in objects]
+            for pk, urls in get_thumbnail_urls(source_objects).items():
+                thumbnails[(source, pk)] = urls
+        for pk, names in get_tag_names(model, ids).items():
+            tags[(source, pk)] = names
+    
+    items = []
+    for entry in entries:
+        key = (entry.source, entry.object_id)
+        if key in objects:
+            items.append(UnifiedMediaItem(
+                objects[key], catalog_entry=entry, tags=tags[key], thumbnails=thumbnails.get(key)
+            ))
+    return items
 
 
 @login_required
+@conditional_view(*(model for model, media_type in MEDIA_SOURCES.values()), Category, MediaFolder)
 def unified_dashboard(request):
     """
     Unified dashboard view showing all media types together.
@@ -164,7 +250,11 @@ def unified_dashboard(request):
     category_slug = request.GET.get('category')
     folder_id = request.GET.get('folder')
     search_query = request.GET.get('q')
-    sort_by = request.GET.get('sort', '-created_at')
+    # Searches are ranked by relevance unless another sort is chosen
+    sort_by = request.GET.get('sort') or ('relevance' if search_query else '-created_at')
+    if sort_by == 'relevance' and not search_query:
+        sort_by = '-created_at'
+    recursive = request.GET.get('recursive') in ('1', 'true', 'on')
     
     # Get current folder and breadcrumbs
     current_folder = None
@@ -182,124 +272,92 @@ def unified_dashboard(request):
         # Root level - get top-level folders
         subfolders = MediaFolder.objects.filter(parent=None).order_by('order', 'name')
     
-    # Fetch all media types (including both custom and default Wagtail models)
-    custom_images = CustomImage.objects.all()
-    default_images = Image.objects.all()
-    custom_documents = CustomDocument.objects.all()
-    default_documents = Document.objects.all()
-    videos = Video.objects.all()
-    audio_files = Audio.objects.all()
-    
-    # Combine custom and default
-    images = list(chain(custom_images, default_images))
-    documents = list(chain(custom_documents, default_documents))
-    
-    # Apply folder filter (only for custom models that have folder field)
-    if current_folder:
-        custom_images = custom_images.filter(folder=current_folder)
-        custom_documents = custom_documents.filter(folder=current_folder)
-        videos = videos.filter(folder=current_folder)
-        audio_files = audio_files.filter(folder=current_folder)
-        # Default images/documents don't have folder field, so include all
-        images = list(chain(custom_images, default_images))
-        documents = list(chain(custom_documents, default_documents))
-    elif folder_id is None:
+    # All media types (custom and default Wagtail models) live in the catalog
+    entries = MediaCatalogEntry.objects.all()
+    
+    # Apply folder filter. Default images/documents don't have a folder field,
+    # so they are always included.
+    if current_folder and recursive:
+        # Whole subtree: the folder ids come from an indexed prefix match on
+        # the materialized path, evaluated as a subquery in the database.
+        subtree = current_folder.get_descendants(include_self=True).values('pk')
+        entries = entries.filter(Q(folder__in=subtree) | Q(source__in=FOLDERLESS_SOURCES))
+    elif current_folder:
+        entries = entries.filter(Q(folder=current_folder) | Q(source__in=FOLDERLESS_SOURCES))
+    elif folder_id is None and not recursive:
         # Show only items without folder at root level
-        custom_images = custom_images.filter(folder__isnull=True)
-        custom_documents = custom_documents.filter(folder__isnull=True)
-        videos = videos.filter(folder__isnull=True)
-        audio_files = audio_files.filter(folder__isnull=True)
-        # Include all default images/documents at root
-        images = list(chain(custom_images, default_images))
-        documents = list(chain(custom_documents, default_documents))
-    
-    # Apply category filter (only for models with categories)
+        entries = entries.filter(folder__isnull=True)
+    
+    # Apply category filter (only for models with categories), via the
+    # indexed (kind, value) catalog terms
     if category_slug:
-        custom_images = custom_images.filter(categories__slug=category_slug)
-        videos = videos.filter(categories__slug=category_slug)
-        audio_files = audio_files.filter(categories__slug=category_slug)
-        # Rebuild combined lists
-        images = list(chain(custom_images, default_images))
-        documents = list(chain(custom_documents, default_documents))
-    
-    # Apply search filter
+        members = MediaCatalogTerm.objects.filter(kind='category', value=category_slug).values('entry')
+        entries = entries.filter(Q(pk__in=members) | Q(source__in=UNCATEGORIZED_SOURCES))
+    
+    # Apply full-text search (annotates each entry with search_rank)
+    fuzzy_results = False
     if search_query:
-        custom_images = custom_images.filter(
-            Q(title__icontains=search_query) |
-            Q(tags__name__icontains=search_query)
-        ).distinct()
-        default_images = default_images.filter(title__icontains=search_query)
-        custom_documents = custom_documents.filter(
-            Q(title__icontains=search_query) |
-            Q(tags__name__icontains=search_query)
-        ).distinct()
-        default_documents = default_documents.filter(title__icontains=search_query)
-        videos = videos.filter(
-            Q(title__icontains=search_query) |
-            Q(tags__name__icontains=search_query)
-        ).distinct()
-        audio_files = audio_files.filter(
-            Q(title__icontains=search_query) |
-            Q(tags__name__icontains=search_query)
-        ).distinct()
-        # Rebuild combined lists
-        images = list(chain(custom_images, default_images))
-        documents = list(chain(custom_documents, default_documents))
+        unsearched = entries
+        entries = search_catalog(unsearched, search_query)
     
-    # Apply media type filter
-    if media_type_filter == 'image':
-        all_media = images
-    elif media_type_filter == 'document':
-        all_media = documents
-    elif media_type_filter == 'video':
-        all_media = list(videos)
-    elif media_type_filter == 'audio':
-        all_media = list(audio_files)
-    else:
-        # Combine all media types
-        all_media = list(chain(images, documents, videos, audio_files))
-    
-    # Sort combined results
-    if sort_by == '-created_at':
-        all_media.sort(key=lambda x: getattr(x, 'created_at', datetime.min), reverse=True)
-    elif sort_by == 'created_at':
-        all_media.sort(key=lambda x: getattr(x, 'created_at', datetime.min))
-    elif sort_by == 'title':
-        all_media.sort(key=lambda x: x.title.lower())
-    elif sort_by == '-title':
-        all_media.sort(key=lambda x: x.title.lower(), reverse=True)
-    
-    # Convert to unified format
-    unified_items = [UnifiedMediaItem(item) for item in all_media]
-    
-    # Pagination
-    paginator = Paginator(unified_items, 24)  # 24 items per page
-    page = request.GET.get('page', 1)
-    media_page = paginator.get_page(page)
-    
-    # Get statistics
+    # Facet counts (per type, category, tag and folder) for the current filters
+    facets = get_facets(entries)
+    
+    # Nothing matched exactly: fall back to typo-tolerant matching
+    if search_query and not facets['total']:
+        entries = fuzzy_search_catalog(unsearched, search_query)
+        facets = get_facets(entries)
+        fuzzy_results = True
     stats = {
-        'total': len(unified_items),
-        'images': len(images),
-        'documents': len(documents),
-        'videos': videos.count(),
-        'audio': audio_files.count(),
+        'images': facets['types']['image'],
+        'documents': facets['types']['document'],
+        'videos': facets['types']['video'],
+        'audio': facets['types']['audio'],
     }
     
+    # Apply media type filter
+    type_keys = {'image': 'images', 'document': 'documents', 'video': 'videos', 'audio': 'audio'}
+    if media_type_filter in type_keys:
+        entries = entries.filter(media_type=media_type_filter)
+        stats['total'] = stats[type_keys[media_type_filter]]
+    else:
+        stats['total'] = facets['total']
+    
+    # Keyset pagination: pages are addressed by cursors, not page numbers
+    ordering = CATALOG_ORDERING.get(sort_by, CATALOG_ORDERING['-created_at'])
+    paginator = KeysetPaginator(entries, ordering, 24)  # 24 items per page
+    media_page = paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    
+    # Filters carried over to the previous/next page links
+    pagination_query = request.GET.copy()
+    for key in ('after', 'before', 'page'):
+        pagination_query.pop(key, None)
+    
+    # Convert the visible page to unified format
+    media_page.object_list = build_unified_items(media_page.object_list)
+    
+    
     # Get categories
     categories = Category.objects.all()
     
     context = {
         'media_items': media_page,
         'stats': stats,
+        'facets': facets,
         'categories': categories,
         'current_folder': current_folder,
         'breadcrumbs': breadcrumbs,
         'subfolders': subfolders,
         'search_query': search_query,
+        'fuzzy_results': fuzzy_results,
         'selected_category': category_slug,
         'selected_type': media_type_filter,
         'sort_by': sort_by,
+        'recursive': recursive,
+        'pagination_query': pagination_query.urlencode(),
     }
     
     return render(request, 'media_enhancements/unified_dashboard.html', context)
@@ -39,4 +39,5 @@ urlpatterns = [
     
     # API
     path('api/stats/', views.media_stats_api, name='media_stats_api'),
+    path('api/autocomplete/', views.media_autocomplete_api, name='media_autocomplete_api'),
 ]
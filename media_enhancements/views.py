@@ -3,8 +3,11 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
-from .models import CustomImage, CustomDocument, Category
+from django.db.models import Q
+from .conditional import conditional_view
+from .media_stats import get_media_stats
+from .fuzzy import autocomplete, fuzzy_search_catalog
+from .models import CustomImage, CustomDocument, Category, MediaCatalogEntry
 
 
 # Removed media_gallery view - replaced by unified_dashboard
@@ -43,34 +46,34 @@ def document_detail(request, document_id):
 
 @login_required
 @require_http_methods(["GET"])
+@conditional_view(CustomImage, CustomDocument, Category)
 def media_stats_api(request):
     """
     API endpoint to get media statistics.
+    Totals come from counters kept up to date by signals (see media_stats.py).
     """
-    stats = {
-        'total_images': CustomImage.objects.count(),
-        'total_documents': CustomDocument.objects.count(),
-        'total_categories': Category.objects.count(),
-        'images_by_category': list(
-            Category.objects.annotate(
-                image_count=Count('customimage')
-            ).values('name', 'image_count')
-        ),
-        'recent_uploads': {
-            'images': list(
-                CustomImage.objects.order_by('-created_at')[:].values(
-                    'id', 'title', 'created_at'
-                )
-            ),
-            'documents': list(
-                CustomDocument.objects.order_by('-created_at')[:].values(
-                    'id', 'title', 'created_at'
-                )
-            ),
-        }
-    }
+    stats = get_media_stats()
     
     return JsonResponse(stats)
 
 
+@login_required
+@require_http_methods(["GET"])
+def media_autocomplete_api(request):
+    """
+    API endpoint for title and tag name autocomplete.
+    Falls back to typo-tolerant title suggestions when nothing matches the prefix.
+    """
+    query = request.GET.get('q', '')
+    results = autocomplete(query)
+    results['suggestions'] = []
+    if query.strip() and not results['titles']:
+        matches = fuzzy_search_catalog(MediaCatalogEntry.objects.all(), query)
+        results['suggestions'] = list(
+            matches.order_by('-search_rank', 'sort_title').values_list('title', flat=True)[:10]
+        )
+    
+    return JsonResponse(results)
+
+
 # Removed category_media view - category filtering now in unified_dashboard